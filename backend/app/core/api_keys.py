@@ -0,0 +1,244 @@
+"""
+API keys for programmatic clients.
+
+A key looks like `msk_<prefix>_<secret>` and is sent as a bearer token in
+place of a JWT, so clients skip the password login (and its bcrypt cost)
+entirely:
+
+- The database stores the public 12-hex-char `prefix` and
+  HMAC-SHA256(API_KEY_HMAC_SECRET, secret). The secret itself is never
+  stored, and the full key is shown only once, at creation.
+- Verification looks the prefix up in an in-memory index (TTL-bounded,
+  including negative entries for unknown prefixes), then compares HMACs
+  with `hmac.compare_digest`. Revoking a key invalidates its index entry.
+  Other processes see the revocation within API_KEY_INDEX_TTL_SECONDS.
+- Each key carries scopes (`API_KEY_SCOPES`) checked by
+  `get_current_user`. API keys never grant admin access and cannot
+  manage other API keys.
+- Per-key usage (`usage_count`, `last_used_at`) is counted in memory and
+  written in one batched UPDATE every API_KEY_USAGE_FLUSH_SECONDS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.config import settings
+from backend.app.db.database import AsyncSessionLocal
+from backend.app.db.crud_api_key import add_api_key_usage, get_api_key_by_prefix
+
+logger = logging.getLogger(__name__)
+
+API_KEY_SCOPES = ("tts", "lexicon", "credits", "feedback")
+KEY_MARKER = "msk_"
+PREFIX_LENGTH = 12
+
+
+@dataclass(frozen=True)
+class ApiKeyRecord:
+    key_id: str
+    user_id: str
+    secret_hash: str
+    scopes: FrozenSet[str]
+    revoked: bool
+
+    @classmethod
+    def from_row(cls, row) -> "ApiKeyRecord":
+        return cls(
+            key_id=row.id,
+            user_id=row.user_id,
+            secret_hash=row.secret_hash,
+            scopes=frozenset(s for s in row.scopes.split(",") if s),
+            revoked=row.revoked_at is not None,
+        )
+
+
+def _hmac_key() -> bytes:
+    if settings.API_KEY_HMAC_SECRET:
+        return settings.API_KEY_HMAC_SECRET.encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), b"mosheng-api-key", hashlib.sha256).digest()
+
+
+def hash_secret(secret: str) -> str:
+    return hmac.new(_hmac_key(), secret.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def generate_api_key() -> Tuple[str, str, str]:
+    """Return `(full_key, prefix, secret)`."""
+    prefix = secrets.token_hex(PREFIX_LENGTH // 2)
+    secret = secrets.token_urlsafe(32)
+    return f"{KEY_MARKER}{prefix}_{secret}", prefix, secret
+
+
+def is_api_key(token: str) -> bool:
+    return token.startswith(KEY_MARKER)
+
+
+def parse_api_key(token: str) -> Optional[Tuple[str, str]]:
+    """Split `msk_<prefix>_<secret>` into `(prefix, secret)`; None when malformed."""
+    if not is_api_key(token):
+        return None
+    prefix, sep, secret = token[len(KEY_MARKER):].partition("_")
+    if not sep or len(prefix) != PREFIX_LENGTH or not secret:
+        return None
+    return prefix, secret
+
+
+def normalize_scopes(scopes: List[str]) -> List[str]:
+    """Deduplicate and validate requested scopes (ValueError on unknown ones)."""
+    unknown = sorted(set(scopes) - set(API_KEY_SCOPES))
+    if unknown:
+        raise ValueError(f"Unknown scopes: {', '.join(unknown)}")
+    return [s for s in API_KEY_SCOPES if s in scopes]
+
+
+class ApiKeyIndex:
+    """prefix -> ApiKeyRecord (or None for unknown prefixes), TTL + LRU bounded."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Optional[ApiKeyRecord]]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, prefix: str) -> Tuple[bool, Optional[ApiKeyRecord]]:
+        """`(found, record)`; found=False means the caller must load from the DB."""
+        entry = self._entries.get(prefix)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(prefix, None)
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, entry[1]
+
+    def begin_load(self) -> int:
+        return self._generation
+
+    def put(self, prefix: str, record: Optional[ApiKeyRecord], token: int) -> None:
+        """Cache a loaded record unless a revocation happened since `begin_load`."""
+        if self.ttl_seconds <= 0 or token != self._generation:
+            return
+        self._entries[prefix] = (time.monotonic() + self.ttl_seconds, record)
+        self._entries.move_to_end(prefix)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, prefix: str) -> None:
+        self._entries.pop(prefix, None)
+        self._generation += 1
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class ApiKeyUsageBuffer:
+    """In-memory per-key request counters, flushed to `api_keys` periodically."""
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[str, Tuple[int, datetime.datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    def record(self, key_id: str) -> None:
+        count, _ = self._pending.get(key_id, (0, None))
+        self._pending[key_id] = (count + 1, datetime.datetime.utcnow())
+
+    def pending(self, key_id: str) -> int:
+        return self._pending.get(key_id, (0, None))[0]
+
+    async def flush(self) -> int:
+        """Write and clear the buffered counters. Returns the number of keys written."""
+        if not self._pending:
+            return 0
+        usage, self._pending = self._pending, {}
+        try:
+            async with AsyncSessionLocal() as db:
+                await add_api_key_usage(db, usage)
+        except Exception:
+            # Put the counts back so the next flush retries them.
+            for key_id, (n, used_at) in usage.items():
+                count, last = self._pending.get(key_id, (0, used_at))
+                self._pending[key_id] = (count + n, max(last, used_at))
+            raise
+        self.flushes += 1
+        self.flushed_rows += len(usage)
+        return len(usage)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"API key usage flush failed: {e}")
+
+    async def start(self):
+        if self._task is None and self.flush_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_keys": len(self._pending),
+            "pending_requests": sum(n for n, _ in self._pending.values()),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+        }
+
+
+# 全局实例
+api_key_index = ApiKeyIndex(settings.API_KEY_INDEX_TTL_SECONDS, settings.API_KEY_INDEX_MAX_ENTRIES)
+api_key_usage = ApiKeyUsageBuffer(settings.API_KEY_USAGE_FLUSH_SECONDS)
+
+# Compared against when the prefix is unknown, so a miss costs the same HMAC work as a hit.
+_DUMMY_HASH = "0" * 64
+
+
+async def authenticate_api_key(db: AsyncSession, token: str) -> Optional[ApiKeyRecord]:
+    """Verify an `msk_...` bearer token; None when malformed, unknown, revoked or wrong."""
+    parsed = parse_api_key(token)
+    if parsed is None:
+        return None
+    prefix, secret = parsed
+
+    found, record = api_key_index.get(prefix)
+    if not found:
+        load_token = api_key_index.begin_load()
+        row = await get_api_key_by_prefix(db, prefix)
+        record = ApiKeyRecord.from_row(row) if row is not None else None
+        api_key_index.put(prefix, record, load_token)
+
+    expected = record.secret_hash if record is not None else _DUMMY_HASH
+    if not hmac.compare_digest(hash_secret(secret), expected) or record is None or record.revoked:
+        return None
+    api_key_usage.record(record.key_id)
+    return record
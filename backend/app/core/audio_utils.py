@@ -0,0 +1,153 @@
+"""
+Helpers for assembling generated audio files (batch / script outputs,
+time-sliced long tasks).
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import zipfile
+from typing import List, Optional, Sequence
+
+
+def generated_path(output_url: str, generated_dir: str) -> str:
+    """Map `/static/generated/{file}` back to its path under GENERATED_AUDIO_DIR."""
+    return os.path.join(generated_dir, os.path.basename(output_url))
+
+
+def encode_audio(wav, sample_rate: int, fmt: str = "wav") -> bytes:
+    """
+    Encode a float waveform for the wire.
+
+    Parameters:
+    - fmt: "wav" (self-contained 16-bit PCM file) or "pcm16" (raw little-endian samples)
+    """
+    import numpy as np
+    import soundfile as sf
+
+    if fmt == "pcm16":
+        return (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    if fmt == "wav":
+        buf = io.BytesIO()
+        sf.write(buf, wav, sample_rate, format="WAV", subtype="PCM_16")
+        return buf.getvalue()
+    raise ValueError(f"unsupported audio format: {fmt}")
+
+
+def concat_wavs(
+    paths: Sequence[str],
+    output_path: str,
+    pause_ms: int = 0,
+    pauses_ms: Optional[List[int]] = None,
+) -> str:
+    """
+    Concatenate mono/stereo wav files (same sample rate) with silence in between.
+
+    Parameters:
+    - pause_ms: silence inserted between every pair of clips
+    - pauses_ms: per-gap override (len(paths) - 1 values), takes precedence
+    """
+    import numpy as np
+    import soundfile as sf
+
+    if not paths:
+        raise ValueError("nothing to concatenate")
+    if pauses_ms is not None and len(pauses_ms) != len(paths) - 1:
+        raise ValueError("pauses_ms must have len(paths) - 1 entries")
+
+    chunks = []
+    sample_rate = None
+    for idx, path in enumerate(paths):
+        data, sr = sf.read(path, dtype="float32")
+        if sample_rate is None:
+            sample_rate = sr
+        elif sr != sample_rate:
+            raise ValueError(f"sample rate mismatch: {path} is {sr}, expected {sample_rate}")
+        if idx > 0:
+            gap = pauses_ms[idx - 1] if pauses_ms is not None else pause_ms
+            if gap > 0:
+                silence_shape = (int(sample_rate * gap / 1000),) + data.shape[1:]
+                chunks.append(np.zeros(silence_shape, dtype=np.float32))
+        chunks.append(data)
+
+    tmp_path = output_path + ".tmp"
+    sf.write(tmp_path, np.concatenate(chunks), sample_rate, format="WAV")
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def zip_files(paths: Sequence[str], names: Sequence[str], output_path: str) -> str:
+    """Store files into a zip archive (wav is already incompressible; no deflate)."""
+    tmp_path = output_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for path, name in zip(paths, names):
+            zf.write(path, arcname=name)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class PartialAudio:
+    """
+    Audio of one task accumulated segment by segment.
+
+    Segments stay in memory until `spill_seconds` of audio is buffered; after
+    that everything is streamed to `spill_path` so a long task does not pin
+    its whole waveform in RAM while other tasks run.
+    """
+
+    def __init__(self, spill_path: str, sample_rate: int, spill_seconds: float = 60.0, pause_ms: int = 0):
+        self.spill_path = spill_path
+        self.sample_rate = sample_rate
+        self.spill_samples = int(spill_seconds * sample_rate)
+        self.pause_samples = int(sample_rate * pause_ms / 1000)
+        self.samples = 0
+        self._chunks: list = []
+        self._file = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def append(self, wav) -> None:
+        import numpy as np
+        import soundfile as sf
+
+        wav = np.asarray(wav, dtype=np.float32)
+        chunks = [wav]
+        if self.samples and self.pause_samples:
+            chunks.insert(0, np.zeros(self.pause_samples, dtype=np.float32))
+        self.samples += sum(len(c) for c in chunks)
+        if self._file is None and self.samples > self.spill_samples:
+            self._file = sf.SoundFile(self.spill_path, "w", samplerate=self.sample_rate, channels=1, format="WAV")
+            for chunk in self._chunks:
+                self._file.write(chunk)
+            self._chunks = []
+        if self._file is not None:
+            for chunk in chunks:
+                self._file.write(chunk)
+        else:
+            self._chunks.extend(chunks)
+
+    def finish(self, output_path: str) -> str:
+        """Write the assembled audio to `output_path` (a rename when spilled)."""
+        import numpy as np
+        import soundfile as sf
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.replace(self.spill_path, output_path)
+        else:
+            sf.write(output_path, np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32),
+                     self.sample_rate)
+            self._chunks = []
+        return output_path
+
+    def discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+        self._chunks = []
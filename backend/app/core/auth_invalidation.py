@@ -0,0 +1,82 @@
+"""
+Cross-process auth cache invalidation.
+
+`user_cache` lives in each API process, so `user_cache.invalidate` only
+reaches the process that made the change. Tools running elsewhere (the web
+monitor, manage_db) edit users directly in the database. They record the
+user in `user_cache_invalidations` in the same transaction
+(`record_user_invalidation`). Every AUTH_USER_CACHE_SYNC_SECONDS each API
+process reads the recent rows and invalidates those users. A demoted admin,
+a changed email or a deleted user therefore takes effect within one poll,
+not after AUTH_USER_CACHE_TTL_SECONDS.
+
+Rows are re-read for a short window rather than by id. A row whose id was
+allocated earlier but committed later than a newer one is still seen.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from typing import Optional, Set
+
+from backend.app.core.config import settings
+from backend.app.core.user_cache import user_cache
+from backend.app.db.crud_user import list_user_invalidations
+from backend.app.db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class AuthInvalidationFeed:
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        # Rows recorded this long ago are still re-read (late commits, clock skew between processes)
+        self.window = datetime.timedelta(seconds=max(10.0, 3 * interval_seconds))
+        self._applied: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.applied = 0
+
+    async def poll(self) -> int:
+        """Invalidate users recorded since the last poll. Returns how many rows were new."""
+        since = datetime.datetime.utcnow() - self.window
+        async with AsyncSessionLocal() as db:
+            rows = await list_user_invalidations(db, since)
+        new = [(row_id, user_id) for row_id, user_id in rows if row_id not in self._applied]
+        for _, user_id in new:
+            user_cache.invalidate(user_id)
+        # Ids that left the window cannot come back
+        self._applied = {row_id for row_id, _ in rows}
+        self.polls += 1
+        self.applied += len(new)
+        return len(new)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Auth cache invalidation poll failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def start(self):
+        if self._task is None and self.interval_seconds > 0 and user_cache.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "polls": self.polls,
+            "applied": self.applied,
+        }
+
+
+# 全局实例
+auth_invalidation_feed = AuthInvalidationFeed(settings.AUTH_USER_CACHE_SYNC_SECONDS)
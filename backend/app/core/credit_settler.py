@@ -0,0 +1,84 @@
+"""
+Background settlement of credit holds.
+
+Submissions only hold credits (`users.credits_held`); the TTS worker records
+each task's outcome (COMPLETED / FAILED) as usual. Every
+CREDIT_SETTLE_INTERVAL_SECONDS the settler runs `settle_credit_holds` until
+no finished task is left, so N completions by a busy user become one balance
+UPDATE and one multi-row ledger INSERT instead of N row-locking debits on the
+submit path. Failed tasks release their hold (or are refunded when they were
+charged at submit).
+
+State lives in the database (`tasks.hold_status`), so holds left by a restart
+or finished by another process are settled by the next sweep.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+from backend.app.core.config import settings
+from backend.app.db.crud_credits import settle_credit_holds
+from backend.app.db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class CreditSettler:
+    def __init__(self, interval_seconds: float, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.captured = 0
+        self.released = 0
+        self.refunded = 0
+
+    async def settle(self) -> int:
+        """Settle every finished task now. Returns the number of tasks settled."""
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                counts = await settle_credit_holds(db, self.batch_size)
+            settled = counts["captured"] + counts["released"] + counts["refunded"]
+            self.runs += 1
+            self.captured += counts["captured"]
+            self.released += counts["released"]
+            self.refunded += counts["refunded"]
+            total += settled
+            if settled < self.batch_size:
+                return total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.settle()
+            except Exception as e:
+                logger.error(f"Credit settlement failed: {e}")
+
+    async def start(self):
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.settle()
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "captured": self.captured,
+            "released": self.released,
+            "refunded": self.refunded,
+        }
+
+
+# 全局实例
+credit_settler = CreditSettler(settings.CREDIT_SETTLE_INTERVAL_SECONDS, settings.CREDIT_SETTLE_BATCH_SIZE)
@@ -1,49 +1,150 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+import dataclasses
+from typing import Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.app.core.security import decode_access_token
+from backend.app.core.api_keys import ApiKeyRecord, authenticate_api_key, is_api_key
+from backend.app.core.read_replica import ReplicaSessionLocal
+from backend.app.core.user_cache import AuthUser, user_cache
 from backend.app.db.database import get_db
 from backend.app.db.crud_user import get_user_by_id
 from backend.app.db.models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+async def _resolve_token(db: AsyncSession, token: str) -> Tuple[Optional[str], Optional[ApiKeyRecord]]:
+    """`(user_id, api_key)` for a JWT or an `msk_...` API key; user_id is None when invalid."""
+    if is_api_key(token):
+        record = await authenticate_api_key(db, token)
+        return (record.user_id if record is not None else None), record
+    payload = decode_access_token(token)
+    if payload is None:
+        return None, None
+    return payload.get("sub"), None
+
+async def get_user_from_token(db: AsyncSession, token: str) -> Optional[AuthUser]:
+    """
+    Resolve a bearer token (JWT or API key) to its user; None when the token or user is invalid.
+
+    Served from `user_cache` when possible (no DB round trip); the returned
+    balance may be up to AUTH_USER_CACHE_TTL_SECONDS old.
+    """
+    user_id, api_key = await _resolve_token(db, token)
+    if user_id is None:
+        return None
+
+    auth_user = user_cache.get(user_id) if user_cache.enabled else None
+    if auth_user is None:
+        token_gen = user_cache.begin_load(user_id)
+        user = await get_user_by_id(db, user_id)
+        if user is None:
+            return None
+        auth_user = AuthUser.from_user(user)
+        user_cache.put(auth_user, token_gen)
+    if api_key is not None:
+        auth_user = dataclasses.replace(auth_user, api_key_id=api_key.key_id, scopes=api_key.scopes)
+    return auth_user
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    user_id: str = payload.get("sub")
+
+def _check_scopes(user: AuthUser, security_scopes: SecurityScopes) -> None:
+    missing = [s for s in security_scopes.scopes if not user.has_scope(s)]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"API key is missing scope: {', '.join(missing)}",
+        )
+
+async def get_current_user(
+    security_scopes: SecurityScopes,
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AuthUser:
+    """
+    Authenticated caller. Endpoints declare required API key scopes with
+    `Security(get_current_active_user, scopes=[...])`; JWT sessions pass every scope check.
+    """
+    user = await get_user_from_token(db, token)
+    if user is None:
+        raise _credentials_exception()
+    _check_scopes(user, security_scopes)
+
+    # Lets `get_read_db` keep this caller's reads on the primary after their own writes
+    request.state.user_id = user.id
+    return user
+
+async def get_current_user_fresh(
+    security_scopes: SecurityScopes,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Full `User` row read from the DB (for endpoints that report the live balance)."""
+    user_id, api_key = await _resolve_token(db, token)
     if user_id is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    token_gen = user_cache.begin_load(user_id)
     user = await get_user_by_id(db, user_id)
     if user is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    auth_user = AuthUser.from_user(user)
+    user_cache.put(auth_user, token_gen)
+    if api_key is not None:
+        _check_scopes(dataclasses.replace(auth_user, scopes=api_key.scopes), security_scopes)
     return user
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: AuthUser = Depends(get_current_user)
+) -> AuthUser:
+    return current_user
+
+async def get_current_session_user(
+    current_user: AuthUser = Depends(get_current_user)
+) -> AuthUser:
+    """Caller authenticated with a login session (JWT); API keys are rejected."""
+    if current_user.api_key_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This endpoint requires a login session, not an API key"
+        )
     return current_user
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
-    if not current_user.is_admin:
+    current_user: AuthUser = Depends(get_current_session_user),
+    db: AsyncSession = Depends(get_db)
+) -> AuthUser:
+    """
+    Admin caller. The admin flag is re-read from the DB instead of trusting the
+    cached `AuthUser`, so a demotion or deletion takes effect on the next admin call.
+    """
+    token_gen = user_cache.begin_load(current_user.id)
+    user = await get_user_by_id(db, current_user.id)
+    if user is None:
+        raise _credentials_exception()
+    auth_user = AuthUser.from_user(user)
+    user_cache.put(auth_user, token_gen)
+    if not auth_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough privileges"
         )
-    return current_user
+    return auth_user
 
+async def get_read_db(request: Request):
+    """
+    Session for read-only routes: served by the read replica when it has caught
+    up with the caller's writes (see `core/read_replica.py`), else the primary.
+    Same as `get_db` when READ_REPLICA_URL is not set.
+    """
+    async with ReplicaSessionLocal() as session:
+        session.info["request_state"] = request.state
+        try:
+            yield session
+        finally:
+            await session.close()
@@ -0,0 +1,53 @@
+"""
+Idempotency-Key support for task submission.
+
+Duplicate submissions of the same key are serialized in-process on a per-key
+asyncio lock, so a retry that races the original waits for it and then
+replays its result. The `(user_id, key)` unique index on `idempotency_keys`
+covers the cross-process case.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(payload: dict) -> str:
+    """Stable hash of a request body, used to reject key reuse with different parameters."""
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+class KeyedLocks:
+    """asyncio locks created on demand per key and dropped when nobody holds or waits on them."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {}  # key -> [lock, users]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+# 全局实例
+idempotency_locks = KeyedLocks()
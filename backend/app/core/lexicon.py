@@ -0,0 +1,240 @@
+"""
+Pronunciation lexicon (per-user text overrides applied before synthesis).
+
+Each user owns a set of `term -> replacement` entries (brand names, polyphonic
+characters, acronyms). Entries are compiled into an Aho-Corasick automaton so a
+single linear pass over the request text applies every override, regardless of
+how many entries the user has.
+
+Design:
+- The trie is mutated in place on add/remove; no full recompilation.
+- Removing or re-pointing an entry only touches its terminal node.
+- New terms go into a small delta automaton (cheap relink) that is merged into
+  the main automaton in amortized batches; links are recomputed lazily on the
+  next `apply`, so bulk edits pay for a single relink.
+- Matching is leftmost-longest and non-overlapping.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class _Automaton:
+    """
+    Aho-Corasick automaton over a mutable trie.
+
+    Nodes are stored in parallel lists (index 0 is the root) to keep the
+    per-node overhead low at 100k+ entries.
+    """
+
+    def __init__(self):
+        self.children: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.dict_link: List[int] = [0]
+        self.depth: List[int] = [0]
+        self.replacement: List[Optional[str]] = [None]
+        self.terms: Dict[str, int] = {}
+        self.dirty = False
+
+    def add(self, term: str, replacement: str) -> None:
+        node = self.terms.get(term)
+        if node is not None:
+            self.replacement[node] = replacement
+            return
+
+        node = 0
+        for ch in term:
+            nxt = self.children[node].get(ch)
+            if nxt is None:
+                nxt = len(self.children)
+                self.children.append({})
+                self.fail.append(0)
+                self.dict_link.append(0)
+                self.depth.append(self.depth[node] + 1)
+                self.replacement.append(None)
+                self.children[node][ch] = nxt
+            node = nxt
+        self.replacement[node] = replacement
+        self.terms[term] = node
+        self.dirty = True
+
+    def remove(self, term: str) -> bool:
+        # The terminal node is cleared but kept: dictionary links that point at
+        # it still lead further down the suffix chain, so no relink is needed.
+        node = self.terms.pop(term, None)
+        if node is None:
+            return False
+        self.replacement[node] = None
+        return True
+
+    def relink(self) -> None:
+        """Recompute failure and dictionary-suffix links with one BFS."""
+        children = self.children
+        fail = self.fail
+        dict_link = self.dict_link
+        replacement = self.replacement
+
+        queue = deque()
+        for child in children[0].values():
+            fail[child] = 0
+            dict_link[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in children[node].items():
+                f = fail[node]
+                while f and ch not in children[f]:
+                    f = fail[f]
+                link = children[f].get(ch, 0)
+                fail[child] = link
+                dict_link[child] = link if replacement[link] is not None else dict_link[link]
+                queue.append(child)
+
+        self.dirty = False
+
+    def collect(self, text: str, best: Dict[int, Tuple[int, str]]) -> None:
+        """
+        Record the longest match starting at each position into `best`
+        as `start -> (length, replacement)`.
+        """
+        if not self.terms:
+            return
+        if self.dirty:
+            self.relink()
+
+        children = self.children
+        fail = self.fail
+        dict_link = self.dict_link
+        depth = self.depth
+        replacement = self.replacement
+
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in children[node]:
+                node = fail[node]
+            node = children[node].get(ch, 0)
+            out = node if replacement[node] is not None else dict_link[node]
+            while out:
+                if replacement[out] is not None:
+                    length = depth[out]
+                    start = i - length + 1
+                    prev = best.get(start)
+                    if prev is None or length > prev[0]:
+                        best[start] = (length, replacement[out])
+                out = dict_link[out]
+
+
+class Lexicon:
+    """
+    Term -> replacement map applied in a single pass over the input text.
+
+    New terms land in a small delta automaton whose relink is cheap; the delta
+    is folded into the main automaton once it grows past a fraction of it, so
+    the main relink cost is amortized over many edits.
+    """
+
+    MIN_DELTA_SIZE = 256
+    DELTA_RATIO = 16
+
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()):
+        self._main = _Automaton()
+        self._delta = _Automaton()
+        for term, replacement in entries:
+            if not term:
+                raise ValueError("term must be non-empty")
+            self._main.add(term, replacement)
+
+    def __len__(self) -> int:
+        return len(self._main.terms) + len(self._delta.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._main.terms or term in self._delta.terms
+
+    def add(self, term: str, replacement: str) -> None:
+        """
+        Insert or update an entry.
+
+        Updating an existing term only swaps its replacement in place.
+        """
+        if not term:
+            raise ValueError("term must be non-empty")
+        if term in self._main.terms:
+            self._main.add(term, replacement)
+            return
+        self._delta.add(term, replacement)
+        if len(self._delta.terms) > max(self.MIN_DELTA_SIZE, len(self._main.terms) // self.DELTA_RATIO):
+            self._merge_delta()
+
+    def remove(self, term: str) -> bool:
+        """Remove an entry. Returns False when the term is unknown."""
+        return self._main.remove(term) or self._delta.remove(term)
+
+    def _merge_delta(self) -> None:
+        for term, node in self._delta.terms.items():
+            self._main.add(term, self._delta.replacement[node])
+        self._delta = _Automaton()
+
+    def apply(self, text: str) -> str:
+        """
+        Return `text` with every entry replaced (leftmost-longest, non-overlapping).
+        """
+        if not text or not len(self):
+            return text
+
+        best: Dict[int, Tuple[int, str]] = {}
+        self._main.collect(text, best)
+        self._delta.collect(text, best)
+        if not best:
+            return text
+
+        parts: List[str] = []
+        pos = 0
+        for start in sorted(best):
+            if start < pos:
+                continue
+            length, replacement = best[start]
+            parts.append(text[pos:start])
+            parts.append(replacement)
+            pos = start + length
+        parts.append(text[pos:])
+        return "".join(parts)
+
+
+class LexiconRegistry:
+    """
+    Process-local cache of compiled lexicons, keyed by user id.
+
+    Callers load a user's entries once (`load`) and keep the automaton in sync
+    through `add` / `remove` after each committed CRUD change.
+    """
+
+    def __init__(self):
+        self._lexicons: Dict[str, Lexicon] = {}
+
+    def get(self, user_id: str) -> Optional[Lexicon]:
+        return self._lexicons.get(user_id)
+
+    def load(self, user_id: str, entries: Iterable[Tuple[str, str]]) -> Lexicon:
+        lexicon = Lexicon(entries)
+        self._lexicons[user_id] = lexicon
+        return lexicon
+
+    def add(self, user_id: str, term: str, replacement: str) -> None:
+        lexicon = self._lexicons.get(user_id)
+        if lexicon is not None:
+            lexicon.add(term, replacement)
+
+    def remove(self, user_id: str, term: str) -> None:
+        lexicon = self._lexicons.get(user_id)
+        if lexicon is not None:
+            lexicon.remove(term)
+
+    def invalidate(self, user_id: str) -> None:
+        self._lexicons.pop(user_id, None)
+
+
+# 全局实例
+lexicon_registry = LexiconRegistry()
@@ -0,0 +1,207 @@
+"""
+Request rate limiting and per-user in-flight caps.
+
+Token buckets (rate = tokens/second refill, burst = capacity) are keyed by
+scope + user id / client IP / login account:
+
+- `MemoryBucketStore` (default): a dict of `[tokens, updated_at]`, O(1) per
+  check; buckets that have refilled completely carry no information and are
+  dropped by a periodic compaction pass.
+- `RedisBucketStore` (RATE_LIMIT_REDIS_URL set): the same bucket math in a
+  Lua script so several API processes share limits; keys expire once full.
+  Needs the optional `redis` package.
+
+`InflightTracker` caps queued + running tasks per user. The queue and its
+worker live in each API process, so the count is kept in process.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Security, status
+from fastapi.requests import HTTPConnection
+
+from backend.app.core.config import settings
+from backend.app.core.deps import get_current_active_user
+from backend.app.core.user_cache import AuthUser
+
+
+class MemoryBucketStore:
+    def __init__(self, compact_interval: float = 60.0):
+        self.compact_interval = compact_interval
+        self._buckets: Dict[str, List[float]] = {}  # key -> [tokens, updated_at, seconds_to_full]
+        self._last_compact = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Consume `cost` tokens; returns 0 when allowed, else seconds until it would be."""
+        now = time.monotonic()
+        if now - self._last_compact >= self.compact_interval:
+            self.compact(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now, burst / rate]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Drop buckets idle long enough to be full again (indistinguishable from new ones)."""
+        now = time.monotonic() if now is None else now
+        stale = [k for k, b in self._buckets.items() if now - b[1] >= b[2]]
+        for key in stale:
+            del self._buckets[key]
+        self._last_compact = now
+        return len(stale)
+
+
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(retry)
+"""
+
+
+class RedisBucketStore:
+    def __init__(self, url: str, prefix: str = "mosheng:rl:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed") from e
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TAKE)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        retry = await self._script(keys=[self.prefix + key], args=[rate, burst, cost, time.time()])
+        return float(retry)
+
+
+class RateLimiter:
+    def __init__(self, store):
+        self.store = store
+
+    async def enforce(self, buckets: Iterable[Tuple[str, float, float]]) -> None:
+        """
+        Take one token from each `(key, rate, burst)` bucket; 429 with Retry-After on the first empty one.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        for key, rate, burst in buckets:
+            if rate <= 0:
+                continue
+            retry_after = await self.store.take(key, rate, burst)
+            if retry_after > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+
+class InflightTracker:
+    """Queued + running task count per user (reserve before enqueue, finish from the worker)."""
+
+    def __init__(self, max_per_user: int):
+        self.max_per_user = max_per_user
+        self._counts: Dict[str, int] = {}
+        self._owners: Dict[str, str] = {}
+
+    def count(self, user_id: str) -> int:
+        return self._counts.get(user_id, 0)
+
+    def reserve(self, user_id: str, n: int = 1) -> bool:
+        if self.max_per_user > 0 and self.count(user_id) + n > self.max_per_user:
+            return False
+        self._counts[user_id] = self.count(user_id) + n
+        return True
+
+    def release(self, user_id: str, n: int = 1) -> None:
+        """Give back reservations that never became queued tasks."""
+        left = self.count(user_id) - n
+        if left > 0:
+            self._counts[user_id] = left
+        else:
+            self._counts.pop(user_id, None)
+
+    def attach(self, user_id: str, task_ids: Sequence[str]) -> None:
+        """Bind reservations to the enqueued task ids so the worker can finish them."""
+        for task_id in task_ids:
+            self._owners[task_id] = user_id
+
+    def finish(self, task_id: str) -> None:
+        user_id = self._owners.pop(task_id, None)
+        if user_id is not None:
+            self.release(user_id)
+
+
+def client_ip(request: HTTPConnection) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _make_store():
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore()
+
+
+async def enforce_tts_limits(user_id: str, connection: HTTPConnection) -> None:
+    """Per-user and per-IP TTS buckets (submissions and /tts/stream connects share them)."""
+    await rate_limiter.enforce([
+        (f"tts:user:{user_id}", settings.RATE_LIMIT_TTS_USER_RATE, settings.RATE_LIMIT_TTS_USER_BURST),
+        (f"tts:ip:{client_ip(connection)}", settings.RATE_LIMIT_TTS_IP_RATE, settings.RATE_LIMIT_TTS_IP_BURST),
+    ])
+
+
+async def limit_tts_submission(
+    request: Request,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"])
+) -> None:
+    """Dependency for task-submitting TTS routes: per-user and per-IP buckets."""
+    await enforce_tts_limits(current_user.id, request)
+
+
+async def limit_auth_ip(request: Request) -> None:
+    """Dependency for password routes (bcrypt work): per-IP bucket."""
+    await rate_limiter.enforce([
+        (f"auth:ip:{client_ip(request)}", settings.RATE_LIMIT_AUTH_IP_RATE, settings.RATE_LIMIT_AUTH_IP_BURST),
+    ])
+
+
+async def limit_login_account(email: str) -> None:
+    """Per-account bucket for /auth/login (slows password guessing spread over many IPs)."""
+    await rate_limiter.enforce([
+        (f"auth:account:{email.lower()}", settings.RATE_LIMIT_LOGIN_ACCOUNT_RATE, settings.RATE_LIMIT_LOGIN_ACCOUNT_BURST),
+    ])
+
+
+# 全局实例
+rate_limiter = RateLimiter(_make_store())
+inflight_tracker = InflightTracker(settings.TTS_MAX_INFLIGHT_PER_USER)
@@ -0,0 +1,206 @@
+"""
+Read replica routing (READ_REPLICA_URL).
+
+Status polls, history, ledger listings and monitor statistics take their
+session from `get_read_db` (`core/deps.py`). Each transaction of such a
+session is served by `replica_engine` when the replica is fresh enough for
+the caller, otherwise by the primary exactly like `get_db`. Statements that
+write always go to the primary.
+
+Freshness comes from a heartbeat. Every READ_REPLICA_HEARTBEAT_SECONDS the
+monitor writes the current time to `replica_heartbeat` on the primary and
+reads it back from the replica. The value seen there (`caught_up_to`) means
+every commit made before that time has been replayed on the replica.
+- Lag is `now - caught_up_to`. While it exceeds READ_REPLICA_MAX_LAG_SECONDS
+  (replica behind, stopped or unreachable), every read goes to the primary.
+- Read-your-writes: routes that write for a user call `note_write(user_id)`
+  after the commit. That user's reads stay on the primary until
+  `caught_up_to` passes the write, so a user who just submitted sees the task.
+- Writes are tracked per process. A status poll that misses a task on the
+  replica (e.g. submitted through another worker) retries on the primary
+  (`fall_back_to_primary`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.core.config import settings
+from backend.app.db.crud_replica import get_replica_heartbeat, write_replica_heartbeat
+from backend.app.db.database import (
+    AsyncSessionLocal, engine, is_write_clause, replica_engine, session_class
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaMonitor:
+    def __init__(self, replica, interval_seconds: float, max_lag_seconds: float, max_users: int = 10000):
+        self.replica = replica
+        self.interval_seconds = interval_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.max_users = max_users
+        self._replica_sessions = async_sessionmaker(replica, expire_on_commit=False) if replica is not None else None
+        self._task: Optional[asyncio.Task] = None
+        # user id -> time of the user's last committed write, oldest first
+        self._writes: "OrderedDict[str, datetime.datetime]" = OrderedDict()
+        self._evicted_up_to: Optional[datetime.datetime] = None
+        self.caught_up_to: Optional[datetime.datetime] = None
+        self.checks = 0
+        self.check_failures = 0
+        self.last_error: Optional[str] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica is not None
+
+    def lag_seconds(self) -> Optional[float]:
+        """Seconds of commits the replica may be missing; None before the first heartbeat was seen there."""
+        if self.caught_up_to is None:
+            return None
+        return max(0.0, (datetime.datetime.utcnow() - self.caught_up_to).total_seconds())
+
+    def healthy(self) -> bool:
+        lag = self.lag_seconds()
+        return self.enabled and lag is not None and lag <= self.max_lag_seconds
+
+    def note_write(self, user_id: str) -> None:
+        """Record a committed write for `user_id`; their reads use the primary until the replica has it."""
+        if not self.enabled:
+            return
+        self._writes[user_id] = datetime.datetime.utcnow()
+        self._writes.move_to_end(user_id)
+        while len(self._writes) > self.max_users:
+            # Forgotten users are treated as having written at the newest evicted time
+            _, written = self._writes.popitem(last=False)
+            self._evicted_up_to = max(written, self._evicted_up_to or written)
+
+    def use_replica(self, user_id: Optional[str] = None) -> bool:
+        """Whether a read for `user_id` (None: no caller, e.g. monitor statistics) may go to the replica."""
+        ok = self.healthy()
+        if ok and user_id is not None:
+            written = self._writes.get(user_id, self._evicted_up_to)
+            ok = written is None or written < self.caught_up_to
+        if ok:
+            self.replica_reads += 1
+        else:
+            self.primary_reads += 1
+        return ok
+
+    async def check(self) -> None:
+        """Write a heartbeat to the primary and read the replica's latest one."""
+        async with AsyncSessionLocal() as db:
+            await write_replica_heartbeat(db, datetime.datetime.utcnow())
+        async with self._replica_sessions() as db:
+            seen = await get_replica_heartbeat(db)
+        self.checks += 1
+        if seen is not None and (self.caught_up_to is None or seen > self.caught_up_to):
+            self.caught_up_to = seen
+            while self._writes:
+                user_id, written = next(iter(self._writes.items()))
+                if written >= seen:
+                    break
+                del self._writes[user_id]
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                self.check_failures += 1
+                self.last_error = str(e)
+                logger.warning(f"Read replica heartbeat failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def start(self):
+        if self._task is None and self.enabled and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        lag = self.lag_seconds()
+        return {
+            "enabled": self.enabled,
+            "healthy": self.healthy(),
+            "lag_seconds": round(lag, 3) if lag is not None else None,
+            "max_lag_seconds": self.max_lag_seconds,
+            "heartbeat_seconds": self.interval_seconds,
+            "checks": self.checks,
+            "check_failures": self.check_failures,
+            "last_error": self.last_error,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "pinned_users": len(self._writes),
+        }
+
+
+# 全局实例（未配置 READ_REPLICA_URL 时不启用）
+replica_monitor = ReplicaMonitor(
+    replica_engine, settings.READ_REPLICA_HEARTBEAT_SECONDS, settings.READ_REPLICA_MAX_LAG_SECONDS,
+)
+
+
+class ReplicaSession(session_class):
+    """
+    Session for read-only routes.
+
+    The first read of each transaction asks `replica_monitor` whether the
+    caller (`info["request_state"].user_id`, set by authentication) may read
+    the replica; the transaction stays there until it ends. Writes, and
+    everything after `fall_back_to_primary`, use the primary session's binds.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.info.get("primary") and not (self._flushing or is_write_clause(clause)):
+            if "replica" not in self.info:
+                user_id = getattr(self.info.get("request_state"), "user_id", None)
+                self.info["replica"] = replica_monitor.use_replica(user_id)
+            if self.info["replica"]:
+                return replica_engine.sync_engine
+        return super().get_bind(mapper, clause, **kw)
+
+
+@event.listens_for(ReplicaSession, "after_transaction_end")
+def _end_replica(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("replica", None)
+
+
+ReplicaSessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=ReplicaSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+) if replica_engine is not None else AsyncSessionLocal
+
+
+def fall_back_to_primary(db: AsyncSession) -> bool:
+    """
+    Serve the rest of `db` from the primary.
+
+    Returns True when `db` was reading the replica, i.e. repeating a query
+    that found nothing may now find it.
+    """
+    was_replica = bool(db.info.get("replica"))
+    db.info["primary"] = True
+    db.info.pop("replica", None)
+    if was_replica:
+        replica_monitor.fallbacks += 1
+    return was_replica
@@ -0,0 +1,72 @@
+"""
+Periodic job that keeps the statistics rollups current.
+
+Every ROLLUP_INTERVAL_SECONDS `rollup_finished_tasks` folds the tasks
+finished since the last run into `task_rollup_hourly`, `task_rollup_daily`
+and `user_usage_daily` (see db/crud_rollup.py). The first run on an existing
+database backfills history in ROLLUP_BATCH_SIZE chunks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+from backend.app.core.config import settings
+from backend.app.db.crud_rollup import rollup_finished_tasks
+from backend.app.db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class RollupJob:
+    def __init__(self, interval_seconds: float, batch_size: int, lag_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.lag_seconds = lag_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.rolled_up = 0
+
+    async def run_once(self) -> int:
+        """Roll up every task finished so far (minus the lag window). Returns the number of tasks."""
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                n = await rollup_finished_tasks(db, self.batch_size, self.lag_seconds)
+            self.runs += 1
+            self.rolled_up += n
+            total += n
+            if n < self.batch_size:
+                return total
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Statistics rollup failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def start(self):
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "lag_seconds": self.lag_seconds,
+            "runs": self.runs,
+            "rolled_up": self.rolled_up,
+        }
+
+
+# 全局实例
+rollup_job = RollupJob(settings.ROLLUP_INTERVAL_SECONDS, settings.ROLLUP_BATCH_SIZE, settings.ROLLUP_LAG_SECONDS)
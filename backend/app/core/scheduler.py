@@ -0,0 +1,139 @@
+"""
+Deadline scheduling for the TTS queue.
+
+Every queued task carries an absolute deadline (monotonic clock):
+- an explicit `deadline_ms` from the client, or
+- the default of its priority class (realtime / standard / bulk).
+
+`DeadlineQueue` hands out the earliest deadline first (FIFO among equal
+deadlines, so one batch/script keeps its submission order). Bulk work gets a
+long but finite class deadline, which doubles as the starvation guard: once
+it has waited that long it sorts ahead of anything submitted later.
+
+`DeadlineScheduler` owns the policy: class deadlines, a service-time
+estimate (seconds per character, EWMA-updated from real inference timings)
+used to reject explicit deadlines that cannot be met, and met / missed /
+rejected counters per class.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+PRIORITY_CLASSES = ("realtime", "standard", "bulk")
+
+
+@dataclass(order=True)
+class ScheduledTask:
+    deadline: float
+    seq: int
+    task_id: str = field(compare=False)
+    text: str = field(compare=False)
+    voice_path: str = field(compare=False)
+    priority: str = field(default="standard", compare=False)
+    enqueued_at: float = field(default=0.0, compare=False)
+
+
+class DeadlineQueue(asyncio.Queue):
+    """asyncio.Queue of `ScheduledTask` ordered by deadline."""
+
+    def _init(self, maxsize):
+        self._queue = []
+        self.pending_chars = 0
+
+    def _put(self, item: ScheduledTask):
+        heapq.heappush(self._queue, item)
+        self.pending_chars += len(item.text)
+
+    def _get(self) -> ScheduledTask:
+        item = heapq.heappop(self._queue)
+        self.pending_chars -= len(item.text)
+        return item
+
+    def chars_before(self, deadline: float) -> int:
+        """Characters queued with a deadline at or before `deadline` (work that runs first)."""
+        return sum(len(t.text) for t in self._queue if t.deadline <= deadline)
+
+    def depth_by_class(self) -> Dict[str, int]:
+        depth = {p: 0 for p in PRIORITY_CLASSES}
+        for t in self._queue:
+            depth[t.priority] = depth.get(t.priority, 0) + 1
+        return depth
+
+
+class DeadlineScheduler:
+    def __init__(
+        self,
+        class_deadlines: Dict[str, float],
+        seconds_per_char: float,
+        min_chars: int = 10,
+        alpha: float = 0.2,
+    ):
+        self.class_deadlines = class_deadlines
+        self.seconds_per_char = seconds_per_char
+        self.min_chars = min_chars
+        self.alpha = alpha
+        self._seq = itertools.count()
+        self.counters: Dict[str, Dict[str, int]] = {
+            p: {"met": 0, "missed": 0, "rejected": 0} for p in PRIORITY_CLASSES
+        }
+
+    def make(
+        self,
+        task_id: str,
+        text: str,
+        voice_path: str,
+        priority: str = "standard",
+        deadline_ms: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> ScheduledTask:
+        if priority not in self.class_deadlines:
+            raise ValueError(f"unknown priority class: {priority}")
+        now = time.monotonic() if now is None else now
+        return ScheduledTask(
+            deadline=now + self.relative_deadline(priority, deadline_ms),
+            seq=next(self._seq),
+            task_id=task_id,
+            text=text,
+            voice_path=voice_path,
+            priority=priority,
+            enqueued_at=now,
+        )
+
+    def relative_deadline(self, priority: str, deadline_ms: Optional[int]) -> float:
+        if deadline_ms is not None:
+            return deadline_ms / 1000
+        return self.class_deadlines[priority]
+
+    def estimate_seconds(self, chars: int) -> float:
+        return self.seconds_per_char * max(chars, self.min_chars)
+
+    def observe(self, chars: int, elapsed: float) -> None:
+        """Fold one measured inference (chars synthesized in `elapsed` seconds) into the estimate."""
+        if chars <= 0 or elapsed <= 0:
+            return
+        sample = elapsed / max(chars, self.min_chars)
+        self.seconds_per_char += self.alpha * (sample - self.seconds_per_char)
+
+    def record(self, task: ScheduledTask, finished_at: Optional[float] = None) -> bool:
+        finished_at = time.monotonic() if finished_at is None else finished_at
+        met = finished_at <= task.deadline
+        self.counters[task.priority]["met" if met else "missed"] += 1
+        return met
+
+    def record_rejected(self, priority: str) -> None:
+        self.counters[priority]["rejected"] += 1
+
+    def stats(self, queue: Optional[DeadlineQueue] = None, active: Iterable[ScheduledTask] = ()) -> dict:
+        return {
+            "seconds_per_char": round(self.seconds_per_char, 5),
+            "queued": queue.depth_by_class() if queue is not None else {},
+            "queued_chars": queue.pending_chars if queue is not None else 0,
+            "active": [t.task_id for t in active],
+            "deadlines": {p: dict(c) for p, c in self.counters.items()},
+        }
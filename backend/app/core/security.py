@@ -1,10 +1,22 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from backend.app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min = max = default rounds: hashes made with any other cost are flagged by
+# needs_update / verify_and_update and rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -12,6 +24,87 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasher:
+    """
+    bcrypt on a dedicated, bounded thread pool (bcrypt releases the GIL).
+
+    Async handlers await `hash` / `verify_and_update` instead of running
+    bcrypt on the event loop. At most `max_pending` operations may be queued
+    or running; beyond that `PasswordHasherBusy` is raised so a login burst
+    sheds load instead of growing an unbounded backlog.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    def _timed(self, fn, enqueued_at: float, *args):
+        started = time.monotonic()
+        wait = started - enqueued_at
+        with self._lock:
+            self.running += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.run_seconds_total += time.monotonic() - started
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy("password hashing queue is full")
+        self.pending += 1
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, self._timed, fn, time.monotonic(), *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Returns `(valid, new_hash)`; new_hash is set when the stored hash uses an outdated cost."""
+        return await self._submit(pwd_context.verify_and_update, password, hashed_password)
+
+    def stats(self) -> dict:
+        done = max(self.completed, 1)
+        return {
+            "workers": self.workers,
+            "rounds": settings.BCRYPT_ROUNDS,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "running": self.running,
+            "queued": max(self.pending - self.running, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds_total / done * 1000, 2),
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 2),
+            "avg_run_ms": round(self.run_seconds_total / done * 1000, 2),
+        }
+
+
+# 全局实例
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
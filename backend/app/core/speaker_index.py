@@ -0,0 +1,158 @@
+"""
+Speaker-embedding index for "find similar voices".
+
+Embeddings produced by voice ingestion (`*.emb.npy`) are kept in one
+contiguous float32 matrix (row per voice, capacity doubled on growth), so a
+query is a single matrix-vector product plus `argpartition` top-k.
+
+Similarity is cosine over mean-centered embeddings: the raw MFCC statistics
+share a large common component, and centering on the index mean makes the
+score reflect what distinguishes one speaker from the rest. The centered,
+L2-normalized matrix is cached and recomputed lazily after edits.
+
+The index is kept in sync with the voice catalog: added/changed voices are
+upserted, removed voices are dropped (swap-with-last, O(d)).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SpeakerIndex:
+    def __init__(self, dim: int = 0, capacity: int = 64):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._stamps: Dict[str, tuple] = {}
+        self._sum = np.zeros(dim, dtype=np.float64)
+        self._normalized: Optional[np.ndarray] = None
+        self._mean: Optional[np.ndarray] = None
+        self._frozen_ids: Tuple[str, ...] = ()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, voice_id: str) -> bool:
+        return voice_id in self._rows
+
+    def _ensure_dim(self, dim: int) -> None:
+        if self.dim == dim:
+            return
+        if self._ids:
+            raise ValueError(f"embedding dim {dim} does not match index dim {self.dim}")
+        self.dim = dim
+        self._matrix = np.zeros((self._matrix.shape[0], dim), dtype=np.float32)
+        self._sum = np.zeros(dim, dtype=np.float64)
+
+    def upsert(self, voice_id: str, embedding: np.ndarray, stamp: tuple = ()) -> None:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            self._ensure_dim(embedding.shape[0])
+            row = self._rows.get(voice_id)
+            if row is None:
+                row = len(self._ids)
+                if row == self._matrix.shape[0]:
+                    grown = np.zeros((max(1, row * 2), self.dim), dtype=np.float32)
+                    grown[:row] = self._matrix[:row]
+                    self._matrix = grown
+                self._ids.append(voice_id)
+                self._rows[voice_id] = row
+            else:
+                self._sum -= self._matrix[row]
+            self._matrix[row] = embedding
+            self._sum += embedding
+            self._stamps[voice_id] = stamp
+            self._normalized = None
+
+    def remove(self, voice_id: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(voice_id, None)
+            if row is None:
+                return False
+            self._stamps.pop(voice_id, None)
+            self._sum -= self._matrix[row]
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+            self._normalized = None
+            return True
+
+    def _prepared(self) -> Tuple[np.ndarray, np.ndarray, Tuple[str, ...]]:
+        """Centered + L2-normalized view (cached until the next edit). Caller holds the lock."""
+        if self._normalized is None:
+            n = len(self._ids)
+            mean = (self._sum / max(n, 1)).astype(np.float32)
+            centered = self._matrix[:n] - mean
+            norms = np.linalg.norm(centered, axis=1, keepdims=True)
+            self._normalized = centered / np.maximum(norms, 1e-8)
+            self._mean = mean
+            self._frozen_ids = tuple(self._ids)
+        return self._normalized, self._mean, self._frozen_ids
+
+    def _top_k(self, query: np.ndarray, k: int, exclude: Optional[str]) -> List[Tuple[str, float]]:
+        with self._lock:
+            if not self._ids:
+                return []
+            matrix, mean, ids = self._prepared()
+            exclude_row = self._rows.get(exclude) if exclude is not None else None
+        q = np.asarray(query, dtype=np.float32).ravel() - mean
+        q /= max(float(np.linalg.norm(q)), 1e-8)
+        scores = matrix @ q
+        if exclude_row is not None:
+            scores[exclude_row] = -np.inf
+        k = min(k, len(ids) - (1 if exclude_row is not None else 0))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def similar_to(self, voice_id: str, k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """Top-k neighbours of an indexed voice (itself excluded); None when not indexed."""
+        with self._lock:
+            row = self._rows.get(voice_id)
+            if row is None:
+                return None
+            query = self._matrix[row].copy()
+        return self._top_k(query, k, exclude=voice_id)
+
+    def query(self, embedding: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k neighbours of an arbitrary embedding (e.g. an uploaded clip)."""
+        return self._top_k(embedding, k, exclude=None)
+
+    def sync(self, snapshot) -> None:
+        """Bring the index in line with a voice catalog snapshot (only changed voices are loaded)."""
+        wanted = {
+            vid: v for vid, v in snapshot.voices.items()
+            if v.get("embedding_path")
+        }
+        for vid in [vid for vid in self._rows if vid not in wanted]:
+            self.remove(vid)
+        updated = 0
+        for vid, v in wanted.items():
+            if self._stamps.get(vid) == v["artifact_stamp"] and vid in self._rows:
+                continue
+            try:
+                self.upsert(vid, np.load(v["embedding_path"]), v["artifact_stamp"])
+                updated += 1
+            except Exception as e:
+                logger.error(f"Failed to load speaker embedding for {vid}: {e}")
+        if updated:
+            logger.info(f"Speaker index: {updated} updated, {len(self)} indexed")
+
+
+# 全局实例
+speaker_index = SpeakerIndex()
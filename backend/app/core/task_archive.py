@@ -0,0 +1,156 @@
+"""
+Cold storage for old tasks.
+
+Every TASK_ARCHIVE_INTERVAL_SECONDS, tasks finished more than
+TASK_ARCHIVE_AFTER_DAYS ago are appended to gzip-compressed JSON Lines files
+in TASK_ARCHIVE_DIR, one file per month of `completed_at`
+(`tasks-2025-01.jsonl.gz`), and then narrowed in the database to a summary
+row (see db/crud_archive.py).
+
+Each batch is written and fsynced before its rows are narrowed. If the
+process dies in between, the next run appends the same rows again, so
+`read_archived_task` keeps the last record per task id.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import glob
+import gzip
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+from backend.app.core.config import settings
+from backend.app.db.crud_archive import ARCHIVE_COLUMNS, mark_tasks_archived, select_tasks_to_archive
+from backend.app.db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def archive_path(directory: str, completed_at: datetime.datetime) -> str:
+    return os.path.join(directory, f"tasks-{completed_at:%Y-%m}.jsonl.gz")
+
+
+def _record(row) -> dict:
+    record = {}
+    for column in ARCHIVE_COLUMNS:
+        value = getattr(row, column.key)
+        record[column.key] = value.isoformat() if isinstance(value, datetime.datetime) else value
+    return record
+
+
+def write_archive(directory: str, rows: Iterable) -> Dict[str, int]:
+    """Append rows to their monthly files (one gzip member per file and call). Returns {path: rows}."""
+    by_path: Dict[str, list] = {}
+    for row in rows:
+        by_path.setdefault(archive_path(directory, row.completed_at), []).append(row)
+    for path, group in by_path.items():
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                for row in group:
+                    gz.write((json.dumps(_record(row), ensure_ascii=False) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+    return {path: len(group) for path, group in by_path.items()}
+
+
+def read_archived_task(
+    directory: str,
+    task_id: str,
+    completed_at: Optional[datetime.datetime] = None,
+) -> Optional[dict]:
+    """
+    Full archived record of a task, or None. With `completed_at` (kept on the
+    narrow row) only that month's file is read; otherwise every file is scanned.
+    """
+    if completed_at is not None:
+        paths = [archive_path(directory, completed_at)]
+    else:
+        paths = sorted(glob.glob(os.path.join(directory, "tasks-*.jsonl.gz")))
+    found = None
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if task_id in line:
+                    record = json.loads(line)
+                    if record["id"] == task_id:
+                        found = record
+    return found
+
+
+class TaskArchiver:
+    def __init__(self, directory: str, after_days: int, interval_seconds: float, batch_size: int):
+        self.directory = directory
+        self.after_days = after_days
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.archived = 0
+        self.last_run_at: Optional[datetime.datetime] = None
+
+    async def run_once(self) -> int:
+        """Archive every eligible task now. Returns the number of tasks archived."""
+        loop = asyncio.get_running_loop()
+        before = datetime.datetime.utcnow() - datetime.timedelta(days=self.after_days)
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                mark, rows = await select_tasks_to_archive(
+                    db, before, self.batch_size, after_rollup=settings.ROLLUP_INTERVAL_SECONDS > 0
+                )
+                if not rows:
+                    break
+                await loop.run_in_executor(None, write_archive, self.directory, rows)
+                if not await mark_tasks_archived(db, mark, rows):
+                    break  # another process is archiving the same range
+            total += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        self.runs += 1
+        self.archived += total
+        self.last_run_at = datetime.datetime.utcnow()
+        return total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                archived = await self.run_once()
+                if archived:
+                    logger.info(f"Archived {archived} tasks to {self.directory}")
+            except Exception as e:
+                logger.error(f"Task archival failed: {e}")
+
+    async def start(self):
+        if self._task is None and self.interval_seconds > 0 and self.after_days > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "after_days": self.after_days,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# 全局实例
+task_archiver = TaskArchiver(
+    settings.TASK_ARCHIVE_DIR,
+    settings.TASK_ARCHIVE_AFTER_DAYS,
+    settings.TASK_ARCHIVE_INTERVAL_SECONDS,
+    settings.TASK_ARCHIVE_BATCH_SIZE,
+)
@@ -0,0 +1,83 @@
+"""
+In-process task status registry (backs `GET /tts/status?ids=...&wait=`).
+
+The TTS worker publishes every status change here right after committing it,
+and long-poll requests park on an `asyncio.Event` until one of their task ids
+is published (or the wait times out). The database stays the source of truth:
+the registry only holds the latest few thousand transitions, so a request that
+misses it still answers from the DB.
+
+Only tasks processed by this process's worker are published; with several API
+processes a long-poll on another process's task simply runs to its timeout.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+
+
+class TaskStatusRegistry:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # task_id -> (status, output_url, error)
+        self._entries: "OrderedDict[str, Tuple[str, Optional[str], Optional[str]]]" = OrderedDict()
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+
+    def get(self, task_id: str) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        return self._entries.get(task_id)
+
+    def publish(self, task_id: str, status: str, output_url: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record a committed status change and wake every request waiting on this task."""
+        self._entries[task_id] = (status, output_url, error)
+        self._entries.move_to_end(task_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        for event in self._waiters.get(task_id, ()):
+            event.set()
+
+    async def wait_any(self, known: Dict[str, str], timeout: float) -> bool:
+        """
+        Wait until any task in `known` (task_id -> status as last read) changes.
+
+        Returns True when a change was seen, False on timeout.
+        """
+        if self._changed(known):
+            return True
+        event = asyncio.Event()
+        for task_id in known:
+            self._waiters.setdefault(task_id, set()).add(event)
+        try:
+            # A change published between the caller's read and registration is caught here
+            if self._changed(known):
+                return True
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+        finally:
+            self._discard(event, known)
+
+    def _changed(self, known: Dict[str, str]) -> bool:
+        for task_id, status in known.items():
+            entry = self._entries.get(task_id)
+            if entry is not None and entry[0] != status:
+                return True
+        return False
+
+    def _discard(self, event: asyncio.Event, task_ids: Iterable[str]) -> None:
+        for task_id in task_ids:
+            waiters = self._waiters.get(task_id)
+            if waiters is None:
+                continue
+            waiters.discard(event)
+            if not waiters:
+                del self._waiters[task_id]
+
+
+# 全局实例
+task_status_registry = TaskStatusRegistry()
@@ -0,0 +1,115 @@
+"""
+Incremental sentence segmentation for streamed text (`/tts/stream`).
+
+Text arrives in arbitrary fragments (LLM tokens). The segmenter buffers them
+and emits a sentence as soon as a boundary is seen, so synthesis can start
+before the full text exists:
+
+- hard boundaries: 。！？；… ! ? ; newline, and "." followed by whitespace
+  (so "3.14" or "e.g" mid-token is not cut); trailing closing quotes/brackets
+  stay with their sentence
+- the first sentence of a stream may also be cut at a comma once it reaches
+  `first_cut_chars`, which shortens the time to first audio
+- a buffer longer than `max_chars` is cut at its last comma/space (or hard
+  at `max_chars`) so one run-on sentence cannot stall the stream
+
+Segments without any speakable character (bare punctuation) are dropped.
+
+`split_segments` applies the same rules to a complete text and packs the
+sentences into segments of bounded length (time-sliced synthesis of long
+queue tasks).
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+
+HARD_BOUNDARIES = set("。！？；…!?;\n")
+SOFT_BOUNDARIES = set("，、：,:")
+CLOSERS = set("”’」』）》】\"')]")
+
+_SPEAKABLE = re.compile(r"\w")
+
+
+class SentenceSegmenter:
+    def __init__(self, first_cut_chars: int = 12, max_chars: int = 120):
+        if max_chars <= 0:
+            raise ValueError("max_chars must be positive")
+        self.first_cut_chars = first_cut_chars
+        self.max_chars = max_chars
+        self.emitted = 0
+        self._buf = ""
+
+    @property
+    def pending(self) -> str:
+        return self._buf
+
+    def _find_cut(self) -> Optional[int]:
+        buf = self._buf
+        n = len(buf)
+        last_soft = None
+        for i, ch in enumerate(buf):
+            if i >= self.max_chars:
+                break
+            if ch in HARD_BOUNDARIES or (ch == "." and i + 1 < n and buf[i + 1].isspace()):
+                end = i + 1
+                while end < n and (buf[end] in HARD_BOUNDARIES or buf[end] in CLOSERS):
+                    end += 1
+                return end
+            if ch in SOFT_BOUNDARIES or ch.isspace():
+                last_soft = i + 1
+                if ch in SOFT_BOUNDARIES and self.emitted == 0 and i + 1 >= self.first_cut_chars:
+                    return i + 1
+        if n > self.max_chars:
+            return last_soft or self.max_chars
+        return None
+
+    def _take(self, cut: int, out: List[str]) -> None:
+        segment = self._buf[:cut].strip()
+        self._buf = self._buf[cut:]
+        if _SPEAKABLE.search(segment):
+            out.append(segment)
+            self.emitted += 1
+
+    def feed(self, fragment: str) -> List[str]:
+        """Append a fragment and return every sentence completed by it."""
+        self._buf += fragment
+        out: List[str] = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return out
+            self._take(cut, out)
+
+    def flush(self) -> List[str]:
+        """Emit whatever is buffered (end of stream / explicit client flush)."""
+        out: List[str] = []
+        while len(self._buf) > self.max_chars:
+            self._take(self._find_cut(), out)
+        if self._buf:
+            self._take(len(self._buf), out)
+        return out
+
+
+def split_segments(text: str, max_chars: int) -> List[str]:
+    """
+    Split a complete text into sentence-aligned segments of at most `max_chars`
+    (a single sentence longer than that is cut at a comma/space).
+    """
+    segmenter = SentenceSegmenter(first_cut_chars=max_chars + 1, max_chars=max_chars)
+    sentences = segmenter.feed(text) + segmenter.flush()
+    if not sentences:
+        return [text]
+    segments: List[str] = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = ""
+        if current:
+            current += " " + sentence if current[-1].isascii() else sentence
+        else:
+            current = sentence
+    segments.append(current)
+    return segments
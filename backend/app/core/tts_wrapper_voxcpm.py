@@ -6,14 +6,42 @@ import sys
 import os
 import asyncio
 import logging
+import re
+import time
 import uuid
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from backend.app.core.config import settings
+from backend.app.core.voice_ingest import resolve_prompt
+from backend.app.core.audio_utils import PartialAudio
+from backend.app.core.text_segmenter import split_segments
+from backend.app.core.scheduler import DeadlineQueue, DeadlineScheduler
 from backend.app.db.database import AsyncSessionLocal
 from backend.app.db.crud_task import update_task_status
+from backend.app.core.task_status import task_status_registry
+from backend.app.core.webhooks import webhook_dispatcher
+from backend.app.core.rate_limit import inflight_tracker
+from backend.app.core.write_queue import write_queue
 
 logger = logging.getLogger(__name__)
 
+
+class _SlicedJob:
+    """长任务的时间片状态：剩余 segment 与已合成的部分音频"""
+
+    def __init__(self, task, segments):
+        self.task = task  # ScheduledTask
+        self.task_id = task.task_id
+        self.voice_path = task.voice_path
+        self.segments = segments
+        self.next = 0
+        self.audio = None
+
+    @property
+    def remaining_chars(self) -> int:
+        return sum(len(s) for s in self.segments[self.next:])
+
+
 class VoxCPMEngine:
     _instance = None
     
@@ -24,6 +52,20 @@ class VoxCPMEngine:
             # queue 延迟到初始化时绑定当前事件循环，避免跨事件循环挂起
             cls._instance.queue = None
             cls._instance.executor = ThreadPoolExecutor(max_workers=1)
+            # 音色 prompt 特征缓存（仅在推理线程内访问）：同一音色的连续任务复用 VAE 编码结果
+            cls._instance.prompt_cache = OrderedDict()
+            # EDF 调度策略（截止时间 / 服务时间估计 / 按优先级统计）
+            cls._instance.scheduler = DeadlineScheduler(
+                class_deadlines={
+                    "realtime": settings.TTS_DEADLINE_REALTIME_SECONDS,
+                    "standard": settings.TTS_DEADLINE_STANDARD_SECONDS,
+                    "bulk": settings.TTS_DEADLINE_BULK_SECONDS,
+                },
+                seconds_per_char=settings.TTS_SERVICE_SECONDS_PER_CHAR,
+            )
+            # worker 当前执行中的任务（用于准入估计）
+            cls._instance.current = None
+            cls._instance.sliced = []
         return cls._instance
 
     def initialize(self):
@@ -62,8 +104,8 @@ class VoxCPMEngine:
             logger.info(f"   采样率: {self.model.tts_model.sample_rate}")
             logger.info(f"   设备: {self.model.tts_model.device}")
             
-            # 绑定queue到当前事件循环，防止旧loop导致get/put阻塞
-            self.queue = asyncio.Queue()
+            # 绑定queue到当前事件循环，防止旧loop导致get/put阻塞（按截止时间出队）
+            self.queue = DeadlineQueue()
             print("Queue created and bound to current event loop.")
             logger.info("Queue created and bound to current event loop.")
             
@@ -82,6 +124,13 @@ class VoxCPMEngine:
         - API 层快速返回 task_id（queued）
         - GPU 推理在单 worker + 单 GPU 上串行执行（ThreadPoolExecutor max_workers=1）
         - 任务状态（PROCESSING/COMPLETED/FAILED）与 output_url/error_message 全部落库
+        
+        调度：
+        - 队列按截止时间出队（EDF，见 core/scheduler.py）
+        - 短任务（<= TTS_SLICE_THRESHOLD_CHARS）一次合成完成
+        - 长任务按句切分为 segment，每次只合成一个 segment；两个 segment 之间
+          最多插入 TTS_SLICE_SHORT_BURST 个排队中的短任务，多个长任务之间按截止时间选择
+        - 已合成的部分音频保存在内存，超过 TTS_SLICE_SPILL_SECONDS 后落盘
         """
         print("="*60)
         print("🚀 VoxCPM Worker started!")
@@ -89,59 +138,201 @@ class VoxCPMEngine:
         print(f"[Worker] queue id: {id(self.queue)}")
         logger.info("VoxCPM Worker started.")
         
+        sliced = self.sliced  # 进行中的长任务
+        short_burst = 0       # 自上一个 segment 以来插队执行的短任务数
         while True:
-            print(f"⏳ Waiting for task from queue... (model: {self.model is not None}) queue id: {id(self.queue)} size: {self.queue.qsize() if self.queue else 'None'}")
-            task_data = await self.queue.get()
-            task_id, text, voice_path = task_data
+            if not self.queue.empty() and (not sliced or short_burst < settings.TTS_SLICE_SHORT_BURST):
+                task = self.queue.get_nowait()
+            elif sliced:
+                job = min(sliced, key=lambda j: j.task.deadline)
+                short_burst = 0
+                if not await self._run_slice(job):
+                    sliced.remove(job)
+                continue
+            else:
+                print(f"⏳ Waiting for task from queue... (model: {self.model is not None}) queue id: {id(self.queue)} size: {self.queue.qsize() if self.queue else 'None'}")
+                task = await self.queue.get()
             
-            print(f"📝 Got task {task_id}: {text[:50]}")
+            print(f"📝 Got task {task.task_id} ({task.priority}): {task.text[:50]}")
             
             try:
-                print(f"🎵 Processing task {task_id}...")
-                logger.info(f"Processing task {task_id}...")
-                
-                # 标记任务为处理中（落库）
-                async with AsyncSessionLocal() as db:
-                    await update_task_status(db, task_id, "PROCESSING")
-                
-                output_filename = f"{task_id}.wav"
-                output_path = os.path.join(settings.GENERATED_AUDIO_DIR, output_filename)
-                
-                print(f"   输出路径: {output_path}")
-                print(f"   音色文件: {voice_path}")
-                
-                # 在单独线程中运行推理
-                loop = asyncio.get_event_loop()
-                print(f"   开始推理...")
-                await loop.run_in_executor(
-                    self.executor,
-                    self._run_inference,
-                    text,
-                    voice_path,
-                    output_path
-                )
-                
-                result_url = f"/static/generated/{output_filename}"
-                print(f"   推理完成，更新任务状态: {result_url}")
-                async with AsyncSessionLocal() as db:
-                    await update_task_status(db, task_id, "COMPLETED", output_url=result_url)
-
-                print(f"✅ Task {task_id} completed successfully!")
-                logger.info(f"✅ Task {task_id} completed successfully")
-                
-            except Exception as e:
-                print(f"❌ Error processing task {task_id}: {e}")
-                logger.error(f"❌ Error processing task {task_id}: {e}")
-                import traceback
-                traceback.print_exc()
-                error_msg = str(e) if e else "Unknown error"
-                async with AsyncSessionLocal() as db:
-                    await update_task_status(db, task_id, "FAILED", error_message=error_msg)
+                threshold = settings.TTS_SLICE_THRESHOLD_CHARS
+                if threshold > 0 and len(task.text) > threshold:
+                    job = await self._start_sliced(task)
+                    if job is not None:
+                        sliced.append(job)
+                else:
+                    if sliced:
+                        short_burst += 1
+                    await self._run_task(task)
             finally:
                 self.queue.task_done()
 
+    def estimate_finish_ms(self, chars: int, priority: str = "standard", deadline_ms=None) -> int:
+        """
+        估计新任务的完成时间（毫秒）：截止时间不晚于它的排队任务 + 执行中的任务 + 自身。
+        """
+        scheduler = self.scheduler
+        deadline = time.monotonic() + scheduler.relative_deadline(priority, deadline_ms)
+        ahead = self.queue.chars_before(deadline) if isinstance(self.queue, DeadlineQueue) else 0
+        ahead += sum(j.remaining_chars for j in self.sliced if j.task.deadline <= deadline)
+        seconds = scheduler.estimate_seconds(chars) + scheduler.seconds_per_char * ahead
+        if self.current is not None:
+            seconds += scheduler.estimate_seconds(len(self.current))
+        return int(seconds * 1000)
+
+    def scheduler_stats(self) -> dict:
+        queue = self.queue if isinstance(self.queue, DeadlineQueue) else None
+        return self.scheduler.stats(queue, active=[j.task for j in self.sliced])
+
+    async def _infer(self, fn, text: str, *args):
+        """在推理线程执行一次合成，并用耗时更新服务时间估计"""
+        loop = asyncio.get_event_loop()
+        self.current = text
+        start = time.monotonic()
+        try:
+            result = await loop.run_in_executor(self.executor, fn, text, *args)
+        finally:
+            self.current = None
+        self.scheduler.observe(len(text), time.monotonic() - start)
+        return result
+
+    async def _write_status(self, task_id: str, status: str, **fields):
+        # 状态落库（SQLite 模式下经写队列合并提交）
+        async with AsyncSessionLocal() as db:
+            return await write_queue.run(
+                db, lambda session: update_task_status(session, task_id, status, commit=False, **fields)
+            )
+
+    async def _mark_processing(self, task_id: str):
+        # 标记任务为处理中（落库）
+        await self._write_status(task_id, "PROCESSING")
+        task_status_registry.publish(task_id, "PROCESSING")
+
+    async def _mark_completed(self, scheduled, result_url: str):
+        task_id = scheduled.task_id
+        met = self.scheduler.record(scheduled)
+        inflight_tracker.finish(task_id)
+        task = await self._write_status(task_id, "COMPLETED", output_url=result_url)
+        task_status_registry.publish(task_id, "COMPLETED", output_url=result_url)
+        if task is not None:
+            webhook_dispatcher.notify_task(task)
+        print(f"✅ Task {task_id} completed successfully!")
+        logger.info(f"✅ Task {task_id} completed successfully ({scheduled.priority}, deadline {'met' if met else 'missed'})")
+
+    async def _mark_failed(self, task_id: str, e: Exception):
+        print(f"❌ Error processing task {task_id}: {e}")
+        logger.error(f"❌ Error processing task {task_id}: {e}")
+        import traceback
+        traceback.print_exc()
+        error_msg = str(e) if e else "Unknown error"
+        inflight_tracker.finish(task_id)
+        task = await self._write_status(task_id, "FAILED", error_message=error_msg)
+        task_status_registry.publish(task_id, "FAILED", error=error_msg)
+        if task is not None:
+            webhook_dispatcher.notify_task(task)
+
+    async def _run_task(self, task):
+        """一次性合成整个任务（短任务）"""
+        task_id = task.task_id
+        try:
+            print(f"🎵 Processing task {task_id}...")
+            logger.info(f"Processing task {task_id}...")
+            await self._mark_processing(task_id)
+            
+            output_filename = f"{task_id}.wav"
+            output_path = os.path.join(settings.GENERATED_AUDIO_DIR, output_filename)
+            
+            print(f"   输出路径: {output_path}")
+            print(f"   音色文件: {task.voice_path}")
+            
+            # 在单独线程中运行推理
+            print(f"   开始推理...")
+            await self._infer(self._run_inference, task.text, task.voice_path, output_path)
+            
+            result_url = f"/static/generated/{output_filename}"
+            print(f"   推理完成，更新任务状态: {result_url}")
+            await self._mark_completed(task, result_url)
+            
+        except Exception as e:
+            await self._mark_failed(task_id, e)
+
+    async def _start_sliced(self, task):
+        """长任务：标记处理中并切分 segment，返回待调度的 job（失败时返回 None）"""
+        try:
+            await self._mark_processing(task.task_id)
+            segments = split_segments(task.text, settings.TTS_SLICE_SEGMENT_CHARS)
+            print(f"🎵 Processing task {task.task_id} in {len(segments)} segments...")
+            logger.info(f"Processing task {task.task_id} in {len(segments)} segments")
+            return _SlicedJob(task, segments)
+        except Exception as e:
+            await self._mark_failed(task.task_id, e)
+            return None
+
+    async def _run_slice(self, job: "_SlicedJob") -> bool:
+        """合成长任务的下一个 segment；还有剩余 segment 时返回 True"""
+        loop = asyncio.get_event_loop()
+        try:
+            segment = job.segments[job.next]
+            wav = await self._infer(self._synthesize, segment, job.voice_path)
+            if job.audio is None:
+                job.audio = PartialAudio(
+                    os.path.join(settings.GENERATED_AUDIO_DIR, f"{job.task_id}.partial.wav"),
+                    self.model.tts_model.sample_rate,
+                    spill_seconds=settings.TTS_SLICE_SPILL_SECONDS,
+                    pause_ms=settings.TTS_SLICE_PAUSE_MS,
+                )
+            await loop.run_in_executor(None, job.audio.append, wav)
+            job.next += 1
+            if job.next < len(job.segments):
+                return True
+
+            output_filename = f"{job.task_id}.wav"
+            output_path = os.path.join(settings.GENERATED_AUDIO_DIR, output_filename)
+            await loop.run_in_executor(None, job.audio.finish, output_path)
+            await self._mark_completed(job.task, f"/static/generated/{output_filename}")
+        except Exception as e:
+            if job.audio is not None:
+                job.audio.discard()
+            await self._mark_failed(job.task_id, e)
+        return False
+
+    def _get_prompt_cache(self, prompt_wav_path, prompt_text):
+        """
+        返回音色 prompt 的编码缓存（LRU，容量 TTS_PROMPT_CACHE_SIZE）。
+
+        - key 含文件 mtime，音色重新 ingest 后自动失效
+        - 模型不支持 build_prompt_cache 或无 prompt 时返回 None（走 model.generate）
+        """
+        if not prompt_wav_path or not prompt_text or settings.TTS_PROMPT_CACHE_SIZE <= 0:
+            return None
+        tts_model = self.model.tts_model
+        if not hasattr(tts_model, "build_prompt_cache") or not hasattr(tts_model, "generate_with_prompt_cache"):
+            return None
+
+        key = (prompt_wav_path, os.path.getmtime(prompt_wav_path), prompt_text)
+        cache = self.prompt_cache.get(key)
+        if cache is not None:
+            self.prompt_cache.move_to_end(key)
+            return cache
+
+        cache = tts_model.build_prompt_cache(prompt_text=prompt_text, prompt_wav_path=prompt_wav_path)
+        self.prompt_cache[key] = cache
+        while len(self.prompt_cache) > settings.TTS_PROMPT_CACHE_SIZE:
+            self.prompt_cache.popitem(last=False)
+        return cache
+
     def _run_inference(self, text: str, voice_path: str, output_path: str):
-        """同步推理方法（线程池内防御性检查）"""
+        """同步推理并写出 wav（队列任务路径）"""
+        import soundfile as sf
+
+        wav = self._synthesize(text, voice_path)
+        sf.write(output_path, wav, self.model.tts_model.sample_rate)
+        logger.info(f"✅ Audio saved to: {output_path}")
+        return output_path
+
+    def _synthesize(self, text: str, voice_path: str):
+        """同步推理方法（线程池内防御性检查），返回 numpy 波形"""
         if self.model is None:
             logger.warning("Model not initialized in executor thread, re-initializing...")
             try:
@@ -162,20 +353,8 @@ class VoxCPMEngine:
             raise RuntimeError("VoxCPM Model not initialized")
         
         try:
-            import soundfile as sf
-            
-            # 处理 voice_path（可能为空字符串或None）
-            prompt_wav_path = None
-            prompt_text = None
-            txt_path = None
-            
-            if voice_path and os.path.exists(voice_path):
-                prompt_wav_path = voice_path
-                # 读取voice的transcript（如果有）
-                txt_path = os.path.splitext(voice_path)[0] + ".txt"
-            if txt_path and os.path.exists(txt_path):
-                with open(txt_path, 'r', encoding='utf-8') as f:
-                    prompt_text = f.read().strip()
+            # 只使用预处理后的音色产物（voice_artifacts；缺失或过期时先 ingest）
+            prompt_wav_path, prompt_text = resolve_prompt(voice_path)
             
             logger.info(f"Generating audio for: {text[:50]}...")
             logger.info(f"Voice reference: {prompt_wav_path or 'None'}")
@@ -185,26 +364,36 @@ class VoxCPMEngine:
             print(f"   Model device: {self.model.tts_model.device}")
             
             # 调用VoxCPM生成
-            print(f"   Calling model.generate()...")
-            wav = self.model.generate(
-                text=text,
-                prompt_wav_path=prompt_wav_path,  # 参考音色（可能为None）
-                prompt_text=prompt_text,          # 参考文本（可能为None）
-                cfg_value=2.0,                   # 引导强度
-                inference_timesteps=10,           # 推理步数（越高质量越好但越慢）
-                normalize=False,                  # 不使用外部文本标准化
-                denoise=False,                    # 不使用去噪（保持原始采样率）
-                retry_badcase=True,               # 自动重试失败case
-                retry_badcase_max_times=3,
-                retry_badcase_ratio_threshold=6.0
-            )
+            prompt_cache = self._get_prompt_cache(prompt_wav_path, prompt_text)
+            if prompt_cache is not None:
+                # 复用已编码的音色 prompt，跳过每次任务的音频加载 + VAE 编码
+                print(f"   Calling tts_model.generate_with_prompt_cache()...")
+                wav, _, _ = self.model.tts_model.generate_with_prompt_cache(
+                    target_text=re.sub(r"\s+", " ", text.replace("\n", " ")),
+                    prompt_cache=prompt_cache,
+                    cfg_value=2.0,
+                    inference_timesteps=10,
+                    retry_badcase=True,
+                    retry_badcase_max_times=3,
+                    retry_badcase_ratio_threshold=6.0
+                )
+                wav = wav.squeeze(0).cpu().numpy()
+            else:
+                print(f"   Calling model.generate()...")
+                wav = self.model.generate(
+                    text=text,
+                    prompt_wav_path=prompt_wav_path,  # 参考音色（可能为None）
+                    prompt_text=prompt_text,          # 参考文本（可能为None）
+                    cfg_value=2.0,                   # 引导强度
+                    inference_timesteps=10,           # 推理步数（越高质量越好但越慢）
+                    normalize=False,                  # 不使用外部文本标准化
+                    denoise=False,                    # 不使用去噪（保持原始采样率）
+                    retry_badcase=True,               # 自动重试失败case
+                    retry_badcase_max_times=3,
+                    retry_badcase_ratio_threshold=6.0
+                )
             print(f"✅ [Inference] Model.generate() completed, output shape: {wav.shape}")
-            
-            # 保存音频
-            sf.write(output_path, wav, self.model.tts_model.sample_rate)
-            logger.info(f"✅ Audio saved to: {output_path}")
-            
-            return output_path
+            return wav
             
         except Exception as e:
             error_msg = str(e) if e else "Unknown error"
@@ -215,7 +404,32 @@ class VoxCPMEngine:
             traceback.print_exc()
             raise e
 
-    async def submit_task(self, task_id: str, text: str, voice_path: str):
+    def _prepare_voice(self, voice_path: str):
+        if self.model is None:
+            return
+        prompt_wav_path, prompt_text = resolve_prompt(voice_path)
+        self._get_prompt_cache(prompt_wav_path, prompt_text)
+
+    async def prepare_voice(self, voice_path: str):
+        """
+        预先编码音色 prompt（/tts/stream 会话开始时调用一次）。
+
+        在推理线程内执行，编码结果进入 prompt_cache，会话内后续每句直接复用。
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self._prepare_voice, voice_path)
+
+    async def synthesize(self, text: str, voice_path: str):
+        """
+        直接合成一段文本并返回 (wav, sample_rate)，不落库、不写文件（/tts/stream）。
+
+        与队列任务共用同一个单线程 executor，GPU 推理仍然串行。
+        """
+        loop = asyncio.get_event_loop()
+        wav = await loop.run_in_executor(self.executor, self._synthesize, text, voice_path)
+        return wav, self.model.tts_model.sample_rate
+
+    async def submit_task(self, task_id: str, text: str, voice_path: str, priority: str = "standard", deadline_ms=None):
         """
         提交任务到 TTS 队列（v0.1 标准路径）。
         
@@ -223,19 +437,35 @@ class VoxCPMEngine:
         - task_id: 数据库 Task.id（由 API 层创建并落库）
         - text: 待合成文本
         - voice_path: 音色 wav 的绝对路径
+        - priority: realtime / standard / bulk（决定默认截止时间）
+        - deadline_ms: 显式截止时间（相对提交时刻，毫秒），优先于 priority 默认值
         """
         
-        print(f"📤 Submitting task {task_id} to queue")
+        print(f"📤 Submitting task {task_id} to queue ({priority})")
         print(f"   Text: {text[:50]}")
         print(f"   Voice: {voice_path}")
         print(f"   Queue size before: {self.queue.qsize()}")
         
-        await self.queue.put((task_id, text, voice_path))
+        await self.queue.put(self.scheduler.make(task_id, text, voice_path, priority, deadline_ms))
         
         print(f"   Queue size after: {self.queue.qsize()}")
         print(f"✅ Task submitted to queue")
         return task_id
 
+    async def submit_tasks(self, tasks, priority: str = "standard", deadline_ms=None):
+        """
+        批量提交任务到 TTS 队列（/tts/batch）。
+
+        参数：
+        - tasks: [(task_id, text, voice_path), ...]，按提交顺序入队
+        - priority / deadline_ms: 同 submit_task；整批共用同一截止时间，批内保持提交顺序
+        """
+        now = time.monotonic()
+        for task_id, text, voice_path in tasks:
+            self.queue.put_nowait(self.scheduler.make(task_id, text, voice_path, priority, deadline_ms, now=now))
+        print(f"📤 Submitted {len(tasks)} tasks to queue (size: {self.queue.qsize()})")
+        return [task[0] for task in tasks]
+
 # 全局实例
 voxcpm_engine = VoxCPMEngine()
 
@@ -0,0 +1,138 @@
+"""
+Authenticated-user cache (backs `get_current_user` in `core/deps.py`).
+
+Every authenticated request used to load the full `User` row after decoding
+the JWT. The cache keeps a small immutable `AuthUser` per user id for
+AUTH_USER_CACHE_TTL_SECONDS, so a hit costs no database round trip.
+
+- Only what auth checks and most handlers read is cached (id, email, admin
+  flag, balance). The balance is a snapshot: endpoints that report it use
+  `get_current_user_fresh`, which always reads the row.
+- Code that changes those fields calls `user_cache.invalidate(user_id)`
+  (credit ledger, balance helpers). Changes made outside the API (SQL
+  console) become visible after at most one TTL.
+- A load that started before an invalidation does not repopulate the entry
+  (per-user generation check), so a racing request cannot re-cache a stale row.
+"""
+
+from __future__ import annotations
+
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+from backend.app.core.config import settings
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """
+    Identity of the authenticated caller, detached from any DB session.
+
+    `api_key_id` / `scopes` are set when the caller used an API key; JWT
+    sessions have `scopes=None` (unrestricted).
+    """
+
+    id: str
+    email: str
+    is_admin: bool
+    credits_balance: int
+    api_key_id: Optional[str] = None
+    scopes: Optional[FrozenSet[str]] = None
+
+    def has_scope(self, scope: str) -> bool:
+        return self.scopes is None or scope in self.scopes
+
+    @classmethod
+    def from_user(cls, user) -> "AuthUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_admin=bool(user.is_admin),
+            credits_balance=int(user.credits_balance or 0),
+        )
+
+
+class UserCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # user_id -> (expires_at, user), oldest first
+        self._entries: "OrderedDict[str, tuple[float, AuthUser]]" = OrderedDict()
+        # user_id -> generation of its last invalidation
+        self._generations: Dict[str, int] = {}
+        self._counter = itertools.count(1)
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, user_id: str) -> Optional[AuthUser]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user
+
+    def begin_load(self, user_id: str) -> int:
+        """Generation token to pass to `put` once the row has been loaded."""
+        return self._generations.get(user_id, self._floor)
+
+    def put(self, user: AuthUser, token: int) -> None:
+        """Cache `user` unless it was invalidated since `begin_load` returned `token`."""
+        if not self.enabled or self._generations.get(user.id, self._floor) != token:
+            return
+        self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._generations[user_id] = next(self._counter)
+        self.invalidations += 1
+        if len(self._generations) > self.max_entries:
+            # Forget per-user generations; raising the floor makes every load
+            # that began before this point skip its `put`.
+            self._floor = next(self._counter)
+            self._generations.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+        self._floor = next(self._counter)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+# 全局实例
+user_cache = UserCache(settings.AUTH_USER_CACHE_TTL_SECONDS, settings.AUTH_USER_CACHE_MAX_ENTRIES)
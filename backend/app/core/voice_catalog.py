@@ -0,0 +1,184 @@
+"""
+In-memory voice catalog.
+
+Replaces the per-request `glob` + transcript reads behind `GET /voices` and the
+`os.path.exists` check in `/tts/generate`:
+
+- The catalog is built once at startup from VOICE_ASSETS_DIR (+ ingestion
+  sidecars) and kept as an immutable snapshot.
+- A background task polls a cheap mtime/size signature of the voice tree and
+  rebuilds the snapshot only when something changed.
+- Each voice is pre-serialized to a JSON fragment, so list responses are a
+  byte join (no model validation or encoding per request), and every snapshot
+  carries a content hash used as the ETag.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.app.core.config import settings
+from backend.app.core.voice_ingest import load_sidecar
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """Immutable view of the voice tree at one point in time."""
+
+    def __init__(self, voices: List[dict], signature: tuple):
+        self.signature = signature
+        self.voices: Dict[str, dict] = {v["id"]: v for v in voices}
+        self.order: List[str] = [v["id"] for v in voices]
+        self.categories: Dict[str, List[int]] = {}
+        self.fragments: List[bytes] = []
+        for idx, v in enumerate(voices):
+            self.categories.setdefault(v["category"], []).append(idx)
+            public = {k: v[k] for k in ("id", "name", "category", "preview_url", "transcript", "duration_seconds")}
+            self.fragments.append(json.dumps(public, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.body = b"[" + b",".join(self.fragments) + b"]"
+        self.etag = hashlib.sha1(self.body).hexdigest()[:16]
+
+    def page(self, category: Optional[str], offset: int, limit: Optional[int]) -> Tuple[bytes, int]:
+        """Return `(json_body, total)` for a category filter + offset/limit window."""
+        if category is None and offset == 0 and limit is None:
+            return self.body, len(self.fragments)
+        indices = self.categories.get(category, []) if category is not None else range(len(self.fragments))
+        total = len(indices)
+        end = total if limit is None else offset + limit
+        window = indices[offset:end]
+        return b"[" + b",".join(self.fragments[i] for i in window) + b"]", total
+
+
+def _scan_signature(assets_dir: str, artifacts_dir: str) -> tuple:
+    """mtime/size of every voice-related file; changes whenever the catalog would."""
+    sig = []
+    for root in (assets_dir, artifacts_dir):
+        if not os.path.isdir(root):
+            continue
+        with os.scandir(root) as categories:
+            for cat in sorted(categories, key=lambda e: e.name):
+                if not cat.is_dir():
+                    continue
+                with os.scandir(cat.path) as files:
+                    for f in files:
+                        if f.name.endswith((".wav", ".txt", ".json")):
+                            st = f.stat()
+                            sig.append((f.path, st.st_mtime_ns, st.st_size))
+    sig.sort()
+    return tuple(sig)
+
+
+def _build_voices(assets_dir: str) -> List[dict]:
+    voices: List[dict] = []
+    if not os.path.isdir(assets_dir):
+        return voices
+    for category in sorted(os.listdir(assets_dir)):
+        cat_dir = os.path.join(assets_dir, category)
+        if not os.path.isdir(cat_dir):
+            continue
+        for filename in sorted(os.listdir(cat_dir)):
+            if not filename.lower().endswith(".wav"):
+                continue
+            voice_id = f"{category}/{filename}"
+            wav_path = os.path.join(cat_dir, filename)
+            voice = {
+                "id": voice_id,
+                "name": os.path.splitext(filename)[0],
+                "category": category,
+                "path": wav_path,
+                "preview_url": f"/static/voices/{category}/{filename}",
+                "transcript": "",
+                "duration_seconds": None,
+                "embedding_path": None,
+                "artifact_stamp": None,
+            }
+            meta = load_sidecar(voice_id)
+            if meta is not None:
+                voice["preview_url"] = f"/static/voice_artifacts/{meta['preview']}"
+                voice["transcript"] = meta.get("transcript", "")
+                voice["duration_seconds"] = meta.get("duration_seconds")
+                if meta.get("embedding"):
+                    voice["embedding_path"] = os.path.join(settings.VOICE_ARTIFACTS_DIR, meta["embedding"])
+                    voice["artifact_stamp"] = (meta.get("version"), meta.get("source_mtime"), meta.get("source_size"))
+            else:
+                txt_path = os.path.splitext(wav_path)[0] + ".txt"
+                if os.path.exists(txt_path):
+                    try:
+                        with open(txt_path, "r", encoding="utf-8") as f:
+                            voice["transcript"] = f.read().strip()
+                    except Exception:
+                        pass
+            voices.append(voice)
+    return voices
+
+
+class VoiceCatalog:
+    def __init__(self, assets_dir: str, artifacts_dir: str, poll_seconds: float):
+        self.assets_dir = assets_dir
+        self.artifacts_dir = artifacts_dir
+        self.poll_seconds = poll_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._poll_task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+
+    def add_listener(self, fn: Callable[[CatalogSnapshot], None]) -> None:
+        """Call `fn(snapshot)` after every rebuild (runs in the refreshing thread)."""
+        self._listeners.append(fn)
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        if self._snapshot is None:
+            self.refresh()
+        return self._snapshot
+
+    def get(self, voice_id: str) -> Optional[dict]:
+        return self.snapshot.voices.get(voice_id)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the snapshot if the voice tree changed. Returns True when rebuilt."""
+        signature = _scan_signature(self.assets_dir, self.artifacts_dir)
+        if not force and self._snapshot is not None and signature == self._snapshot.signature:
+            return False
+        self._snapshot = CatalogSnapshot(_build_voices(self.assets_dir), signature)
+        logger.info(f"Voice catalog rebuilt: {len(self._snapshot.order)} voices, etag={self._snapshot.etag}")
+        for fn in self._listeners:
+            try:
+                fn(self._snapshot)
+            except Exception as e:
+                logger.error(f"Voice catalog listener failed: {e}")
+        return True
+
+    async def _poll(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:
+                logger.error(f"Voice catalog refresh failed: {e}")
+
+    async def start(self):
+        """Build the initial snapshot and start mtime polling."""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.refresh, True)
+        if self._poll_task is None and self.poll_seconds > 0:
+            self._poll_task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+
+# 全局实例
+voice_catalog = VoiceCatalog(
+    settings.VOICE_ASSETS_DIR,
+    settings.VOICE_ARTIFACTS_DIR,
+    settings.VOICE_CATALOG_POLL_SECONDS,
+)
@@ -0,0 +1,381 @@
+"""
+Voice ingestion pipeline (prompt_voice -> voice_artifacts).
+
+Raw reference voices in `prompt_voice/{category}/*.wav` have arbitrary length,
+sample rate and loudness. Ingestion turns each one into a small, model-ready
+artifact set so inference and `/voices` never touch the raw files:
+
+    voice_artifacts/{category}/{name}.wav          prompt audio (model rate, mono)
+    voice_artifacts/{category}/{name}.preview.ogg  small preview for the UI
+    voice_artifacts/{category}/{name}.emb.npy      speaker embedding (see speaker_index)
+    voice_artifacts/{category}/{name}.json         sidecar (metadata + paths)
+
+Steps per voice: resample -> trim leading/trailing silence -> loudness
+normalize -> pick the best segment under the duration budget -> preview
+transcode -> speaker embedding -> sidecar.
+
+Segment selection prefers a prefix cut at a pause that lines up with a clause
+boundary of the transcript, so the shortened prompt still has matching text.
+When no such cut exists the whole (trimmed, normalized) clip is kept with the
+full transcript. Voices without a transcript get the most speech-dense window
+(for the preview and embedding) and no prompt text; they cannot be used for
+inference, since VoxCPM needs the text spoken in the prompt.
+
+Inference reads only the artifact (`resolve_prompt`); a voice that was never
+ingested, or whose source changed, is ingested on first use.
+
+`ingest_voice` is a plain top-level function so it can run in a
+ProcessPoolExecutor; `ingest_voices` fans a list of voices out over a pool.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from backend.app.core.config import settings
+
+ARTIFACT_VERSION = 3
+TRIM_TOP_DB = 40
+N_MELS = 80
+N_MFCC = 20
+MIN_PAUSE_SECONDS = 0.12
+ALIGN_TOLERANCE_SECONDS = 0.4
+CLAUSE_SPLIT = re.compile(r"(?<=[，。！？；、,.!?;:：…])|\s+")
+
+
+@dataclass(frozen=True)
+class IngestOptions:
+    sample_rate: int = settings.VOICE_PROMPT_SAMPLE_RATE
+    max_seconds: float = settings.VOICE_PROMPT_MAX_SECONDS
+    target_dbfs: float = settings.VOICE_TARGET_DBFS
+    preview_sample_rate: int = settings.VOICE_PREVIEW_SAMPLE_RATE
+    preview_max_seconds: float = settings.VOICE_PREVIEW_MAX_SECONDS
+
+
+def artifact_base(voice_id: str, artifacts_dir: Optional[str] = None) -> str:
+    """Artifact path prefix (without extension) for a voice id like `female/x.wav`."""
+    root = artifacts_dir or settings.VOICE_ARTIFACTS_DIR
+    return os.path.join(root, os.path.splitext(voice_id)[0])
+
+
+def sidecar_path(voice_id: str, artifacts_dir: Optional[str] = None) -> str:
+    return artifact_base(voice_id, artifacts_dir) + ".json"
+
+
+def load_sidecar(voice_id: str, artifacts_dir: Optional[str] = None) -> Optional[dict]:
+    path = sidecar_path(voice_id, artifacts_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _is_fresh(meta: Optional[dict], src_path: str) -> bool:
+    if meta is None or meta.get("version") != ARTIFACT_VERSION:
+        return False
+    st = os.stat(src_path)
+    return meta.get("source_mtime") == st.st_mtime and meta.get("source_size") == st.st_size
+
+
+def _normalize_loudness(y, target_dbfs: float):
+    import numpy as np
+
+    rms = float(np.sqrt(np.mean(np.square(y)))) if y.size else 0.0
+    if rms <= 1e-8:
+        return y, 0.0
+    gain = 10.0 ** (target_dbfs / 20.0) / rms
+    y = y * gain
+    # Peak-limit to -1 dBFS so normalization never clips
+    peak = float(np.max(np.abs(y)))
+    ceiling = 10.0 ** (-1.0 / 20.0)
+    if peak > ceiling:
+        y = y * (ceiling / peak)
+        gain *= ceiling / peak
+    return y, 20.0 * float(np.log10(gain))
+
+
+def _best_segment(y, sr: int, max_seconds: float):
+    """
+    Pick the [start, end) sample range under `max_seconds` that carries the most
+    speech, cutting only at pauses. Returns the whole clip when it fits.
+    """
+    import librosa
+
+    budget = int(max_seconds * sr)
+    if len(y) <= budget:
+        return 0, len(y)
+
+    intervals = librosa.effects.split(y, top_db=TRIM_TOP_DB)
+    if len(intervals) == 0:
+        return 0, budget
+
+    best = (0, min(budget, len(y)))
+    best_speech = 0
+    j = 0
+    speech = 0
+    # Sliding window over contiguous speech intervals [i, j)
+    for i in range(len(intervals)):
+        if j < i:
+            j = i
+            speech = 0
+        while j < len(intervals) and intervals[j][1] - intervals[i][0] <= budget:
+            speech += intervals[j][1] - intervals[j][0]
+            j += 1
+        if j > i and speech > best_speech:
+            best_speech = speech
+            best = (int(intervals[i][0]), int(intervals[j - 1][1]))
+        if j > i:
+            speech -= intervals[i][1] - intervals[i][0]
+
+    if best_speech == 0:
+        # A single uninterrupted phrase longer than the budget: hard cut
+        start = int(intervals[0][0])
+        return start, start + budget
+    return best
+
+
+def speaker_embedding(log_mel):
+    """
+    Fixed-size speaker descriptor from a natural-log mel spectrogram:
+    mean and std of MFCC 1..N (c0, i.e. loudness, is dropped), float32.
+    """
+    import librosa
+    import numpy as np
+
+    db = log_mel * (10.0 / np.log(10.0))
+    mfcc = librosa.feature.mfcc(S=db, n_mfcc=N_MFCC)[1:]
+    return np.concatenate([mfcc.mean(axis=1), mfcc.std(axis=1)]).astype(np.float32)
+
+
+def embed_audio(y, sr: int):
+    """Speaker embedding for a raw clip (resampled/trimmed like ingestion)."""
+    import librosa
+    import numpy as np
+
+    if sr != settings.VOICE_PROMPT_SAMPLE_RATE:
+        y = librosa.resample(y, orig_sr=sr, target_sr=settings.VOICE_PROMPT_SAMPLE_RATE)
+        sr = settings.VOICE_PROMPT_SAMPLE_RATE
+    y, _ = librosa.effects.trim(y, top_db=TRIM_TOP_DB)
+    if len(y) == 0:
+        raise ValueError("clip contains no audio above the silence threshold")
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=N_MELS)
+    return speaker_embedding(np.log(np.maximum(mel, 1e-10)))
+
+
+def _aligned_prefix(y, sr: int, transcript: str, max_seconds: float):
+    """
+    Cut the clip at a pause under `max_seconds` that lines up with a clause
+    boundary of the transcript, so the shortened prompt keeps a matching text.
+
+    Clause end times are estimated by spreading the transcript's characters
+    over the detected speech; when the pause count equals the boundary count
+    they are mapped one-to-one instead. Returns `(end_sample, prompt_text)` or
+    None when no boundary lines up within tolerance.
+    """
+    import librosa
+
+    clauses = [c for c in CLAUSE_SPLIT.split(transcript) if c and c.strip()]
+    if len(clauses) < 2:
+        return None
+
+    intervals = librosa.effects.split(y, top_db=TRIM_TOP_DB)
+    min_gap = int(MIN_PAUSE_SECONDS * sr)
+    pauses = [
+        (int(intervals[k][1]) + int(intervals[k + 1][0])) // 2
+        for k in range(len(intervals) - 1)
+        if intervals[k + 1][0] - intervals[k][1] >= min_gap
+    ]
+    if not pauses:
+        return None
+
+    budget = int(max_seconds * sr)
+    if len(pauses) == len(clauses) - 1:
+        candidates = [(pauses[k], k) for k in range(len(pauses)) if pauses[k] <= budget]
+    else:
+        weights = [len(re.sub(r"[\W_]", "", c)) or 1 for c in clauses]
+        speech_total = sum(int(b) - int(a) for a, b in intervals)
+        tolerance = int(ALIGN_TOLERANCE_SECONDS * sr)
+        candidates = []
+        done = 0
+        for k in range(len(clauses) - 1):
+            done += weights[k]
+            # Map the speech-time fraction back to a wall-clock sample position
+            remaining = speech_total * done / sum(weights)
+            est = int(intervals[-1][1])
+            for a, b in intervals:
+                if remaining <= b - a:
+                    est = int(a + remaining)
+                    break
+                remaining -= b - a
+            pause = min(pauses, key=lambda p: abs(p - est))
+            if abs(pause - est) <= tolerance and pause <= budget:
+                candidates.append((pause, k))
+
+    if not candidates:
+        return None
+    end, k = max(candidates)
+    separator = "" if re.search(r"[，。！？；、]", transcript) else " "
+    return end, separator.join(c.strip() for c in clauses[: k + 1])
+
+
+def ingest_voice(
+    src_path: str,
+    voice_id: str,
+    artifacts_dir: str,
+    options: IngestOptions = IngestOptions(),
+    force: bool = False,
+) -> dict:
+    """
+    Build the artifact set for one voice and return its sidecar dict.
+
+    Skips work (returns the existing sidecar) when the source file is unchanged.
+    """
+    import librosa
+    import numpy as np
+    import soundfile as sf
+
+    existing = load_sidecar(voice_id, artifacts_dir)
+    if not force and _is_fresh(existing, src_path):
+        return existing
+
+    base = artifact_base(voice_id, artifacts_dir)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+
+    y, sr = sf.read(src_path, dtype="float32", always_2d=True)
+    y = y.mean(axis=1)
+    source_seconds = len(y) / sr
+    if sr != options.sample_rate:
+        y = librosa.resample(y, orig_sr=sr, target_sr=options.sample_rate)
+        sr = options.sample_rate
+
+    y, _ = librosa.effects.trim(y, top_db=TRIM_TOP_DB)
+    y, gain_db = _normalize_loudness(y, options.target_dbfs)
+
+    transcript = ""
+    txt_path = os.path.splitext(src_path)[0] + ".txt"
+    if os.path.exists(txt_path):
+        with open(txt_path, "r", encoding="utf-8") as f:
+            transcript = f.read().strip()
+
+    prompt_text = transcript or None
+    start, end = 0, len(y)
+    if len(y) > int(options.max_seconds * sr):
+        aligned = _aligned_prefix(y, sr, transcript, options.max_seconds) if transcript else None
+        if aligned is not None:
+            end, prompt_text = aligned
+        elif not transcript:
+            # No text to keep in sync: best speech window (preview / embedding only)
+            start, end = _best_segment(y, sr, options.max_seconds)
+        # else: no clause-aligned pause under the budget; keep the whole clip so the transcript still matches
+    segment_is_full = start == 0 and end == len(y)
+    y = np.ascontiguousarray(y[start:end], dtype=np.float32)
+
+    prompt_path = base + ".wav"
+    sf.write(prompt_path, y, sr, subtype="PCM_16")
+
+    preview = y[: int(options.preview_max_seconds * sr)]
+    if options.preview_sample_rate != sr:
+        preview = librosa.resample(preview, orig_sr=sr, target_sr=options.preview_sample_rate)
+    preview_path = base + ".preview.ogg"
+    sf.write(preview_path, preview, options.preview_sample_rate, format="OGG", subtype="VORBIS")
+
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=N_MELS)
+    emb_path = base + ".emb.npy"
+    np.save(emb_path, speaker_embedding(np.log(np.maximum(mel, 1e-10))))
+    # Log-mel features are no longer kept (nothing read them); drop files from older ingests
+    if os.path.exists(base + ".mel.npy"):
+        os.remove(base + ".mel.npy")
+
+    st = os.stat(src_path)
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "voice_id": voice_id,
+        "source_path": src_path,
+        "source_mtime": st.st_mtime,
+        "source_size": st.st_size,
+        "source_seconds": round(source_seconds, 3),
+        "sample_rate": sr,
+        "duration_seconds": round(len(y) / sr, 3),
+        "gain_db": round(gain_db, 2),
+        "segment_is_full": segment_is_full,
+        "transcript": transcript,
+        # Text spoken in the prompt audio (None when the cut could not be aligned)
+        "prompt_text": prompt_text,
+        "prompt_wav": os.path.relpath(prompt_path, artifacts_dir),
+        "preview": os.path.relpath(preview_path, artifacts_dir),
+        "embedding": os.path.relpath(emb_path, artifacts_dir),
+        "options": asdict(options),
+    }
+    tmp_path = base + ".json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, base + ".json")
+    return meta
+
+
+def discover_voices(assets_dir: Optional[str] = None) -> Dict[str, str]:
+    """Map voice id (`{category}/{file}.wav`) -> absolute source path."""
+    root = assets_dir or settings.VOICE_ASSETS_DIR
+    voices: Dict[str, str] = {}
+    for category in sorted(os.listdir(root)):
+        cat_dir = os.path.join(root, category)
+        if not os.path.isdir(cat_dir):
+            continue
+        for filename in sorted(os.listdir(cat_dir)):
+            if filename.lower().endswith(".wav"):
+                voices[f"{category}/{filename}"] = os.path.join(cat_dir, filename)
+    return voices
+
+
+def ingest_voices(
+    voices: Dict[str, str],
+    artifacts_dir: Optional[str] = None,
+    options: IngestOptions = IngestOptions(),
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> List[dict]:
+    """
+    Ingest many voices in a process pool.
+
+    Returns one result per voice: the sidecar dict, or `{"voice_id", "error"}`
+    for voices that failed (a bad file never aborts the whole run).
+    """
+    artifacts_dir = artifacts_dir or settings.VOICE_ARTIFACTS_DIR
+    workers = workers or settings.VOICE_INGEST_WORKERS
+    results: List[dict] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            voice_id: pool.submit(ingest_voice, src, voice_id, artifacts_dir, options, force)
+            for voice_id, src in voices.items()
+        }
+        for voice_id, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"voice_id": voice_id, "error": str(e)})
+    return results
+
+
+def resolve_prompt(voice_path: str) -> tuple[str, str]:
+    """
+    Return `(prompt_wav_path, prompt_text)` for a source voice path.
+
+    Always the ingested artifact (trimmed, normalized, cut to the budget); a
+    missing or stale artifact is ingested first. Raises ValueError for a voice
+    without a transcript instead of falling back to the raw source wav.
+    """
+    if not voice_path or not os.path.exists(voice_path):
+        raise FileNotFoundError(f"Voice file not found: {voice_path}")
+
+    voice_id = os.path.relpath(voice_path, settings.VOICE_ASSETS_DIR)
+    meta = load_sidecar(voice_id)
+    if not _is_fresh(meta, voice_path):
+        meta = ingest_voice(voice_path, voice_id, settings.VOICE_ARTIFACTS_DIR)
+    if not meta.get("prompt_text"):
+        raise ValueError(f"Voice {voice_id} has no transcript; add {os.path.splitext(voice_id)[0]}.txt and re-ingest")
+    return os.path.join(settings.VOICE_ARTIFACTS_DIR, meta["prompt_wav"]), meta["prompt_text"]
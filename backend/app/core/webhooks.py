@@ -0,0 +1,329 @@
+"""
+Task-completion webhooks (`callback_url` on /tts/generate and /tts/batch items).
+
+The TTS worker only calls `webhook_dispatcher.notify_task(task)`, which puts
+the event on an in-memory asyncio queue and returns; everything else happens
+in the dispatcher's own tasks, so a slow or dead receiver never delays
+inference:
+
+- a fixed number of delivery workers (WEBHOOK_CONCURRENCY) share one pooled
+  `httpx.AsyncClient`
+- each POST carries `X-Mosheng-Signature: t=<unix ts>,v1=<hex>` where v1 is
+  HMAC-SHA256(WEBHOOK_SECRET, "<ts>." + body); see `verify_signature`
+- non-2xx responses and transport errors are retried with jittered
+  exponential backoff up to WEBHOOK_MAX_ATTEMPTS
+- deliveries and every attempt are persisted (`webhook_deliveries`,
+  `webhook_attempts`); PENDING deliveries are rescheduled on startup
+
+callback_url is user input, so it must not reach internal services (SSRF).
+It is checked twice: literal addresses when the request is validated, and
+the host's resolved addresses when the task is submitted and again before
+every POST. Addresses that are not globally routable are rejected: loopback,
+private, link-local (including 169.254.169.254), shared, reserved and
+multicast. The POST connects to the address that was checked, with the
+original Host header and TLS server name, so a DNS answer that changes after
+the check cannot redirect it. Redirects are not followed. Hosts listed in
+WEBHOOK_ALLOWED_HOSTS skip the check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from backend.app.core.config import settings
+from backend.app.db.database import AsyncSessionLocal
+from backend.app.db.crud_webhook import (
+    create_webhook_delivery, get_pending_webhook_deliveries, record_webhook_attempt
+)
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Mosheng-Signature"
+
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    digest = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, header: str, body: bytes, tolerance_seconds: int = 300) -> bool:
+    """Receiver-side check of `X-Mosheng-Signature` (also rejects stale timestamps)."""
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance_seconds:
+        return False
+    expected = sign_payload(secret, timestamp, body)
+    return hmac.compare_digest(expected, header)
+
+
+class UnsafeCallbackURL(ValueError):
+    """callback_url is malformed or points at a non-public address."""
+
+
+def _allowed_hosts() -> Set[str]:
+    return {h.strip().lower() for h in settings.WEBHOOK_ALLOWED_HOSTS.split(",") if h.strip()}
+
+
+def _public_address(ip) -> bool:
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_callback_url(url: str) -> None:
+    """
+    Syntax check without DNS (request validation): http(s) with a host, and no
+    literal non-public address or localhost name. Raises UnsafeCallbackURL.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeCallbackURL("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if host in _allowed_hosts():
+        return
+    if host == "localhost" or host.endswith(".localhost"):
+        raise UnsafeCallbackURL("callback_url must not point at a local or private address")
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return
+    if not _public_address(ip):
+        raise UnsafeCallbackURL("callback_url must not point at a local or private address")
+
+
+async def resolve_callback_url(url: str) -> Tuple[str, Dict[str, str], dict]:
+    """
+    Resolve callback_url and check every address it resolves to.
+
+    Returns `(request_url, headers, extensions)` for a request pinned to the
+    checked address. Raises UnsafeCallbackURL for a non-public address, and
+    socket.gaierror when the host does not resolve.
+    """
+    check_callback_url(url)
+    parts = urlsplit(url)
+    host = parts.hostname.lower()
+    if host in _allowed_hosts():
+        return url, {}, {}
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(ipaddress.ip_address(info[4][0].split("%", 1)[0]) for info in infos))
+    for ip in addresses:
+        if not _public_address(ip):
+            raise UnsafeCallbackURL(f"callback_url host {host} resolves to a non-public address ({ip})")
+    ip = addresses[0]
+    netloc = f"[{ip}]" if ip.version == 6 else str(ip)
+    if parts.port:
+        netloc += f":{parts.port}"
+    extensions = {"sni_hostname": host} if parts.scheme == "https" else {}
+    return urlunsplit(parts._replace(netloc=netloc)), {"Host": parts.netloc.rsplit("@", 1)[-1]}, extensions
+
+
+def task_event_payload(task) -> dict:
+    output_url = task.output_url
+    if output_url and settings.PUBLIC_BASE_URL:
+        output_url = settings.PUBLIC_BASE_URL.rstrip("/") + output_url
+    return {
+        "event": "task.completed" if task.status == "COMPLETED" else "task.failed",
+        "task_id": task.id,
+        "status": task.status.lower(),
+        "output_url": output_url,
+        "error": task.error_message,
+        "cost": task.cost,
+        "batch_id": task.batch_id,
+        "created_at": task.created_at.isoformat() if task.created_at else None,
+        "completed_at": task.completed_at.isoformat() if task.completed_at else None,
+    }
+
+
+@dataclass
+class _Delivery:
+    task_id: str
+    url: str
+    event: str
+    body: bytes
+    id: Optional[str] = None
+    attempts: int = 0
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        secret: str,
+        concurrency: int = 8,
+        timeout: float = 10.0,
+        max_attempts: int = 6,
+        backoff_base: float = 2.0,
+        backoff_max: float = 600.0,
+    ):
+        self.secret = secret
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue: Optional[asyncio.Queue] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self._workers: list = []
+        self._timers: Set[asyncio.TimerHandle] = set()
+
+    async def start(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Start delivery workers and reschedule PENDING deliveries from the database.
+
+        `transport` lets tests point the pooled client at a local stand-in
+        (e.g. `httpx.ASGITransport(app=receiver)`).
+        """
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue()
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            follow_redirects=False,  # a redirect could lead to an internal address
+            transport=transport,
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        await self._resume()
+
+    async def stop(self):
+        for handle in self._timers:
+            handle.cancel()
+        self._timers.clear()
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        if self.client is not None:
+            await self.client.aclose()
+        self.client = None
+        self.queue = None
+
+    def notify_task(self, task) -> None:
+        """Queue the completion event of a finished task (no-op without callback_url). Never blocks."""
+        if not task.callback_url or self.queue is None:
+            return
+        payload = task_event_payload(task)
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.queue.put_nowait(_Delivery(task_id=task.id, url=task.callback_url, event=payload["event"], body=body))
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _resume(self):
+        async with AsyncSessionLocal() as db:
+            pending = await get_pending_webhook_deliveries(db)
+        now = datetime.datetime.utcnow()
+        for d in pending:
+            delay = (d.next_attempt_at - now).total_seconds() if d.next_attempt_at else 0
+            self._schedule(
+                _Delivery(task_id=d.task_id, url=d.url, event=d.event, body=d.payload.encode("utf-8"),
+                          id=d.id, attempts=d.attempts or 0),
+                max(0.0, delay),
+            )
+        if pending:
+            logger.info(f"Rescheduled {len(pending)} pending webhook deliveries")
+
+    def _schedule(self, delivery: _Delivery, delay: float) -> None:
+        if delay <= 0:
+            self.queue.put_nowait(delivery)
+            return
+        loop = asyncio.get_event_loop()
+
+        def fire():
+            self._timers.discard(handle)
+            if self.queue is not None:
+                self.queue.put_nowait(delivery)
+
+        handle = loop.call_later(delay, fire)
+        self._timers.add(handle)
+
+    async def _worker(self):
+        while True:
+            delivery = await self.queue.get()
+            try:
+                await self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"Webhook delivery for task {delivery.task_id} crashed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _attempt(self, delivery: _Delivery):
+        if delivery.id is None:
+            async with AsyncSessionLocal() as db:
+                row = await create_webhook_delivery(
+                    db, delivery.task_id, delivery.url, delivery.event, delivery.body.decode("utf-8")
+                )
+                delivery.id = row.id
+
+        headers = {
+            "Content-Type": "application/json",
+            "X-Mosheng-Event": delivery.event,
+            "X-Mosheng-Delivery": delivery.id,
+            SIGNATURE_HEADER: sign_payload(self.secret, int(time.time()), delivery.body),
+        }
+        status_code = None
+        error = None
+        unsafe = False
+        start = time.monotonic()
+        try:
+            # Checked again here: DNS may have changed since submission
+            url, pinned_headers, extensions = await resolve_callback_url(delivery.url)
+            response = await self.client.post(
+                url, content=delivery.body, headers={**headers, **pinned_headers}, extensions=extensions
+            )
+            status_code = response.status_code
+            if not 200 <= status_code < 300:
+                error = f"HTTP {status_code}"
+        except UnsafeCallbackURL as e:
+            error = str(e)
+            unsafe = True
+        except (httpx.HTTPError, OSError) as e:
+            error = f"{type(e).__name__}: {e}"
+        duration_ms = int((time.monotonic() - start) * 1000)
+        delivery.attempts += 1
+
+        retry_in = None
+        if error is None:
+            status = "DELIVERED"
+        elif unsafe or delivery.attempts >= self.max_attempts:
+            status = "FAILED"
+            logger.warning(f"Webhook for task {delivery.task_id} failed after {delivery.attempts} attempts: {error}")
+        else:
+            status = "PENDING"
+            retry_in = self.backoff(delivery.attempts)
+
+        next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=retry_in) if retry_in else None
+        async with AsyncSessionLocal() as db:
+            await record_webhook_attempt(
+                db, delivery.id, delivery.attempts, status_code, error, duration_ms, status, next_attempt_at
+            )
+        if retry_in is not None:
+            self._schedule(delivery, retry_in)
+
+
+# 全局实例
+webhook_dispatcher = WebhookDispatcher(
+    secret=settings.WEBHOOK_SECRET,
+    concurrency=settings.WEBHOOK_CONCURRENCY,
+    timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+    max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+    backoff_base=settings.WEBHOOK_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.WEBHOOK_BACKOFF_MAX_SECONDS,
+)
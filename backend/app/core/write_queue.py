@@ -0,0 +1,147 @@
+"""
+Single-writer group commit (SQLite mode).
+
+SQLite allows one writer at a time, and each COMMIT is a WAL append plus
+lock handoff, however small the transaction. Concurrent submissions and
+worker status updates are therefore queued here. One writer task takes
+up to SQLITE_WRITE_BATCH_SIZE queued units, runs each inside its own
+SAVEPOINT on the writer connection and commits them together:
+- a unit that raises (e.g. an IntegrityError on a duplicate idempotency
+  key) is rolled back to its savepoint and gets the exception; the rest of
+  the batch still commits
+- callers are resumed only after the shared COMMIT, so a result means the
+  write is durable
+- if the COMMIT itself fails, every unit of the batch gets the error
+
+Outside SQLite mode (or before `start`), `run` executes the unit in the
+caller's session and commits it, so call sites read the same everywhere.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.config import settings
+from backend.app.db.database import IS_SQLITE, AsyncSessionLocal, is_writing, mark_writing
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+WriteUnit = Callable[[AsyncSession], Awaitable[T]]
+
+
+class WriteQueue:
+    def __init__(self, max_batch: int, session_factory=AsyncSessionLocal):
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.units = 0
+        self.failed_units = 0
+        self.failed_commits = 0
+        self.largest_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def run(self, db: AsyncSession, unit: WriteUnit) -> T:
+        """
+        Run `unit(session)` (which must not commit) and commit it; returns its result.
+
+        Goes through the writer task unless it is not running or `db` already
+        holds uncommitted writes (those must commit together with the unit).
+        Either way `db`'s current transaction has ended when this returns.
+        """
+        if self._task is None or is_writing(db):
+            result = await unit(db)
+            await db.commit()
+            return result
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((unit, future))
+        try:
+            return await future
+        finally:
+            # End db's read snapshot so the caller's next query sees the write
+            await db.commit()
+
+    async def _write(self, batch: List[Tuple[WriteUnit, asyncio.Future]]) -> None:
+        outcomes = []
+        async with self.session_factory() as db:
+            mark_writing(db)
+            for unit, future in batch:
+                try:
+                    async with db.begin_nested():
+                        outcomes.append((future, await unit(db), None))
+                except Exception as e:
+                    self.failed_units += 1
+                    outcomes.append((future, None, e))
+            try:
+                await db.commit()
+            except Exception as e:
+                self.failed_commits += 1
+                logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+                outcomes = [(future, None, e) for future, _, _ in outcomes]
+        self.batches += 1
+        self.units += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    logger.error(f"Writer task failed a batch of {len(batch)}: {e}")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+            if stop:
+                return
+
+    async def start(self):
+        if self._task is None and self.max_batch > 0:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write what is already queued, then stop (later `run` calls execute inline)."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            self._queue.put_nowait(None)
+            await task
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "units": self.units,
+            "avg_batch": round(self.units / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "failed_units": self.failed_units,
+            "failed_commits": self.failed_commits,
+        }
+
+
+# 全局实例（仅 SQLite 模式启用写线程）
+write_queue = WriteQueue(settings.SQLITE_WRITE_BATCH_SIZE if IS_SQLITE else 0)
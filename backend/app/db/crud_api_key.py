@@ -0,0 +1,73 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import bindparam, func, update
+from typing import Dict, List, Optional, Tuple
+from backend.app.db.models import ApiKey
+import datetime
+
+async def create_api_key(
+    db: AsyncSession,
+    user_id: str,
+    name: str,
+    prefix: str,
+    secret_hash: str,
+    scopes: List[str]
+) -> ApiKey:
+    key = ApiKey(user_id=user_id, name=name, prefix=prefix, secret_hash=secret_hash, scopes=",".join(scopes))
+    db.add(key)
+    await db.commit()
+    return key
+
+async def count_active_api_keys(db: AsyncSession, user_id: str) -> int:
+    result = await db.execute(
+        select(func.count()).select_from(ApiKey)
+        .where(ApiKey.user_id == user_id, ApiKey.revoked_at.is_(None))
+    )
+    return int(result.scalar_one())
+
+async def list_api_keys(db: AsyncSession, user_id: str) -> List[ApiKey]:
+    result = await db.execute(
+        select(ApiKey).where(ApiKey.user_id == user_id).order_by(ApiKey.created_at.desc())
+    )
+    return list(result.scalars().all())
+
+async def get_api_key_by_prefix(db: AsyncSession, prefix: str) -> Optional[ApiKey]:
+    result = await db.execute(select(ApiKey).where(ApiKey.prefix == prefix))
+    return result.scalars().first()
+
+async def revoke_api_key(db: AsyncSession, key_id: str, user_id: str) -> Optional[ApiKey]:
+    """Mark a key revoked (idempotent). None when the key does not belong to the user."""
+    result = await db.execute(select(ApiKey).where(ApiKey.id == key_id, ApiKey.user_id == user_id))
+    key = result.scalars().first()
+    if key is None:
+        return None
+    if key.revoked_at is None:
+        key.revoked_at = datetime.datetime.utcnow()
+        await db.commit()
+    return key
+
+async def add_api_key_usage(
+    db: AsyncSession,
+    usage: Dict[str, Tuple[int, datetime.datetime]]
+) -> None:
+    """
+    Apply buffered usage in one executemany UPDATE.
+
+    Parameters:
+    - usage: key_id -> (requests since the last flush, last use)
+    """
+    if not usage:
+        return
+    # Core table UPDATE: an ORM update() with a parameter list would be a
+    # bulk-by-primary-key update, which cannot express `usage_count + n`.
+    table = ApiKey.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("key_id"))
+        .values(usage_count=func.coalesce(table.c.usage_count, 0) + bindparam("n"), last_used_at=bindparam("used_at"))
+    )
+    await db.execute(stmt, [
+        {"key_id": key_id, "n": n, "used_at": used_at}
+        for key_id, (n, used_at) in usage.items()
+    ])
+    await db.commit()
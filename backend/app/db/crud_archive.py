@@ -0,0 +1,111 @@
+"""
+Task archival (cold storage) DB helpers.
+
+Finished tasks older than the retention window are exported by
+`core/task_archive.py` and then narrowed in place: the payload text is cut
+to the history excerpt, `callback_url` is dropped and `archived_at` is set. The row
+itself (id, status, cost, output_url, timestamps, batch membership) stays,
+so status polls, history, the ledger's task references and batch/script
+assembly keep working without knowing about the archive.
+
+The job walks tasks in `(completed_at, id)` order with its own watermark
+(see crud_rollup), and, while rollups are enabled, never passes the
+statistics rollup's watermark, so every task is rolled up from its full
+text before it is narrowed.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import List, Tuple
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db.crud_rollup import TASKS_ROLLUP, advance_watermark, get_watermark, watermark_position
+from backend.app.db.crud_task import text_excerpt
+from backend.app.db.models import RollupWatermark, Task, TaskPayload
+
+TASK_ARCHIVE = "task_archive"
+
+ARCHIVE_COLUMNS = (
+    Task.id, Task.user_id, TaskPayload.text, Task.voice_path, Task.status, Task.cost, Task.output_url,
+    Task.error_message, Task.created_at, Task.completed_at, Task.batch_id, Task.batch_index,
+    Task.callback_url,
+)
+
+
+async def select_tasks_to_archive(
+    db: AsyncSession,
+    before: datetime.datetime,
+    limit: int = 2000,
+    after_rollup: bool = True,
+) -> Tuple[object, List]:
+    """
+    Next tasks to archive: finished before `before`, past the watermark.
+
+    Tasks still holding credits (HELD / REFUND) keep their full text, since
+    the settler needs it for the ledger reason. They are not skipped: the
+    batch stops just before the first of them, so the watermark never passes
+    a task that has not been archived yet. With `after_rollup` (rollups
+    enabled), only tasks the statistics rollup has already counted qualify.
+
+    Returns
+    - (watermark, rows); pass both to `mark_tasks_archived` after the rows are stored
+    """
+    mark = await get_watermark(db, TASK_ARCHIVE)
+    window = [
+        Task.completed_at.is_not(None),
+        Task.completed_at < before,
+        Task.archived_at.is_(None),
+    ]
+    if mark.completed_at is not None:
+        window.append(tuple_(Task.completed_at, Task.id) > watermark_position(mark))
+    if after_rollup:
+        rollup = (await db.execute(
+            select(RollupWatermark.completed_at, RollupWatermark.task_id).where(RollupWatermark.name == TASKS_ROLLUP)
+        )).first()
+        if rollup is None or rollup.completed_at is None:
+            await db.commit()
+            return mark, []
+        window.append(tuple_(Task.completed_at, Task.id) <= watermark_position(rollup))
+    unsettled = (await db.execute(
+        select(Task.completed_at, Task.id)
+        .where(*window, Task.hold_status.in_(("HELD", "REFUND")))
+        .order_by(Task.completed_at, Task.id)
+        .limit(1)
+    )).first()
+    if unsettled is not None:
+        window.append(tuple_(Task.completed_at, Task.id) < tuple_(
+            unsettled.completed_at, unsettled.id, types=(Task.completed_at.type, Task.id.type)
+        ))
+    stmt = select(*ARCHIVE_COLUMNS).outerjoin(TaskPayload, TaskPayload.task_id == Task.id).where(*window)
+    rows = (await db.execute(stmt.order_by(Task.completed_at, Task.id).limit(limit))).all()
+    # End the transaction: no lock is held while the caller writes the archive.
+    await db.commit()
+    return mark, rows
+
+
+async def mark_tasks_archived(db: AsyncSession, mark, rows: List) -> bool:
+    """
+    Narrow the archived rows and advance the watermark (commits).
+
+    Returns False (and applies nothing) when another process archived them first.
+    """
+    if not rows:
+        return True
+    if not await advance_watermark(db, TASK_ARCHIVE, mark, rows[-1]):
+        await db.rollback()
+        return False
+    task_ids = [r.id for r in rows]
+    await db.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids), Task.archived_at.is_(None))
+        .values(callback_url=None, archived_at=datetime.datetime.utcnow())
+    )
+    await db.execute(
+        update(TaskPayload).where(TaskPayload.task_id.in_(task_ids)).values(text=text_excerpt())
+    )
+    await db.commit()
+    return True
+
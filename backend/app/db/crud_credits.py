@@ -5,17 +5,28 @@ This module centralizes all credit balance mutations so that:
 - Every balance change is recorded as a `CreditTransaction`
 - Balance updates are atomic (no "update balance but forget ledger")
 
+Queued tasks use holds instead of an upfront debit: submission only raises
+`users.credits_held` (available = balance - held), and `settle_credit_holds`
+later turns finished tasks into ledger rows in batches: COMPLETED tasks are
+charged, FAILED tasks release their hold, and FAILED tasks that were charged
+at submit (before holds) are refunded.
+
 No try/except is used by design: callers should handle and surface errors.
 """
 
 from __future__ import annotations
 
-from typing import Optional, Tuple
+import datetime
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import update
+from sqlalchemy import and_, bindparam, func, insert, literal, or_, select, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.app.db.models import CreditTransaction, User
+from backend.app.core.user_cache import user_cache
+from backend.app.core.write_queue import write_queue
+from backend.app.db.ids import new_id
+from backend.app.db.models import CreditTransaction, IdempotencyKey, Task, TaskBatch, TaskPayload, User
+from backend.app.db.pagination import keyset_page, split_page
 
 
 async def apply_credit_transaction(
@@ -53,7 +64,7 @@ async def apply_credit_transaction(
 
     stmt = update(User).where(User.id == user_id)
     if amount < 0:
-        stmt = stmt.where(User.credits_balance >= (-amount))
+        stmt = stmt.where(User.credits_balance - func.coalesce(User.credits_held, 0) >= (-amount))
     stmt = stmt.values(credits_balance=User.credits_balance + amount).returning(User.credits_balance)
 
     result = await db.execute(stmt)
@@ -62,6 +73,7 @@ async def apply_credit_transaction(
         return None
 
     new_balance = int(row[0])
+    user_cache.invalidate(user_id)
 
     tx = CreditTransaction(
         user_id=user_id,
@@ -75,3 +87,341 @@ async def apply_credit_transaction(
     await db.flush()
     return tx, new_balance
 
+
+
+
+def _select_values(table, row: dict):
+    """SELECT list of typed literals for `row`, for INSERT ... SELECT."""
+    return [literal(v, table.c[k].type).label(k) for k, v in row.items()]
+
+
+async def place_credit_hold(db: AsyncSession, user_id: str, amount: int) -> Optional[int]:
+    """
+    Hold `amount` credits against the available balance (no ledger row, no commit).
+
+    Returns
+    - the remaining available balance, or None when the user is missing or credits are insufficient
+    """
+    if amount <= 0:
+        raise ValueError("amount must be positive")
+    result = await db.execute(_hold_stmt(user_id, amount))
+    row = result.first()
+    if row is None:
+        return None
+    user_cache.invalidate(user_id)
+    return int(row[0])
+
+
+def _hold_stmt(user_id: str, amount: int):
+    users = User.__table__
+    held = func.coalesce(users.c.credits_held, 0)
+    return (
+        update(users)
+        .where(users.c.id == user_id, users.c.credits_balance - held >= amount)
+        .values(credits_held=held + amount)
+        .returning((users.c.credits_balance - users.c.credits_held).label("available"))
+    )
+
+
+async def hold_and_create_task(
+    db: AsyncSession,
+    user_id: str,
+    text: str,
+    voice_path: str,
+    cost: int,
+    callback_url: Optional[str] = None,
+    idempotency: Optional[Tuple[str, str]] = None,
+) -> Optional[Tuple[str, int]]:
+    """
+    Hold `cost` credits and insert the PENDING (HELD) task and its payload,
+    plus the idempotency key when given, without committing. The ledger row is written
+    by `settle_credit_holds` once the task finishes.
+
+    On PostgreSQL this is one statement: data-modifying CTEs chained off the
+    conditional hold UPDATE, so the user's row lock is taken and released
+    within a single round trip plus the caller's COMMIT. Elsewhere (SQLite has
+    no DML in CTEs) the same statements run back to back, hold first, as
+    plain Core statements without ORM flushes.
+
+    Parameters
+    - idempotency: optional (key, request_hash); a concurrent duplicate raises IntegrityError
+
+    Returns
+    - (task_id, available_balance), or None when the user is missing or credits are insufficient
+    """
+    if cost <= 0:
+        raise ValueError("cost must be positive")
+
+    now = datetime.datetime.utcnow()
+    task_id = new_id()
+    tasks = Task.__table__
+    payloads = TaskPayload.__table__
+    keys = IdempotencyKey.__table__
+
+    hold = _hold_stmt(user_id, cost)
+    task_row = {
+        "id": task_id, "user_id": user_id, "voice_path": voice_path, "chars": len(text),
+        "status": "PENDING", "cost": cost, "callback_url": callback_url, "created_at": now,
+        "hold_status": "HELD",
+    }
+    payload_row = {"task_id": task_id, "text": text}
+    key_row = None
+    if idempotency is not None:
+        key_row = {
+            "id": new_id(), "user_id": user_id, "key": idempotency[0],
+            "request_hash": idempotency[1], "task_id": task_id, "created_at": now,
+        }
+
+    if db.bind.dialect.name == "postgresql":
+        hold_cte = hold.cte("hold")
+        ctes = [
+            insert(tasks).from_select(list(task_row), select(*_select_values(tasks, task_row)).select_from(hold_cte))
+            .returning(tasks.c.id).cte("new_task"),
+        ]
+        # Chained off new_task: a payload row exists only when the task row does.
+        ctes.append(
+            insert(payloads).from_select(list(payload_row), select(*_select_values(payloads, payload_row)).select_from(ctes[0]))
+            .returning(payloads.c.task_id).cte("new_payload")
+        )
+        if key_row is not None:
+            ctes.append(
+                insert(keys).from_select(list(key_row), select(*_select_values(keys, key_row)).select_from(hold_cte))
+                .returning(keys.c.id).cte("new_key")
+            )
+        row = (await db.execute(select(hold_cte.c.available).add_cte(*ctes))).first()
+        if row is None:
+            return None
+    else:
+        row = (await db.execute(hold)).first()
+        if row is None:
+            return None
+        await db.execute(insert(tasks).values(**task_row))
+        await db.execute(insert(payloads).values(**payload_row))
+        if key_row is not None:
+            await db.execute(insert(keys).values(**key_row))
+
+    user_cache.invalidate(user_id)
+    return task_id, int(row[0])
+
+
+async def hold_and_create_batch(
+    db: AsyncSession,
+    user_id: str,
+    items: List[Dict],
+    kind: str = "batch",
+    pause_ms: Optional[int] = None,
+    line_pauses: Optional[str] = None,
+) -> Optional[Tuple[str, int]]:
+    """
+    Batch counterpart of `hold_and_create_task`: hold the summed cost and insert
+    the TaskBatch, its PENDING (HELD) tasks and their payloads, without committing.
+
+    On PostgreSQL this is one statement (task and payload rows are INSERT ...
+    SELECTs chained off the hold CTE), so a large batch does not keep the user's
+    row locked across separate flushes. Elsewhere the hold runs first, then one
+    multi-row INSERT per table.
+
+    Parameters
+    - items: dicts with `id`, `text`, `voice_path`, `cost`, optional `callback_url` (in batch order)
+    - kind / pause_ms / line_pauses: see `TaskBatch`
+
+    Returns
+    - (batch_id, available_balance), or None when the user is missing or credits are insufficient
+    """
+    total_cost = sum(item["cost"] for item in items)
+    if total_cost <= 0:
+        raise ValueError("cost must be positive")
+
+    now = datetime.datetime.utcnow()
+    batch_id = new_id()
+    batches = TaskBatch.__table__
+    tasks = Task.__table__
+    payloads = TaskPayload.__table__
+
+    hold = _hold_stmt(user_id, total_cost)
+    batch_row = {
+        "id": batch_id, "user_id": user_id, "kind": kind, "item_count": len(items),
+        "total_cost": total_cost, "pause_ms": pause_ms, "line_pauses": line_pauses, "created_at": now,
+    }
+    task_rows = [
+        {
+            "id": item["id"], "user_id": user_id, "voice_path": item["voice_path"], "chars": len(item["text"]),
+            "status": "PENDING", "cost": item["cost"], "callback_url": item.get("callback_url"), "created_at": now,
+            "batch_id": batch_id, "batch_index": idx, "hold_status": "HELD",
+        }
+        for idx, item in enumerate(items)
+    ]
+    payload_rows = [{"task_id": item["id"], "text": item["text"]} for item in items]
+
+    if db.bind.dialect.name == "postgresql":
+        hold_cte = hold.cte("hold")
+        new_batch = (
+            insert(batches).from_select(list(batch_row), select(*_select_values(batches, batch_row)).select_from(hold_cte))
+            .returning(batches.c.id).cte("new_batch")
+        )
+
+        def rows_from(table, rows):
+            # One SELECT of typed literals per row, each producing a row only when the batch was inserted
+            selects = [select(*_select_values(table, row)).select_from(new_batch) for row in rows]
+            return selects[0] if len(selects) == 1 else union_all(*selects)
+
+        new_tasks = (
+            insert(tasks).from_select(list(task_rows[0]), rows_from(tasks, task_rows))
+            .returning(tasks.c.id).cte("new_tasks")
+        )
+        new_payloads = (
+            insert(payloads).from_select(list(payload_rows[0]), rows_from(payloads, payload_rows))
+            .returning(payloads.c.task_id).cte("new_payloads")
+        )
+        row = (await db.execute(select(hold_cte.c.available).add_cte(new_batch, new_tasks, new_payloads))).first()
+        if row is None:
+            return None
+    else:
+        row = (await db.execute(hold)).first()
+        if row is None:
+            return None
+        await db.execute(insert(batches).values(**batch_row))
+        await db.execute(insert(tasks), task_rows)
+        await db.execute(insert(payloads), payload_rows)
+
+    user_cache.invalidate(user_id)
+    return batch_id, int(row[0])
+
+
+# hold_status transitions applied by settlement: (from, to)
+_CAPTURE = ("HELD", "CAPTURED")
+_RELEASE = ("HELD", "RELEASED")
+_REFUND = ("REFUND", "REFUNDED")
+
+
+class _SettleConflict(Exception):
+    """Another settler claimed some of the selected tasks first (the unit is rolled back)."""
+
+
+async def settle_credit_holds(db: AsyncSession, limit: int = 500) -> Dict[str, int]:
+    """
+    Settle up to `limit` finished tasks in one transaction, committed through
+    `write_queue` (group commit with submissions in SQLite mode).
+
+    - COMPLETED + HELD: one TTS_CHARGE ledger row per task; balance and hold reduced
+    - FAILED + HELD: hold released (nothing was charged, so no ledger row)
+    - REFUND (charged at submit, then FAILED): one REFUND ledger row; balance restored
+
+    Statements per call are fixed regardless of batch size: one SELECT, up to
+    three task UPDATEs (guarded on the expected hold_status), one executemany
+    UPDATE over the affected users and one executemany ledger INSERT. If another
+    settler claimed some of the rows first, nothing is applied and all counts are 0.
+
+    Returns
+    - {"captured", "released", "refunded", "users"} counts
+    """
+    try:
+        counts, user_ids = await write_queue.run(db, lambda session: _settle_unit(session, limit))
+    except _SettleConflict:
+        await db.rollback()
+        return {"captured": 0, "released": 0, "refunded": 0, "users": 0}
+    for uid in user_ids:
+        user_cache.invalidate(uid)
+    return counts
+
+
+async def _settle_unit(db: AsyncSession, limit: int) -> Tuple[Dict[str, int], List[str]]:
+    tasks = Task.__table__
+    users = User.__table__
+    ledger = CreditTransaction.__table__
+    counts = {"captured": 0, "released": 0, "refunded": 0, "users": 0}
+
+    result = await db.execute(
+        select(
+            tasks.c.id, tasks.c.user_id, tasks.c.cost, tasks.c.status, tasks.c.hold_status,
+            tasks.c.batch_id, tasks.c.chars,
+        )
+        .where(or_(
+            and_(tasks.c.hold_status == "HELD", tasks.c.status.in_(("COMPLETED", "FAILED"))),
+            tasks.c.hold_status == "REFUND",
+        ))
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        return counts, []
+
+    groups = {_CAPTURE: [], _RELEASE: [], _REFUND: []}
+    for row in rows:
+        if row.hold_status == "REFUND":
+            groups[_REFUND].append(row)
+        elif row.status == "COMPLETED":
+            groups[_CAPTURE].append(row)
+        else:
+            groups[_RELEASE].append(row)
+
+    for (from_status, to_status), group in groups.items():
+        if not group:
+            continue
+        claimed = await db.execute(
+            update(tasks)
+            .where(tasks.c.id.in_([r.id for r in group]), tasks.c.hold_status == from_status)
+            .values(hold_status=to_status)
+        )
+        if claimed.rowcount != len(group):
+            raise _SettleConflict
+
+    now = datetime.datetime.utcnow()
+    deltas: Dict[str, List[int]] = {}  # user_id -> [balance delta, held delta]
+    tx_rows = []
+    for row in groups[_CAPTURE]:
+        delta = deltas.setdefault(row.user_id, [0, 0])
+        delta[0] -= row.cost or 0
+        delta[1] -= row.cost or 0
+        tx_rows.append(_ledger_row(row, -(row.cost or 0), "TTS_CHARGE", f"TTS charge: {row.chars} chars", now))
+    for row in groups[_RELEASE]:
+        deltas.setdefault(row.user_id, [0, 0])[1] -= row.cost or 0
+    for row in groups[_REFUND]:
+        deltas.setdefault(row.user_id, [0, 0])[0] += row.cost or 0
+        tx_rows.append(_ledger_row(row, row.cost or 0, "REFUND", "TTS refund: task failed", now))
+
+    await db.execute(
+        update(users)
+        .where(users.c.id == bindparam("uid"))
+        .values(
+            credits_balance=users.c.credits_balance + bindparam("balance_delta"),
+            credits_held=func.coalesce(users.c.credits_held, 0) + bindparam("held_delta"),
+        ),
+        [{"uid": uid, "balance_delta": b, "held_delta": h} for uid, (b, h) in deltas.items()],
+    )
+    tx_rows = [tx for tx in tx_rows if tx["amount"] != 0]
+    if tx_rows:
+        await db.execute(insert(ledger), tx_rows)
+    counts.update(
+        captured=len(groups[_CAPTURE]), released=len(groups[_RELEASE]),
+        refunded=len(groups[_REFUND]), users=len(deltas),
+    )
+    return counts, list(deltas)
+
+
+def _ledger_row(task, amount: int, kind: str, reason: str, now: datetime.datetime) -> dict:
+    return {
+        "id": new_id(), "user_id": task.user_id, "amount": amount, "kind": kind,
+        "reason": reason, "related_task_id": task.id,
+        "external_ref": f"batch:{task.batch_id}" if task.batch_id else None, "created_at": now,
+    }
+
+
+async def list_credit_transactions(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[CreditTransaction], Optional[str]]:
+    """
+    One keyset page of a user's ledger, newest first.
+
+    Returns
+    - (transactions, next_cursor); next_cursor is None on the last page
+
+    Raises `InvalidCursor` for a malformed cursor.
+    """
+    stmt = select(CreditTransaction).where(CreditTransaction.user_id == user_id)
+    result = await db.execute(keyset_page(stmt, CreditTransaction.created_at, CreditTransaction.id, cursor, limit))
+    return split_page(result.scalars().all(), limit)
@@ -0,0 +1,135 @@
+"""
+Pronunciation lexicon CRUD helpers.
+
+Every committed change is mirrored into `lexicon_registry` so the compiled
+automaton stays in sync without being rebuilt from the database. Writes are
+Core statements committed through `write_queue` (group commit in SQLite
+mode); they return plain rows, not ORM instances.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.lexicon import Lexicon, lexicon_registry
+from backend.app.core.write_queue import write_queue
+from backend.app.db.ids import new_id
+from backend.app.db.models import LexiconEntry
+
+_ENTRY_COLUMNS = (
+    LexiconEntry.id, LexiconEntry.term, LexiconEntry.replacement,
+    LexiconEntry.created_at, LexiconEntry.updated_at,
+)
+
+
+async def list_lexicon_entries(db: AsyncSession, user_id: str) -> List[LexiconEntry]:
+    result = await db.execute(
+        select(LexiconEntry)
+        .where(LexiconEntry.user_id == user_id)
+        .order_by(LexiconEntry.term)
+    )
+    return result.scalars().all()
+
+
+async def get_lexicon_entry(db: AsyncSession, user_id: str, entry_id: str) -> Optional[LexiconEntry]:
+    result = await db.execute(
+        select(LexiconEntry)
+        .where(LexiconEntry.id == entry_id)
+        .where(LexiconEntry.user_id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def get_lexicon_entry_by_term(db: AsyncSession, user_id: str, term: str) -> Optional[LexiconEntry]:
+    result = await db.execute(
+        select(LexiconEntry)
+        .where(LexiconEntry.user_id == user_id)
+        .where(LexiconEntry.term == term)
+    )
+    return result.scalars().first()
+
+
+async def upsert_lexicon_entry(
+    db: AsyncSession,
+    user_id: str,
+    term: str,
+    replacement: str,
+) -> Row:
+    """
+    Create an entry, or update the replacement when `term` already exists.
+    """
+    async def unit(session: AsyncSession) -> Row:
+        now = datetime.datetime.utcnow()
+        updated = (
+            await session.execute(
+                update(LexiconEntry)
+                .where(LexiconEntry.user_id == user_id, LexiconEntry.term == term)
+                .values(replacement=replacement, updated_at=now)
+                .returning(*_ENTRY_COLUMNS)
+            )
+        ).first()
+        if updated is not None:
+            return updated
+        return (
+            await session.execute(
+                insert(LexiconEntry)
+                .values(id=new_id(), user_id=user_id, term=term, replacement=replacement, created_at=now, updated_at=now)
+                .returning(*_ENTRY_COLUMNS)
+            )
+        ).one()
+
+    entry = await write_queue.run(db, unit)
+    lexicon_registry.add(user_id, term, replacement)
+    return entry
+
+
+async def update_lexicon_entry(
+    db: AsyncSession,
+    entry: LexiconEntry,
+    term: str,
+    replacement: str,
+) -> Row:
+    entry_id, user_id, old_term = entry.id, entry.user_id, entry.term
+
+    async def unit(session: AsyncSession) -> Row:
+        return (
+            await session.execute(
+                update(LexiconEntry)
+                .where(LexiconEntry.id == entry_id)
+                .values(term=term, replacement=replacement, updated_at=datetime.datetime.utcnow())
+                .returning(*_ENTRY_COLUMNS)
+            )
+        ).one()
+
+    row = await write_queue.run(db, unit)
+    if old_term != term:
+        lexicon_registry.remove(user_id, old_term)
+    lexicon_registry.add(user_id, term, replacement)
+    return row
+
+
+async def delete_lexicon_entry(db: AsyncSession, entry: LexiconEntry) -> None:
+    entry_id, user_id, term = entry.id, entry.user_id, entry.term
+    await write_queue.run(db, lambda session: session.execute(delete(LexiconEntry).where(LexiconEntry.id == entry_id)))
+    lexicon_registry.remove(user_id, term)
+
+
+async def get_user_lexicon(db: AsyncSession, user_id: str) -> Lexicon:
+    """
+    Return the compiled lexicon for a user, loading it from the database once.
+    """
+    lexicon = lexicon_registry.get(user_id)
+    if lexicon is not None:
+        return lexicon
+    rows = (
+        await db.execute(
+            select(LexiconEntry.term, LexiconEntry.replacement)
+            .where(LexiconEntry.user_id == user_id)
+        )
+    ).all()
+    return lexicon_registry.load(user_id, rows)
@@ -0,0 +1,39 @@
+"""
+Replica heartbeat (see `core/read_replica.py`).
+
+One row, upserted on the primary and read on the replica. The timestamp only
+moves forward, so several processes can beat concurrently.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db.models import ReplicaHeartbeat
+
+HEARTBEAT = "primary"
+
+
+async def write_replica_heartbeat(db: AsyncSession, beat_at: datetime.datetime) -> None:
+    """Advance the heartbeat to `beat_at` (kept when a newer one is stored) and commit."""
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(ReplicaHeartbeat).values(name=HEARTBEAT, beat_at=beat_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReplicaHeartbeat.name],
+        set_={"beat_at": stmt.excluded.beat_at},
+        where=ReplicaHeartbeat.beat_at < stmt.excluded.beat_at,
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def get_replica_heartbeat(db: AsyncSession) -> Optional[datetime.datetime]:
+    return (
+        await db.execute(select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.name == HEARTBEAT))
+    ).scalar_one_or_none()
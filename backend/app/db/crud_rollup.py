@@ -0,0 +1,208 @@
+"""
+Incremental statistics rollups over finished tasks.
+
+`rollup_finished_tasks` walks `tasks` in `(completed_at, id)` order from a
+stored watermark and adds each newly finished task to the hourly, daily and
+per-user tables with upserts. Every task is aggregated exactly once, so the
+readers below never scan `tasks`: finished-task statistics come from the
+rollups, and the few active (PENDING / PROCESSING) tasks are counted live
+from the `completed_at IS NULL` range of `ix_tasks_completed`.
+
+Rollups trail the tasks table by up to one job interval plus ROLLUP_LAG_SECONDS.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db.models import (
+    RollupWatermark, Task, TaskRollupDaily, TaskRollupHourly, UserUsageDaily
+)
+
+TASKS_ROLLUP = "tasks"
+
+
+def _insert(db: AsyncSession, table):
+    return (pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert)(table)
+
+
+async def _upsert_add(db: AsyncSession, table, rows: List[dict], keys: Tuple[str, ...]) -> None:
+    """Multi-row INSERT that adds the non-key columns onto existing rows."""
+    if not rows:
+        return
+    stmt = _insert(db, table)
+    counters = [c for c in rows[0] if c not in keys]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={c: table.c[c] + stmt.excluded[c] for c in counters},
+    )
+    await db.execute(stmt, rows)
+
+
+async def get_watermark(db: AsyncSession, name: str):
+    """`(completed_at, task_id)` of job `name`, creating the row on first use; both None at the start."""
+    await db.execute(_insert(db, RollupWatermark.__table__).values(name=name).on_conflict_do_nothing())
+    return (await db.execute(
+        select(RollupWatermark.completed_at, RollupWatermark.task_id).where(RollupWatermark.name == name)
+    )).one()
+
+
+def watermark_position(mark):
+    """`(completed_at, task_id)` of `mark` as a typed tuple, to compare against `tuple_(Task.completed_at, Task.id)`."""
+    return tuple_(mark.completed_at, mark.task_id, types=(Task.completed_at.type, Task.id.type))
+
+
+async def advance_watermark(db: AsyncSession, name: str, mark, last) -> bool:
+    """Compare-and-set job `name` from `mark` to task row `last`; False when another process moved it first."""
+    claimed = await db.execute(
+        update(RollupWatermark)
+        .where(
+            RollupWatermark.name == name,
+            RollupWatermark.completed_at == mark.completed_at,
+            RollupWatermark.task_id == mark.task_id,
+        )
+        .values(completed_at=last.completed_at, task_id=last.id)
+    )
+    return claimed.rowcount == 1
+
+
+async def rollup_finished_tasks(db: AsyncSession, limit: int = 5000, lag_seconds: float = 5.0) -> int:
+    """
+    Fold up to `limit` tasks finished since the watermark into the rollups (commits).
+
+    Tasks finished in the last `lag_seconds` are left for the next run, so a
+    status update committed slightly out of `completed_at` order is not skipped.
+    The watermark moves with a compare-and-set; if another process advanced it
+    first, nothing is applied and 0 is returned.
+
+    Returns
+    - the number of tasks rolled up
+    """
+    mark = await get_watermark(db, TASKS_ROLLUP)
+
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=lag_seconds)
+    stmt = select(
+        Task.id, Task.user_id, Task.status, Task.voice_path, Task.cost, Task.completed_at,
+        Task.chars,
+    ).where(Task.completed_at.is_not(None), Task.completed_at < cutoff)
+    if mark.completed_at is not None:
+        stmt = stmt.where(tuple_(Task.completed_at, Task.id) > watermark_position(mark))
+    rows = (await db.execute(stmt.order_by(Task.completed_at, Task.id).limit(limit))).all()
+    if not rows:
+        await db.rollback()
+        return 0
+
+    if not await advance_watermark(db, TASKS_ROLLUP, mark, rows[-1]):
+        await db.rollback()
+        return 0
+
+    hourly: Dict[tuple, List[int]] = {}
+    daily: Dict[tuple, List[int]] = {}
+    usage: Dict[tuple, List[int]] = {}
+    for row in rows:
+        completed = row.status == "COMPLETED"
+        cost = (row.cost or 0) if completed else 0
+        hour = row.completed_at.replace(minute=0, second=0, microsecond=0)
+        for bucket, key in (
+            (hourly, (hour, row.status)),
+            (daily, (hour.date(), row.status, row.voice_path)),
+        ):
+            acc = bucket.setdefault(key, [0, 0, 0])
+            acc[0] += 1
+            acc[1] += row.chars or 0
+            acc[2] += cost
+        if row.user_id is not None:
+            acc = usage.setdefault((row.user_id, hour.date()), [0, 0, 0, 0])
+            acc[0] += 1
+            acc[1] += 0 if completed else 1
+            acc[2] += (row.chars or 0) if completed else 0
+            acc[3] += cost
+
+    await _upsert_add(db, TaskRollupHourly.__table__, [
+        {"hour": h, "status": s, "tasks": n, "chars": c, "cost": x} for (h, s), (n, c, x) in hourly.items()
+    ], ("hour", "status"))
+    await _upsert_add(db, TaskRollupDaily.__table__, [
+        {"day": d, "status": s, "voice_path": v, "tasks": n, "chars": c, "cost": x}
+        for (d, s, v), (n, c, x) in daily.items()
+    ], ("day", "status", "voice_path"))
+    await _upsert_add(db, UserUsageDaily.__table__, [
+        {"user_id": u, "day": d, "tasks": n, "failed": f, "chars": c, "cost": x}
+        for (u, d), (n, f, c, x) in usage.items()
+    ], ("user_id", "day"))
+    await db.commit()
+    return len(rows)
+
+
+async def get_task_stats(db: AsyncSession) -> dict:
+    """
+    Task statistics for the monitor dashboards, read from the rollups.
+
+    Returns
+    - task_stats: lifetime count per status (active statuses counted live)
+    - total_tasks, today_tasks (finished today UTC + active)
+    - tasks_24h (finished in the last 24 hours + active), total_chars_24h, total_cost_24h
+      (completed tasks; hour granularity)
+    """
+    now = datetime.datetime.utcnow()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    since_24h = now.replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=23)
+
+    task_stats = {
+        status: int(count)
+        for status, count in (await db.execute(
+            select(TaskRollupDaily.status, func.sum(TaskRollupDaily.tasks)).group_by(TaskRollupDaily.status)
+        )).all()
+    }
+    active = dict((await db.execute(
+        select(Task.status, func.count()).where(Task.completed_at.is_(None)).group_by(Task.status)
+    )).all())
+    active_total = sum(active.values())
+    for status, count in active.items():
+        task_stats[status] = task_stats.get(status, 0) + count
+
+    hour_rows = (await db.execute(
+        select(TaskRollupHourly.hour, TaskRollupHourly.status, TaskRollupHourly.tasks,
+               TaskRollupHourly.chars, TaskRollupHourly.cost)
+        .where(TaskRollupHourly.hour >= min(midnight, since_24h))
+    )).all()
+    today = sum(r.tasks for r in hour_rows if r.hour >= midnight)
+    last_24h = [r for r in hour_rows if r.hour >= since_24h]
+
+    return {
+        "task_stats": task_stats,
+        "total_tasks": sum(task_stats.values()),
+        "today_tasks": today + active_total,
+        "tasks_24h": sum(r.tasks for r in last_24h) + active_total,
+        "total_chars_24h": sum(r.chars for r in last_24h if r.status == "COMPLETED"),
+        "total_cost_24h": sum(r.cost for r in last_24h),
+    }
+
+
+async def get_user_daily_usage(db: AsyncSession, user_id: str, days: int = 30) -> List[dict]:
+    """
+    One entry per UTC day for the last `days` days (oldest first, zero-filled).
+    """
+    today = datetime.datetime.utcnow().date()
+    first = today - datetime.timedelta(days=days - 1)
+    rows = (await db.execute(
+        select(UserUsageDaily).where(UserUsageDaily.user_id == user_id, UserUsageDaily.day >= first)
+    )).scalars().all()
+    by_day = {row.day: row for row in rows}
+    usage = []
+    for i in range(days):
+        day = first + datetime.timedelta(days=i)
+        row = by_day.get(day)
+        usage.append({
+            "day": day.isoformat(),
+            "tasks": row.tasks if row else 0,
+            "failed": row.failed if row else 0,
+            "chars": row.chars if row else 0,
+            "cost": row.cost if row else 0,
+        })
+    return usage
@@ -1,9 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update
-from typing import Optional, List
-from backend.app.db.models import Task
-import uuid
+from sqlalchemy import update, insert, delete, case, func
+from typing import Optional, List, Dict, Tuple
+from backend.app.db.models import Task, TaskBatch, TaskPayload, IdempotencyKey
+from backend.app.db.pagination import keyset_page, split_page
+from backend.app.db.ids import new_id
 import datetime
 
 async def create_task(
@@ -12,7 +13,8 @@ async def create_task(
     text: str,
     voice_path: str,
     cost: int = 0,
-    commit: bool = True
+    commit: bool = True,
+    callback_url: Optional[str] = None
 ) -> Task:
     """
     Create a new TTS task record.
@@ -24,37 +26,62 @@ async def create_task(
     - voice_path: absolute path to the selected voice wav
     - cost: credits to consume for this task
     - commit: when True, commit immediately; when False, only flush and let caller commit
+    - callback_url: optional webhook notified when the task finishes
     """
     task = Task(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         user_id=user_id,
-        text=text,
         voice_path=voice_path,
+        chars=len(text),
         status="PENDING",
         cost=cost,
+        callback_url=callback_url,
     )
     db.add(task)
+    await db.flush()
+    await db.execute(insert(TaskPayload).values(task_id=task.id, text=text))
     if commit:
         await db.commit()
         await db.refresh(task)
-    else:
-        await db.flush()
     return task
 
 async def get_task(db: AsyncSession, task_id: str) -> Optional[Task]:
     result = await db.execute(select(Task).filter(Task.id == task_id))
     return result.scalars().first()
 
+async def get_task_statuses(db: AsyncSession, task_ids: List[str], user_id: Optional[str] = None):
+    """
+    Status columns for many tasks in one `WHERE id IN (...)` query.
+
+    Parameters:
+    - task_ids: ids to look up (unknown ids are simply absent from the result)
+    - user_id: when set, only that user's tasks are returned
+
+    Returns rows with `id, status, output_url, error_message`.
+    """
+    stmt = select(Task.id, Task.status, Task.output_url, Task.error_message).filter(Task.id.in_(task_ids))
+    if user_id is not None:
+        stmt = stmt.filter(Task.user_id == user_id)
+    result = await db.execute(stmt)
+    return result.all()
+
 async def update_task_status(
     db: AsyncSession,
     task_id: str,
     status: str,
     output_url: Optional[str] = None,
-    error_message: Optional[str] = None
+    error_message: Optional[str] = None,
+    commit: bool = True
 ) -> Optional[Task]:
     values = {"status": status}
     if status in {"COMPLETED", "FAILED"}:
         values["completed_at"] = datetime.datetime.utcnow()
+    if status == "FAILED":
+        # Charged at submit (no hold): queue an automatic refund for the credit settler
+        values["hold_status"] = case(
+            ((Task.hold_status.is_(None)) & (Task.cost > 0), "REFUND"),
+            else_=Task.hold_status,
+        )
     if output_url:
         values["output_url"] = output_url
     if error_message:
@@ -67,19 +94,108 @@ async def update_task_status(
         .returning(Task)
     )
     result = await db.execute(stmt)
-    await db.commit()
-    return result.scalars().first()
+    task = result.scalars().first()
+    if commit:
+        await db.commit()
+    return task
+
+TEXT_EXCERPT_CHARS = 120
 
-async def get_user_tasks(
+def text_excerpt(column=TaskPayload.text):
+    """SQL expression: the first TEXT_EXCERPT_CHARS characters of `column`, plus "..." when longer."""
+    head = func.substr(column, 1, TEXT_EXCERPT_CHARS + 1)
+    return case(
+        (func.length(head) > TEXT_EXCERPT_CHARS, func.substr(column, 1, TEXT_EXCERPT_CHARS).concat("...")),
+        else_=head,
+    )
+
+async def list_task_history(
     db: AsyncSession,
     user_id: str,
-    limit: int = 50
-) -> List[Task]:
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """
+    One keyset page of a user's tasks, newest first: `(rows, next_cursor)`.
+
+    Only the listed columns are selected; `text_excerpt` is cut in SQL
+    (first TEXT_EXCERPT_CHARS characters + "...") from the payload joined on
+    its primary key, so full texts never leave the database. Raises
+    `InvalidCursor` for a malformed cursor.
+    """
+    stmt = select(
+        Task.id, Task.status, Task.cost, Task.voice_path, func.coalesce(text_excerpt(), "").label("text_excerpt"),
+        Task.output_url, Task.error_message, Task.created_at, Task.completed_at,
+    ).outerjoin(TaskPayload, TaskPayload.task_id == Task.id).where(Task.user_id == user_id)
+    result = await db.execute(keyset_page(stmt, Task.created_at, Task.id, cursor, limit))
+    return split_page(result.all(), limit)
+
+
+async def get_batch(db: AsyncSession, batch_id: str) -> Optional[TaskBatch]:
+    result = await db.execute(select(TaskBatch).filter(TaskBatch.id == batch_id))
+    return result.scalars().first()
+
+async def get_batch_tasks(db: AsyncSession, batch_id: str) -> List[Task]:
     result = await db.execute(
         select(Task)
-        .filter(Task.user_id == user_id)
-        .order_by(Task.created_at.desc())
-        .limit(limit)
+        .filter(Task.batch_id == batch_id)
+        .order_by(Task.batch_index)
     )
     return result.scalars().all()
 
+async def replace_batch_line(
+    db: AsyncSession,
+    batch_id: str,
+    user_id: str,
+    index: int,
+    task_id: str,
+    text: str,
+    voice_path: str,
+    cost: int,
+) -> bool:
+    """
+    Swap the task at `index` for a fresh (HELD) one (no commit).
+
+    The previous task is detached from the batch but kept, so its audio and
+    history stay intact; the other lines are untouched. Only a finished line
+    can be replaced: returns False (nothing written) while the current task is
+    still PENDING/PROCESSING, so a queued render is never paid for twice.
+    `total_cost` becomes the cost of the batch's current lines.
+    """
+    detached = await db.execute(
+        update(Task)
+        .where(Task.batch_id == batch_id)
+        .where(Task.batch_index == index)
+        .where(Task.status.in_(("COMPLETED", "FAILED")))
+        .values(batch_id=None)
+    )
+    if detached.rowcount != 1:
+        return False
+    await db.execute(insert(Task).values(
+        id=task_id,
+        user_id=user_id,
+        voice_path=voice_path,
+        chars=len(text),
+        status="PENDING",
+        cost=cost,
+        created_at=datetime.datetime.utcnow(),
+        batch_id=batch_id,
+        batch_index=index,
+        hold_status="HELD",
+    ))
+    await db.execute(insert(TaskPayload).values(task_id=task_id, text=text))
+    await db.execute(
+        update(TaskBatch)
+        .where(TaskBatch.id == batch_id)
+        .values(total_cost=select(func.coalesce(func.sum(Task.cost), 0)).where(Task.batch_id == batch_id).scalar_subquery())
+    )
+    return True
+
+async def get_idempotency_key(db: AsyncSession, user_id: str, key: str) -> Optional[IdempotencyKey]:
+    result = await db.execute(
+        select(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    return result.scalars().first()
+
+async def delete_idempotency_key(db: AsyncSession, record_id: str) -> None:
+    await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
@@ -1,9 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update
-from typing import Optional
-from backend.app.db.models import User
-import uuid
+from sqlalchemy import delete, update
+from typing import List, Optional, Tuple
+import datetime
+from backend.app.core.user_cache import user_cache
+from backend.app.db.models import User, UserCacheInvalidation
+from backend.app.db.ids import new_id
 
 async def create_user(
     db: AsyncSession,
@@ -14,7 +16,7 @@ async def create_user(
     initial_credits: int = 100
 ) -> User:
     user = User(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         email=email,
         hashed_password=hashed_password,
         provider=provider,
@@ -43,6 +45,7 @@ async def update_user_credits(db: AsyncSession, user_id: str, credits_delta: int
     )
     result = await db.execute(stmt)
     await db.commit()
+    user_cache.invalidate(user_id)
     return result.scalars().first()
 
 async def check_and_deduct_credits(db: AsyncSession, user_id: str, cost: int) -> bool:
@@ -58,5 +61,28 @@ async def check_and_deduct_credits(db: AsyncSession, user_id: str, cost: int) ->
     )
     result = await db.execute(stmt)
     await db.commit()
+    user_cache.invalidate(user_id)
     return result.rowcount > 0
 
+
+async def record_user_invalidation(db: AsyncSession, user_id: str) -> None:
+    """
+    Tell every API process to drop `user_id` from its auth cache (see `core/auth_invalidation.py`).
+
+    For processes without access to the API's `user_cache` (monitor); call it in the
+    transaction that changes the user, so the signal commits with the change. Rows older
+    than a day are pruned here (they outlive any cache entry).
+    """
+    now = datetime.datetime.utcnow()
+    db.add(UserCacheInvalidation(user_id=user_id, created_at=now))
+    await db.execute(
+        delete(UserCacheInvalidation).where(UserCacheInvalidation.created_at < now - datetime.timedelta(days=1))
+    )
+
+async def list_user_invalidations(db: AsyncSession, since: datetime.datetime) -> List[Tuple[int, str]]:
+    """`(id, user_id)` of invalidations recorded at or after `since`."""
+    result = await db.execute(
+        select(UserCacheInvalidation.id, UserCacheInvalidation.user_id)
+        .where(UserCacheInvalidation.created_at >= since)
+    )
+    return [(row[0], row[1]) for row in result.all()]
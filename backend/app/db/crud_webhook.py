@@ -0,0 +1,61 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update
+from typing import Optional, List
+from backend.app.db.models import WebhookDelivery, WebhookAttempt
+import datetime
+
+async def create_webhook_delivery(
+    db: AsyncSession,
+    task_id: str,
+    url: str,
+    event: str,
+    payload: str
+) -> WebhookDelivery:
+    delivery = WebhookDelivery(task_id=task_id, url=url, event=event, payload=payload, status="PENDING")
+    db.add(delivery)
+    await db.commit()
+    return delivery
+
+async def record_webhook_attempt(
+    db: AsyncSession,
+    delivery_id: str,
+    attempt: int,
+    status_code: Optional[int],
+    error: Optional[str],
+    duration_ms: int,
+    status: str,
+    next_attempt_at: Optional[datetime.datetime] = None
+) -> None:
+    """
+    Persist one HTTP attempt and the delivery's resulting state in one commit.
+
+    Parameters:
+    - status: PENDING (retry scheduled at next_attempt_at) / DELIVERED / FAILED
+    """
+    db.add(WebhookAttempt(
+        delivery_id=delivery_id,
+        attempt=attempt,
+        status_code=status_code,
+        error=error,
+        duration_ms=duration_ms,
+    ))
+    values = {
+        "status": status,
+        "attempts": attempt,
+        "last_status_code": status_code,
+        "last_error": error,
+        "next_attempt_at": next_attempt_at,
+    }
+    if status == "DELIVERED":
+        values["delivered_at"] = datetime.datetime.utcnow()
+    await db.execute(update(WebhookDelivery).where(WebhookDelivery.id == delivery_id).values(**values))
+    await db.commit()
+
+async def get_pending_webhook_deliveries(db: AsyncSession) -> List[WebhookDelivery]:
+    result = await db.execute(
+        select(WebhookDelivery)
+        .filter(WebhookDelivery.status == "PENDING")
+        .order_by(WebhookDelivery.created_at)
+    )
+    return result.scalars().all()
@@ -1,17 +1,162 @@
+"""
+Database engines and sessions.
+
+PostgreSQL (the default) uses one pooled engine.
+
+A file SQLite database (`sqlite+aiosqlite:///path.db`) runs in SQLite mode:
+- Every connection uses WAL, `synchronous=NORMAL`, `busy_timeout` and
+  `mmap_size`. Readers then never block the writer, and commits do not fsync;
+  only WAL checkpoints do.
+- `engine` is the writer. Its pool holds one connection, so writes in this
+  process queue for it instead of failing with "database is locked".
+  Transactions start with `BEGIN IMMEDIATE`, which takes the write lock up
+  front. Other processes wait up to `busy_timeout` for it, rather than
+  deadlocking on a lock upgrade.
+- `read_engine` is a separate pool of `query_only` connections.
+  `RoutingSession` sends each statement of a transaction to the read pool
+  until the transaction writes (flush, INSERT/UPDATE/DELETE,
+  SELECT ... FOR UPDATE). From then until commit or rollback, everything
+  goes to the writer, so the transaction reads its own writes.
+- Hot writes (task submission, worker status updates) are additionally
+  group-committed by `core/write_queue.py`.
+
+With READ_REPLICA_URL set, `replica_engine` is a read-only engine on a
+replica of the primary. Read-only routes reach it through `get_read_db`
+(`core/deps.py`, routing in `core/read_replica.py`).
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 from backend.app.core.config import settings
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
+
+def is_sqlite_file(url: str) -> bool:
+    """True for an on-disk SQLite URL (SQLite mode); in-memory databases keep a single engine."""
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def configure_sqlite(engine, writer: bool) -> None:
+    """
+    Apply the SQLite-mode pragmas and BEGIN behaviour to `engine`'s connections.
+
+    The driver's own transaction handling is switched off, and BEGIN is
+    emitted here instead. This makes BEGIN IMMEDIATE possible, and lets
+    SAVEPOINT work.
+    """
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        if not writer:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if writer else "BEGIN")
+
+
+def create_sqlite_engines(url: str, read_pool_size: int = 8):
+    """(writer engine with one connection, read-only engine with `read_pool_size` connections)"""
+    writer = create_async_engine(url, pool_size=1, max_overflow=0)
+    reader = create_async_engine(url, pool_size=read_pool_size, max_overflow=0)
+    configure_sqlite(writer, writer=True)
+    configure_sqlite(reader, writer=False)
+    return writer, reader
+
+
+def is_write_clause(clause) -> bool:
+    """True for statements that need the primary / writer (DML, non-SELECT text, SELECT ... FOR UPDATE)."""
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(("SELECT", "WITH", "EXPLAIN"))
+    return getattr(clause, "_for_update_arg", None) is not None
+
+
+class RoutingSession(Session):
+    """
+    Session over a writer and a read pool (SQLite mode).
+
+    Statements go to `read_engine` until the transaction writes. From then
+    until the transaction ends, they go to the writer.
+    """
+
+    write_engine = None
+    read_engine = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.info.get("writing") and (self._flushing or is_write_clause(clause)):
+            self.info["writing"] = True
+        return (self.write_engine if self.info.get("writing") else self.read_engine).sync_engine
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _end_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+
+def routing_session_class(write_engine, read_engine):
+    """A `RoutingSession` subclass bound to these two engines."""
+    return type("RoutingSession", (RoutingSession,), {"write_engine": write_engine, "read_engine": read_engine})
+
+
+def mark_writing(db: AsyncSession) -> None:
+    """Route everything in `db`'s current transaction to the writer (SQLite mode)."""
+    db.info["writing"] = True
+
+
+def is_writing(db: AsyncSession) -> bool:
+    """True when `db`'s current transaction has written (SQLite mode) and holds the writer connection."""
+    return bool(db.info.get("writing"))
+
+
+IS_SQLITE = is_sqlite_file(settings.DATABASE_URL)
+
+if IS_SQLITE:
+    engine, read_engine = create_sqlite_engines(settings.DATABASE_URL, settings.SQLITE_READ_POOL_SIZE)
+    session_class = routing_session_class(engine, read_engine)
+else:
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        future=True,
+        pool_pre_ping=True,
+    )
+    read_engine = engine
+    session_class = Session
+
+def create_replica_engine(url: str, pool_size: int):
+    """Read-only engine on a replica: query_only SQLite connections, or read-only PostgreSQL transactions."""
+    if is_sqlite_file(url):
+        replica = create_async_engine(url, pool_size=pool_size, max_overflow=0)
+        configure_sqlite(replica, writer=False)
+        return replica
+    connect_args = {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args["server_settings"] = {"default_transaction_read_only": "on"}
+    return create_async_engine(url, pool_size=pool_size, pool_pre_ping=True, connect_args=connect_args)
+
+
+replica_engine = (
+    create_replica_engine(settings.READ_REPLICA_URL, settings.READ_REPLICA_POOL_SIZE)
+    if settings.READ_REPLICA_URL else None
 )
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=session_class,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
@@ -23,4 +168,3 @@ async def get_db():
             yield session
         finally:
             await session.close()
-
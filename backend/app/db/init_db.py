@@ -1,13 +1,127 @@
+from sqlalchemy import Uuid, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.db.ids import UUIDKey, key_bytes
 from backend.app.db.models import Base
 from backend.app.db.database import engine
 
+def _add_missing_columns(sync_conn):
+    """
+    Additive schema upgrade for existing databases.
+
+    `create_all` only creates missing tables; columns and indexes added to
+    existing models later are created here (new columns must be nullable).
+    """
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            col_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}')
+            print(f"Added column {table.name}.{column.name}")
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(sync_conn)
+                print(f"Created index {index.name}")
+
+def _split_task_payloads(sync_conn):
+    """
+    One-time move of `tasks.text` into `task_payloads` (filling `tasks.chars`),
+    then drop the column. No-op once `tasks` has no `text` column.
+    """
+    if "text" not in {c["name"] for c in inspect(sync_conn).get_columns("tasks")}:
+        return
+    sync_conn.exec_driver_sql(
+        "INSERT INTO task_payloads (task_id, text) SELECT id, text FROM tasks "
+        "WHERE id NOT IN (SELECT task_id FROM task_payloads)"
+    )
+    sync_conn.exec_driver_sql("UPDATE tasks SET chars = length(text) WHERE chars IS NULL")
+    sync_conn.exec_driver_sql("ALTER TABLE tasks DROP COLUMN text")
+    print("Moved tasks.text to task_payloads")
+
+def _convert_uuid_keys(sync_conn):
+    """
+    One-time conversion of existing string ids in `UUIDKey` columns (every
+    `new_id` primary key and the columns referring to them). Columns moved
+    to `UUIDKey` later are converted the same way on the next start.
+
+    PostgreSQL: foreign keys on the affected columns are dropped, the columns
+    are altered to `uuid` and the keys are recreated. SQLite: the 36-character
+    strings are rewritten in place as 16-byte BLOBs (the declared column type
+    is left alone). Existing ids keep their values; only new ids are UUIDv7.
+    Runs before `create_all`, so new tables are created against converted keys.
+    """
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    targets = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if isinstance(column.type, UUIDKey) and column.name in existing_columns:
+                targets.append((table.name, column.name, existing_columns[column.name]))
+
+    if sync_conn.dialect.name == "postgresql":
+        pending = {(t, c) for t, c, col_type in targets if not isinstance(col_type, Uuid)}
+        if not pending:
+            return
+        foreign_keys = [
+            (table_name, fk)
+            for table_name in existing_tables
+            for fk in inspector.get_foreign_keys(table_name)
+            if any((table_name, c) in pending for c in fk["constrained_columns"])
+        ]
+        for table_name, fk in foreign_keys:
+            sync_conn.exec_driver_sql(f'ALTER TABLE {table_name} DROP CONSTRAINT "{fk["name"]}"')
+        for table_name, column_name in sorted(pending):
+            sync_conn.exec_driver_sql(
+                f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE uuid USING {column_name}::uuid"
+            )
+        for table_name, fk in foreign_keys:
+            sync_conn.exec_driver_sql(
+                f'ALTER TABLE {table_name} ADD CONSTRAINT "{fk["name"]}" '
+                f'FOREIGN KEY ({", ".join(fk["constrained_columns"])}) '
+                f'REFERENCES {fk["referred_table"]} ({", ".join(fk["referred_columns"])})'
+            )
+        print(f"Converted {len(pending)} id columns to uuid")
+        return
+
+    # The conversion commits as a whole, so the first stored primary key of each table tells
+    # whether it has run for that table.
+    primary_keys = [(t, c) for t, c, _ in targets if Base.metadata.tables[t].c[c].primary_key]
+    if not any(
+        sync_conn.exec_driver_sql(f"SELECT typeof({c}) FROM {t} LIMIT 1").scalar() == "text"
+        for t, c in primary_keys
+    ):
+        return
+    sync_conn.connection.dbapi_connection.create_function("uuid_bytes", 1, key_bytes)
+    for table_name, column_name, _ in targets:
+        invalid = sync_conn.exec_driver_sql(
+            f"SELECT count(*) FROM {table_name} "
+            f"WHERE typeof({column_name}) = 'text' AND uuid_bytes({column_name}) IS NULL"
+        ).scalar()
+        if invalid:
+            raise RuntimeError(f"{table_name}.{column_name}: {invalid} values are not UUIDs; fix them before upgrading")
+        sync_conn.exec_driver_sql(
+            f"UPDATE {table_name} SET {column_name} = uuid_bytes({column_name}) WHERE typeof({column_name}) = 'text'"
+        )
+    print(f"Converted {len(targets)} id columns to 16-byte keys")
+
 async def create_tables():
     """
     Create all database tables.
     """
     async with engine.begin() as conn:
+        await conn.run_sync(_convert_uuid_keys)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_split_task_payloads)
 
 async def init_db():
     """
@@ -15,4 +129,3 @@ async def init_db():
     """
     await create_tables()
     print("Database tables created successfully.")
-
@@ -1,43 +1,99 @@
 import datetime
-import uuid
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
 
+from backend.app.db.ids import UUIDKey, new_id
+
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDKey, primary_key=True, default=new_id)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=True) # Nullable for OAuth
     provider = Column(String, default="local") # local, google, github, wechat
     provider_user_id = Column(String, nullable=True) # OAuth provider user ID
     avatar = Column(String, nullable=True)
     credits_balance = Column(Integer, default=100) # Free credits on signup
+    credits_held = Column(Integer, default=0) # Held by queued tasks, not yet settled (see crud_credits)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
 
     tasks = relationship("Task", back_populates="user")
     credit_transactions = relationship("CreditTransaction", back_populates="user")
     feedbacks = relationship("Feedback", back_populates="user")
+    lexicon_entries = relationship("LexiconEntry", back_populates="user")
 
 class Task(Base):
     __tablename__ = "tasks"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=True) # Nullable for demo/anonymous if needed
-    text = Column(String, nullable=False)
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=True) # Nullable for demo/anonymous if needed
     voice_path = Column(String, nullable=False)
+    chars = Column(Integer, nullable=True) # len(text); the text itself lives in TaskPayload
     status = Column(String, default="PENDING") # PENDING, PROCESSING, COMPLETED, FAILED
     cost = Column(Integer, default=0) # Credits consumed
     output_url = Column(String, nullable=True)
     error_message = Column(String, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
     completed_at = Column(DateTime, nullable=True)
+    batch_id = Column(UUIDKey, ForeignKey("task_batches.id"), nullable=True, index=True)
+    batch_index = Column(Integer, nullable=True) # Position within the batch
+    callback_url = Column(String, nullable=True) # Webhook notified when the task finishes
+    # Credit hold lifecycle: HELD -> CAPTURED (completed) / RELEASED (failed);
+    # NULL = charged at submit (pre-hold tasks) -> REFUND (failed, refund due) -> REFUNDED
+    hold_status = Column(String, nullable=True, index=True)
+    # Set when the full row was moved to cold storage; the payload text is then only an excerpt
+    archived_at = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="tasks")
 
+class TaskPayload(Base):
+    """
+    Request text of a task, kept out of the hot `tasks` table.
+
+    Status polls, the worker's status writes, billing and statistics only
+    touch `tasks`; the text is read for history excerpts (joined on the
+    primary key), admin listings and archival.
+    """
+
+    __tablename__ = "task_payloads"
+
+    task_id = Column(UUIDKey, ForeignKey("tasks.id"), primary_key=True)
+    text = Column(String, nullable=False)
+
+# Keyset pagination of /tts/history (see db/pagination.py)
+Index("ix_tasks_user_created", Task.user_id, Task.created_at.desc(), Task.id.desc())
+# Rollup job scans finished tasks past its watermark; active tasks are the NULL range
+Index("ix_tasks_completed", Task.completed_at, Task.id)
+
+
+class TaskBatch(Base):
+    """
+    A group of TTS tasks submitted in one call.
+
+    Kinds:
+    - batch: independent lines from /tts/batch
+    - script: ordered dialogue lines from /tts/scripts, assembled into one
+      output with pauses (`pause_ms` default, `line_pauses` JSON overrides)
+
+    The submission places one credit hold for `total_cost`; each task is
+    charged on completion (ledger external_ref = "batch:{id}"). Per-item
+    state lives on `Task`.
+    """
+
+    __tablename__ = "task_batches"
+
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String, nullable=True, default="batch") # batch, script
+    item_count = Column(Integer, nullable=False)
+    total_cost = Column(Integer, nullable=False, default=0)
+    pause_ms = Column(Integer, nullable=True)
+    line_pauses = Column(String, nullable=True) # JSON list: pause after each line (null = pause_ms)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+
 
 class CreditTransaction(Base):
     """
@@ -52,18 +108,21 @@ class CreditTransaction(Base):
 
     __tablename__ = "credit_transactions"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=False, index=True)
     amount = Column(Integer, nullable=False)  # positive=credit, negative=debit
     kind = Column(String, nullable=False)  # TOPUP/TTS_CHARGE/ADJUSTMENT/REFUND
     reason = Column(String, nullable=False, default="")
-    related_task_id = Column(String, ForeignKey("tasks.id"), nullable=True, index=True)
+    related_task_id = Column(UUIDKey, ForeignKey("tasks.id"), nullable=True, index=True)
     external_ref = Column(String, nullable=True, index=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
 
     user = relationship("User", back_populates="credit_transactions")
     task = relationship("Task")
 
+# Keyset pagination of /credits/transactions (see db/pagination.py)
+Index("ix_credit_transactions_user_created", CreditTransaction.user_id, CreditTransaction.created_at.desc(), CreditTransaction.id.desc())
+
 
 class Feedback(Base):
     """
@@ -76,11 +135,191 @@ class Feedback(Base):
 
     __tablename__ = "feedback"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=False, index=True)
     message = Column(String, nullable=False)
     contact = Column(String, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
 
     user = relationship("User", back_populates="feedbacks")
 
+
+
+class LexiconEntry(Base):
+    """
+    Per-user pronunciation override applied to TTS input text.
+
+    Fields:
+    - term: text to match (brand name / polyphonic character / acronym)
+    - replacement: text sent to the model instead of `term`
+    """
+
+    __tablename__ = "lexicon_entries"
+    __table_args__ = (UniqueConstraint("user_id", "term", name="uq_lexicon_user_term"),)
+
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=False, index=True)
+    term = Column(String, nullable=False)
+    replacement = Column(String, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+    updated_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+
+    user = relationship("User", back_populates="lexicon_entries")
+
+
+class IdempotencyKey(Base):
+    """
+    Client-supplied `Idempotency-Key` for POST /tts/generate.
+
+    A replay of the same key (same user, within TTS_IDEMPOTENCY_TTL_HOURS)
+    returns the task created by the first request instead of creating and
+    charging a new one. `request_hash` rejects reuse of a key for a
+    different request body.
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),)
+
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    task_id = Column(UUIDKey, ForeignKey("tasks.id"), nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+
+
+class WebhookDelivery(Base):
+    """
+    One task-completion webhook (event + signed JSON payload) for a task's `callback_url`.
+
+    Status: PENDING (queued or waiting for a retry at `next_attempt_at`),
+    DELIVERED (2xx received) or FAILED (WEBHOOK_MAX_ATTEMPTS exhausted).
+    Every HTTP attempt is recorded in `WebhookAttempt`.
+    """
+
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    task_id = Column(UUIDKey, ForeignKey("tasks.id"), nullable=False, index=True)
+    url = Column(String, nullable=False)
+    event = Column(String, nullable=False) # task.completed, task.failed
+    payload = Column(String, nullable=False) # JSON body as sent (signature covers these bytes)
+    status = Column(String, default="PENDING", index=True) # PENDING, DELIVERED, FAILED
+    attempts = Column(Integer, default=0)
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+    delivered_at = Column(DateTime, nullable=True)
+
+
+class WebhookAttempt(Base):
+    __tablename__ = "webhook_attempts"
+
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    delivery_id = Column(UUIDKey, ForeignKey("webhook_deliveries.id"), nullable=False, index=True)
+    attempt = Column(Integer, nullable=False)
+    status_code = Column(Integer, nullable=True) # None when the request did not complete
+    error = Column(String, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+
+
+class ApiKey(Base):
+    """
+    Long-lived API key for programmatic clients (`Authorization: Bearer msk_<prefix>_<secret>`).
+
+    Only the public `prefix` (lookup) and an HMAC-SHA256 of the secret are
+    stored; the full key is shown once at creation. `scopes` is a
+    comma-separated subset of `API_KEY_SCOPES`. `usage_count` and
+    `last_used_at` are updated in periodic batches, not per request.
+    """
+
+    __tablename__ = "api_keys"
+
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    prefix = Column(String, unique=True, index=True, nullable=False)
+    secret_hash = Column(String, nullable=False)
+    scopes = Column(String, nullable=False)
+    usage_count = Column(Integer, default=0)
+    last_used_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.utcnow())
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class TaskRollupHourly(Base):
+    """
+    Finished tasks per UTC hour (of `completed_at`) and status.
+
+    Rollup tables are maintained incrementally by `core/rollups.py` from the
+    tasks finished since its watermark; dashboards read them instead of
+    aggregating `tasks`. `cost` counts only charged (COMPLETED) tasks.
+    """
+
+    __tablename__ = "task_rollup_hourly"
+
+    hour = Column(DateTime, primary_key=True)
+    status = Column(String, primary_key=True)
+    tasks = Column(Integer, nullable=False, default=0)
+    chars = Column(Integer, nullable=False, default=0)
+    cost = Column(Integer, nullable=False, default=0)
+
+
+class TaskRollupDaily(Base):
+    """Finished tasks per UTC day, status and voice (see `TaskRollupHourly`)."""
+
+    __tablename__ = "task_rollup_daily"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+    voice_path = Column(String, primary_key=True)
+    tasks = Column(Integer, nullable=False, default=0)
+    chars = Column(Integer, nullable=False, default=0)
+    cost = Column(Integer, nullable=False, default=0)
+
+
+class UserUsageDaily(Base):
+    """Per-user finished tasks per UTC day, for /credits/usage (see `TaskRollupHourly`)."""
+
+    __tablename__ = "user_usage_daily"
+
+    user_id = Column(UUIDKey, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    tasks = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    chars = Column(Integer, nullable=False, default=0)  # completed tasks only
+    cost = Column(Integer, nullable=False, default=0)  # completed (charged) tasks only
+
+
+class RollupWatermark(Base):
+    """Position of a background job (statistics rollup, task archival) in `(tasks.completed_at, tasks.id)` order."""
+
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    completed_at = Column(DateTime, nullable=True)
+    task_id = Column(UUIDKey, nullable=True)
+
+
+class ReplicaHeartbeat(Base):
+    """Last heartbeat written to the primary; read back from the read replica to measure its lag."""
+
+    __tablename__ = "replica_heartbeat"
+
+    name = Column(String, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)
+
+
+class UserCacheInvalidation(Base):
+    """
+    A user whose auth-relevant fields (admin flag, email, balance) or existence were changed
+    outside the API process (monitor, manage_db); every API process drops them from `user_cache`.
+    """
+
+    __tablename__ = "user_cache_invalidations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(UUIDKey, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)
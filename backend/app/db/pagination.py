@@ -0,0 +1,59 @@
+"""
+Keyset pagination over `(created_at, id)`, newest first.
+
+History-style listings page with an opaque cursor instead of OFFSET: the
+cursor encodes the `(created_at, id)` of the last row returned, and the next
+page is `WHERE (created_at, id) < cursor ORDER BY created_at DESC, id DESC
+LIMIT n`. Backed by a `(user_id, created_at DESC, id DESC)` index, every page
+is one index range scan of n rows, no matter how deep the client pages
+(OFFSET would scan and discard every earlier row).
+"""
+
+from __future__ import annotations
+
+import base64
+import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime.datetime, row_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.datetime.fromisoformat(created_at), row_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("invalid cursor") from e
+
+
+def keyset_page(stmt, created_col, id_col, cursor: Optional[str], limit: int):
+    """
+    Restrict `stmt` to the page after `cursor` (newest first).
+
+    Fetches `limit + 1` rows so `split_page` can tell whether a next page exists.
+    Raises `InvalidCursor` for a malformed cursor.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        bound = tuple_(created_at, row_id, types=(created_col.type, id_col.type))
+        stmt = stmt.where(tuple_(created_col, id_col) < bound)
+    return stmt.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """`(page_rows, next_cursor)`; next_cursor is None on the last page. Rows need `.created_at` and `.id`."""
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(last.created_at, last.id)
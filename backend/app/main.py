@@ -9,8 +9,18 @@ from fastapi.responses import JSONResponse
 from backend.app.core.config import settings
 # from backend.app.core.tts_wrapper import tts_engine  # IndexTTS - 兼容性问题
 from backend.app.core.tts_wrapper_voxcpm import voxcpm_engine as tts_engine  # VoxCPM - 新的TTS引擎
+from backend.app.core.voice_catalog import voice_catalog
+from backend.app.core.speaker_index import speaker_index
+from backend.app.core.webhooks import webhook_dispatcher
+from backend.app.core.api_keys import api_key_usage
+from backend.app.core.auth_invalidation import auth_invalidation_feed
+from backend.app.core.credit_settler import credit_settler
+from backend.app.core.rollups import rollup_job
+from backend.app.core.task_archive import task_archiver
+from backend.app.core.write_queue import write_queue
+from backend.app.core.read_replica import replica_monitor
 from backend.app.db.init_db import init_db
-from backend.app.routers import tts, voice, auth, credits, feedback
+from backend.app.routers import tts, voice, auth, credits, feedback, lexicon, api_keys
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -24,6 +34,42 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Failed to initialize database: {e}")
     
+    # SQLite mode: single writer task that group-commits submissions and status updates
+    await write_queue.start()
+    
+    # Read replica lag probe (read-only routes use the replica only while it keeps up)
+    await replica_monitor.start()
+    
+    # Build the voice catalog and start change detection
+    # (the speaker index follows catalog rebuilds incrementally)
+    try:
+        voice_catalog.add_listener(speaker_index.sync)
+        await voice_catalog.start()
+        print(f"Voice catalog loaded: {len(voice_catalog.snapshot.order)} voices, {len(speaker_index)} indexed")
+    except Exception as e:
+        print(f"Failed to load voice catalog: {e}")
+    
+    # Start webhook delivery (resumes deliveries left pending by a restart)
+    try:
+        await webhook_dispatcher.start()
+    except Exception as e:
+        print(f"Failed to start webhook dispatcher: {e}")
+    
+    # Periodic flush of buffered API key usage counters
+    await api_key_usage.start()
+    
+    # Apply auth cache invalidations recorded by other processes (web monitor, manage_db)
+    await auth_invalidation_feed.start()
+    
+    # Periodic settlement of credit holds (charge / release / refund finished tasks)
+    await credit_settler.start()
+    
+    # Incremental statistics rollups (first run backfills existing tasks)
+    await rollup_job.start()
+    
+    # Move old finished tasks to compressed cold storage (narrow rows stay in the DB)
+    await task_archiver.start()
+    
     # Initialize TTS Engine
     try:
         print("Attempting to initialize TTS Engine...")
@@ -41,6 +87,21 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("Shutting down...")
+    await voice_catalog.stop()
+    await webhook_dispatcher.stop()
+    await rollup_job.stop()
+    await task_archiver.stop()
+    await replica_monitor.stop()
+    await auth_invalidation_feed.stop()
+    try:
+        await api_key_usage.stop()  # final flush
+    except Exception as e:
+        print(f"Failed to flush API key usage: {e}")
+    try:
+        await credit_settler.stop()  # final settlement
+    except Exception as e:
+        print(f"Failed to settle credit holds: {e}")
+    await write_queue.stop()  # writes already queued are committed
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -65,13 +126,17 @@ app.add_middleware(
 app.mount("/static/generated", StaticFiles(directory=settings.GENERATED_AUDIO_DIR), name="generated")
 # 2. Voice Assets (for previews)
 app.mount("/static/voices", StaticFiles(directory=settings.VOICE_ASSETS_DIR), name="voices")
+# 3. Ingested voice artifacts (normalized prompts + previews)
+app.mount("/static/voice_artifacts", StaticFiles(directory=settings.VOICE_ARTIFACTS_DIR), name="voice_artifacts")
 
 # Routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
+app.include_router(api_keys.router, prefix="/auth/api-keys", tags=["auth"])
 app.include_router(credits.router, prefix="/credits", tags=["credits"])
 app.include_router(tts.router, prefix="/tts", tags=["tts"])
 app.include_router(voice.router, prefix="/voices", tags=["voices"])
 app.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
+app.include_router(lexicon.router, prefix="/lexicon", tags=["lexicon"])
 
 # Monitor router - try to load, skip if dependencies missing
 try:
@@ -0,0 +1,119 @@
+"""
+API key management (login session required; API keys cannot manage keys).
+
+This router provides:
+- POST   /auth/api-keys: create a key (the full key is returned once)
+- GET    /auth/api-keys: list current user's keys (prefix, scopes, usage)
+- DELETE /auth/api-keys/{key_id}: revoke a key
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.api_keys import (
+    KEY_MARKER, api_key_index, api_key_usage, generate_api_key, hash_secret, normalize_scopes
+)
+from backend.app.core.config import settings
+from backend.app.core.deps import get_current_session_user
+from backend.app.core.user_cache import AuthUser
+from backend.app.db.database import get_db
+from backend.app.db.models import ApiKey
+from backend.app.db.crud_api_key import count_active_api_keys, create_api_key, list_api_keys, revoke_api_key
+
+
+router = APIRouter()
+
+
+class ApiKeyCreateRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    scopes: List[str] = Field(default_factory=lambda: ["tts"], min_length=1)
+
+    @field_validator("scopes")
+    @classmethod
+    def _known_scopes(cls, v: List[str]) -> List[str]:
+        return normalize_scopes(v)
+
+
+class ApiKeyResponse(BaseModel):
+    id: str
+    name: str
+    key_prefix: str
+    scopes: List[str]
+    usage_count: int
+    last_used_at: Optional[str] = None
+    created_at: str
+    revoked_at: Optional[str] = None
+
+
+class ApiKeyCreateResponse(ApiKeyResponse):
+    key: str
+
+
+def _to_response(key: ApiKey) -> ApiKeyResponse:
+    # Usage not yet flushed is added so the count is current for this process.
+    return ApiKeyResponse(
+        id=key.id,
+        name=key.name,
+        key_prefix=f"{KEY_MARKER}{key.prefix}",
+        scopes=[s for s in key.scopes.split(",") if s],
+        usage_count=(key.usage_count or 0) + api_key_usage.pending(key.id),
+        last_used_at=key.last_used_at.isoformat() if key.last_used_at else None,
+        created_at=key.created_at.isoformat() if key.created_at else "",
+        revoked_at=key.revoked_at.isoformat() if key.revoked_at else None,
+    )
+
+
+@router.post("", response_model=ApiKeyCreateResponse)
+@router.post("/", response_model=ApiKeyCreateResponse)
+async def create_key(
+    req: ApiKeyCreateRequest,
+    current_user: AuthUser = Depends(get_current_session_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create an API key. Store the returned `key` now: only its prefix is kept.
+
+    Scopes: tts, lexicon, credits (balance/ledger read), feedback.
+    """
+    if await count_active_api_keys(db, current_user.id) >= settings.API_KEY_MAX_PER_USER:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.API_KEY_MAX_PER_USER} active API keys per user",
+        )
+    full_key, prefix, secret = generate_api_key()
+    key = await create_api_key(db, current_user.id, req.name, prefix, hash_secret(secret), req.scopes)
+    return ApiKeyCreateResponse(**_to_response(key).model_dump(), key=full_key)
+
+
+@router.get("", response_model=List[ApiKeyResponse])
+@router.get("/", response_model=List[ApiKeyResponse])
+async def list_keys(
+    current_user: AuthUser = Depends(get_current_session_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List current user's API keys, newest first (revoked keys included).
+    """
+    return [_to_response(key) for key in await list_api_keys(db, current_user.id)]
+
+
+@router.delete("/{key_id}", response_model=ApiKeyResponse)
+async def revoke_key(
+    key_id: str,
+    current_user: AuthUser = Depends(get_current_session_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Revoke an API key. Takes effect immediately in this process and within
+    API_KEY_INDEX_TTL_SECONDS in others.
+    """
+    key = await revoke_api_key(db, key_id, current_user.id)
+    if key is None:
+        raise HTTPException(status_code=404, detail="API key not found")
+    api_key_index.invalidate(key.prefix)
+    return _to_response(key)
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.app.core.security import get_password_hash, verify_password, create_access_token
-from backend.app.core.deps import get_current_active_user
+from backend.app.core.security import create_access_token, password_hasher, PasswordHasherBusy
+from backend.app.core.deps import get_current_user_fresh
+from backend.app.core.rate_limit import limit_auth_ip, limit_login_account
 from backend.app.db.database import get_db
 from backend.app.db.crud_user import create_user, get_user_by_email
 from backend.app.db.models import User, CreditTransaction
@@ -12,10 +13,20 @@ from datetime import timedelta
 
 router = APIRouter()
 
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserResponse)
 async def register(
     request: RegisterRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(limit_auth_ip)
 ):
     """
     Register a new user with email and password.
@@ -28,8 +39,11 @@ async def register(
             detail="Email already registered"
         )
     
-    # Create user
-    hashed_password = get_password_hash(request.password)
+    # Create user (bcrypt runs on the dedicated hashing pool, not the event loop)
+    try:
+        hashed_password = await password_hasher.hash(request.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     user = await create_user(
         db,
         email=request.email,
@@ -53,12 +67,15 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(limit_auth_ip)
 ):
     """
     Login with email and password. Returns JWT access token.
     Username field should contain the email.
+    Rate limited per client IP and per account (429 + Retry-After).
     """
+    await limit_login_account(form_data.username)
     user = await get_user_by_email(db, form_data.username)
     if not user:
         raise HTTPException(
@@ -74,13 +91,22 @@ async def login(
             detail=f"This account uses {user.provider} login. Please use OAuth."
         )
     
-    # Verify password
-    if not user.hashed_password or not verify_password(form_data.password, user.hashed_password):
+    # Verify password (off the event loop); upgrade the hash if BCRYPT_ROUNDS changed
+    valid, new_hash = False, None
+    if user.hashed_password:
+        try:
+            valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -93,7 +119,7 @@ async def login(
 
 @router.get("/me", response_model=UserResponse)
 async def get_me(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_user_fresh)
 ):
     """
     Get current user information.
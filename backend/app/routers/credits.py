@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, Security, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from sqlalchemy import select
 
-from backend.app.core.deps import get_current_active_user, get_current_admin_user
+from backend.app.core.deps import get_current_active_user, get_current_admin_user, get_current_user_fresh, get_read_db
+from backend.app.core.read_replica import replica_monitor
+from backend.app.core.user_cache import AuthUser, user_cache
 from backend.app.db.database import get_db
 from backend.app.db.crud_user import get_user_by_id
-from backend.app.db.crud_credits import apply_credit_transaction
-from backend.app.db.models import User, CreditTransaction
+from backend.app.db.crud_credits import apply_credit_transaction, list_credit_transactions
+from backend.app.db.crud_rollup import get_user_daily_usage
+from backend.app.db.pagination import InvalidCursor
+from backend.app.db.models import User
 
 router = APIRouter()
 
 class BalanceResponse(BaseModel):
     balance: int
+    held: int = 0  # reserved by queued tasks, charged or released when they finish
+    available: int
     user_id: str
 
 class AddCreditsRequest(BaseModel):
@@ -21,6 +26,13 @@ class AddCreditsRequest(BaseModel):
     amount: int = Field(..., gt=0, le=100000)
     reason: str = Field(..., min_length=1, max_length=500)
 
+class DailyUsageResponse(BaseModel):
+    day: str
+    tasks: int
+    failed: int
+    chars: int
+    cost: int
+
 class CreditTransactionResponse(BaseModel):
     id: str
     amount: int
@@ -32,20 +44,25 @@ class CreditTransactionResponse(BaseModel):
 
 @router.get("/balance", response_model=BalanceResponse)
 async def get_balance(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Security(get_current_user_fresh, scopes=["credits"])
 ):
     """
-    Get current user's credit balance.
+    Get current user's credit balance (always read from the DB, never the auth cache).
+
+    `available` (balance minus credits held by queued tasks) is what new submissions can spend.
     """
+    held = current_user.credits_held or 0
     return {
         "balance": current_user.credits_balance,
+        "held": held,
+        "available": current_user.credits_balance - held,
         "user_id": current_user.id
     }
 
 @router.post("/add")
 async def add_credits(
     request: AddCreditsRequest,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: AuthUser = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -72,6 +89,10 @@ async def add_credits(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     _, new_balance = result
     await db.commit()
+    # Again after commit: a request that loaded the user between the UPDATE and
+    # the commit may have cached the old balance.
+    user_cache.invalidate(request.user_id)
+    replica_monitor.note_write(request.user_id)
     
     return {
         "message": f"Added {request.amount} credits to user {request.user_id}",
@@ -82,29 +103,30 @@ async def add_credits(
 
 @router.get("/transactions", response_model=List[CreditTransactionResponse])
 async def list_transactions(
+    response: Response,
     limit: int = 50,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["credits"]),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    List current user's credit transactions (ledger entries).
+    List current user's credit transactions (ledger entries), newest first.
 
     Parameters:
     - limit: max number of records to return (default 50)
+    - cursor: `X-Next-Cursor` header of the previous page (absent on the last page)
     """
     if limit <= 0:
         raise HTTPException(status_code=400, detail="limit must be positive")
     if limit > 200:
         raise HTTPException(status_code=400, detail="limit too large")
 
-    rows = (
-        await db.execute(
-            select(CreditTransaction)
-            .where(CreditTransaction.user_id == current_user.id)
-            .order_by(CreditTransaction.created_at.desc())
-            .limit(limit)
-        )
-    ).scalars().all()
+    try:
+        rows, next_cursor = await list_credit_transactions(db, current_user.id, limit=limit, cursor=cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     return [
         CreditTransactionResponse(
@@ -119,3 +141,21 @@ async def list_transactions(
         for tx in rows
     ]
 
+
+@router.get("/usage", response_model=List[DailyUsageResponse])
+async def get_usage(
+    days: int = 30,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["credits"]),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Daily usage of current user for the last `days` UTC days (oldest first, days without tasks included).
+
+    Counts finished tasks (chars / cost: completed tasks only), read from the
+    usage rollup; the latest tasks appear within ROLLUP_INTERVAL_SECONDS.
+    """
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="days must be positive")
+    if days > 366:
+        raise HTTPException(status_code=400, detail="days too large")
+    return await get_user_daily_usage(db, current_user.id, days)
@@ -10,14 +10,15 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Security
 from pydantic import BaseModel, Field
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.core.deps import get_current_active_user, get_current_admin_user
+from backend.app.core.user_cache import AuthUser
 from backend.app.db.database import get_db
-from backend.app.db.models import Feedback, User
+from backend.app.db.models import Feedback
 
 
 router = APIRouter()
@@ -40,7 +41,7 @@ class FeedbackResponse(BaseModel):
 @router.post("/", response_model=FeedbackResponse)
 async def create_feedback(
     req: FeedbackCreateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: AuthUser = Security(get_current_active_user, scopes=["feedback"]),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -67,7 +68,7 @@ async def create_feedback(
 @router.get("/", response_model=List[FeedbackResponse])
 async def list_feedback(
     limit: int = 100,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: AuthUser = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -0,0 +1,144 @@
+"""
+Pronunciation lexicon endpoints.
+
+This router provides:
+- GET    /lexicon: list current user's entries
+- POST   /lexicon: create (or update by term) an entry
+- PUT    /lexicon/{entry_id}: update an entry
+- DELETE /lexicon/{entry_id}: delete an entry
+- POST   /lexicon/preview: show how text is rewritten before synthesis
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Security
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.deps import get_current_active_user
+from backend.app.core.user_cache import AuthUser
+from backend.app.db.database import get_db
+from backend.app.db.crud_lexicon import (
+    delete_lexicon_entry,
+    get_lexicon_entry,
+    get_lexicon_entry_by_term,
+    get_user_lexicon,
+    list_lexicon_entries,
+    update_lexicon_entry,
+    upsert_lexicon_entry,
+)
+
+
+router = APIRouter()
+
+
+class LexiconEntryRequest(BaseModel):
+    term: str = Field(..., min_length=1, max_length=200)
+    replacement: str = Field(..., max_length=500)
+
+
+class LexiconEntryResponse(BaseModel):
+    id: str
+    term: str
+    replacement: str
+    created_at: str
+    updated_at: str
+
+
+class LexiconPreviewRequest(BaseModel):
+    text: str = Field(..., min_length=1, max_length=1000)
+
+
+class LexiconPreviewResponse(BaseModel):
+    text: str
+
+
+def _to_response(entry) -> LexiconEntryResponse:
+    return LexiconEntryResponse(
+        id=entry.id,
+        term=entry.term,
+        replacement=entry.replacement,
+        created_at=entry.created_at.isoformat() if entry.created_at else "",
+        updated_at=entry.updated_at.isoformat() if entry.updated_at else "",
+    )
+
+
+@router.get("", response_model=List[LexiconEntryResponse])
+@router.get("/", response_model=List[LexiconEntryResponse])
+async def list_entries(
+    current_user: AuthUser = Security(get_current_active_user, scopes=["lexicon"]),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List current user's pronunciation entries (ordered by term).
+    """
+    rows = await list_lexicon_entries(db, current_user.id)
+    return [_to_response(entry) for entry in rows]
+
+
+@router.post("", response_model=LexiconEntryResponse)
+@router.post("/", response_model=LexiconEntryResponse)
+async def create_entry(
+    req: LexiconEntryRequest,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["lexicon"]),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create an entry. An existing entry with the same term is updated in place.
+    """
+    # Make sure the compiled lexicon exists before mutating it incrementally
+    await get_user_lexicon(db, current_user.id)
+    entry = await upsert_lexicon_entry(db, current_user.id, req.term, req.replacement)
+    return _to_response(entry)
+
+
+@router.put("/{entry_id}", response_model=LexiconEntryResponse)
+async def update_entry(
+    entry_id: str,
+    req: LexiconEntryRequest,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["lexicon"]),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Update an entry's term and replacement.
+    """
+    entry = await get_lexicon_entry(db, current_user.id, entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Lexicon entry not found")
+    if req.term != entry.term and await get_lexicon_entry_by_term(db, current_user.id, req.term):
+        raise HTTPException(status_code=400, detail="Term already exists")
+    await get_user_lexicon(db, current_user.id)
+    entry = await update_lexicon_entry(db, entry, req.term, req.replacement)
+    return _to_response(entry)
+
+
+@router.delete("/{entry_id}")
+async def delete_entry(
+    entry_id: str,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["lexicon"]),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Delete an entry.
+    """
+    entry = await get_lexicon_entry(db, current_user.id, entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Lexicon entry not found")
+    await get_user_lexicon(db, current_user.id)
+    await delete_lexicon_entry(db, entry)
+    return {"message": "Lexicon entry deleted", "id": entry_id}
+
+
+@router.post("/preview", response_model=LexiconPreviewResponse)
+async def preview(
+    req: LexiconPreviewRequest,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["lexicon"]),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Return the text exactly as it would be sent to the TTS model.
+    """
+    lexicon = await get_user_lexicon(db, current_user.id)
+    return LexiconPreviewResponse(text=lexicon.apply(req.text))
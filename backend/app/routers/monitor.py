@@ -9,14 +9,15 @@ from typing import List, Dict, Any
 import psutil
 import os
 import subprocess
-from datetime import datetime, timedelta
+from datetime import datetime
 import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, select, text
 
 from backend.app.core.config import settings
-from backend.app.db.database import get_db, engine, AsyncSessionLocal
-from backend.app.db.models import User, Task
+from backend.app.core.deps import get_read_db
+from backend.app.db.database import engine, AsyncSessionLocal
+from backend.app.db.models import User, Task, TaskPayload
 
 router = APIRouter()
 
@@ -168,7 +169,7 @@ async def get_frontend_logs(lines: int = 100):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/stats/database")
-async def get_database_stats(db: AsyncSession = Depends(get_db)):
+async def get_database_stats(db: AsyncSession = Depends(get_read_db)):
     """
     获取数据库统计（v0.1 统一通过 ORM/AsyncSession）。
     
@@ -178,40 +179,9 @@ async def get_database_stats(db: AsyncSession = Depends(get_db)):
     total_users = (await db.execute(select(func.count(User.id)))).scalar_one()
     total_credits = (await db.execute(select(func.coalesce(func.sum(User.credits_balance), 0)))).scalar_one()
 
-    # 今日任务数（按数据库当前日期）
-    today_tasks = (
-        await db.execute(
-            select(func.count(Task.id)).where(func.date(Task.created_at) == func.current_date())
-        )
-    ).scalar_one()
-
-    # 任务统计（状态分布）
-    task_stats_rows = (
-        await db.execute(
-            select(Task.status, func.count(Task.id)).group_by(Task.status)
-        )
-    ).all()
-    task_stats = {status: count for status, count in task_stats_rows}
-
-    # 24h 窗口统计（用 UTC 时间戳阈值）
-    cutoff = datetime.utcnow() - timedelta(hours=24)
-    tasks_24h = (
-        await db.execute(
-            select(func.count(Task.id)).where(Task.created_at >= cutoff)
-        )
-    ).scalar_one()
-    total_chars_24h = (
-        await db.execute(
-            select(func.coalesce(func.sum(func.length(Task.text)), 0))
-            .where(Task.created_at >= cutoff)
-            .where(Task.status == "COMPLETED")
-        )
-    ).scalar_one()
-    total_cost_24h = (
-        await db.execute(
-            select(func.coalesce(func.sum(Task.cost), 0)).where(Task.created_at >= cutoff)
-        )
-    ).scalar_one()
+    # 任务统计（状态分布、今日 / 24h 窗口）：读 rollup 表，不扫描 tasks
+    from backend.app.db.crud_rollup import get_task_stats
+    task_summary = await get_task_stats(db)
 
     # 最近任务
     recent_rows = (
@@ -221,9 +191,10 @@ async def get_database_stats(db: AsyncSession = Depends(get_db)):
                 Task.status,
                 Task.created_at,
                 Task.error_message,
-                Task.text,
+                TaskPayload.text,
                 Task.cost,
             )
+            .outerjoin(TaskPayload, TaskPayload.task_id == Task.id)
             .order_by(Task.created_at.desc())
             .limit(10)
         )
@@ -244,21 +215,104 @@ async def get_database_stats(db: AsyncSession = Depends(get_db)):
     database_size_mb = 0.0
     if settings.DATABASE_URL.startswith("sqlite"):
         db_path = settings.DATABASE_URL.split("///", 1)[-1]
-        if os.path.exists(db_path):
-            database_size_mb = os.path.getsize(db_path) / (1024**2)
+        for path in (db_path, db_path + "-wal"):  # WAL 模式下未检查点的页在 -wal 文件中
+            if os.path.exists(path):
+                database_size_mb += os.path.getsize(path) / (1024**2)
     
     return {
         'total_users': total_users,
         'total_credits': total_credits,
-        'task_stats': task_stats,
-        'today_tasks': today_tasks,
-        'tasks_24h': tasks_24h,
-        'total_chars_24h': total_chars_24h,
-        'total_cost_24h': total_cost_24h,
+        'task_stats': task_summary['task_stats'],
+        'today_tasks': task_summary['today_tasks'],
+        'tasks_24h': task_summary['tasks_24h'],
+        'total_chars_24h': task_summary['total_chars_24h'],
+        'total_cost_24h': task_summary['total_cost_24h'],
         'recent_tasks': recent_tasks,
         'database_size_mb': database_size_mb
     }
 
+@router.get("/stats/scheduler")
+async def get_scheduler_stats():
+    """TTS 调度统计：各优先级排队数、服务时间估计、截止时间达成 / 错过 / 拒绝计数"""
+    from backend.app.core.tts_wrapper_voxcpm import voxcpm_engine
+    return voxcpm_engine.scheduler_stats()
+
+@router.get("/stats/password_hashing")
+async def get_password_hashing_stats():
+    """bcrypt 线程池统计：排队 / 执行中、等待与执行耗时、拒绝次数"""
+    from backend.app.core.security import password_hasher
+    return password_hasher.stats()
+
+@router.get("/stats/auth_cache")
+async def get_auth_cache_stats():
+    """认证用户缓存统计：命中率、过期、失效与淘汰次数，以及跨进程失效同步"""
+    from backend.app.core.auth_invalidation import auth_invalidation_feed
+    from backend.app.core.user_cache import user_cache
+    return {**user_cache.stats(), "sync": auth_invalidation_feed.stats()}
+
+@router.get("/stats/api_keys")
+async def get_api_key_stats():
+    """API Key 统计：前缀索引命中率、待写入的用量计数"""
+    from backend.app.core.api_keys import api_key_index, api_key_usage
+    return {"index": api_key_index.stats(), "usage": api_key_usage.stats()}
+
+@router.get("/stats/rollups")
+async def get_rollup_stats():
+    """统计 rollup 任务：运行次数、已汇总任务数"""
+    from backend.app.core.rollups import rollup_job
+    return rollup_job.stats()
+
+@router.get("/stats/task_archive")
+async def get_task_archive_stats():
+    """任务归档：归档目录、保留天数、累计归档任务数"""
+    from backend.app.core.task_archive import task_archiver
+    return task_archiver.stats()
+
+@router.get("/stats/credit_holds")
+async def get_credit_hold_stats(db: AsyncSession = Depends(get_read_db)):
+    """额度预扣统计：未结算的预扣额度、待结算任务数、结算器累计结果"""
+    from backend.app.core.credit_settler import credit_settler
+    total_held = (await db.execute(select(func.coalesce(func.sum(User.credits_held), 0)))).scalar_one()
+    rows = (
+        await db.execute(
+            select(Task.hold_status, func.count(Task.id))
+            .where(Task.hold_status.in_(("HELD", "REFUND")))
+            .group_by(Task.hold_status)
+        )
+    ).all()
+    pending = {status: count for status, count in rows}
+    return {
+        "credits_held": int(total_held),
+        "held_tasks": pending.get("HELD", 0),
+        "refunds_due": pending.get("REFUND", 0),
+        "settler": credit_settler.stats(),
+    }
+
+@router.get("/stats/sqlite")
+async def get_sqlite_stats():
+    """SQLite 模式统计：连接 pragma、读连接池大小、写队列合并提交计数"""
+    from backend.app.core.write_queue import write_queue
+    from backend.app.db.database import IS_SQLITE, read_engine
+    if not IS_SQLITE:
+        return {"sqlite_mode": False}
+    async with read_engine.connect() as conn:
+        pragmas = {
+            name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "query_only")
+        }
+    return {
+        "sqlite_mode": True,
+        "read_pragmas": pragmas,
+        "read_pool_size": settings.SQLITE_READ_POOL_SIZE,
+        "write_queue": write_queue.stats(),
+    }
+
+@router.get("/stats/read_replica")
+async def get_read_replica_stats():
+    """只读副本统计：复制延迟、健康状态、副本 / 主库读取次数与回退次数"""
+    from backend.app.core.read_replica import replica_monitor
+    return replica_monitor.stats()
+
 @router.get("/health/detailed")
 async def detailed_health_check():
     """详细健康检查"""
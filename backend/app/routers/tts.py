@@ -1,22 +1,61 @@
 import os
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, Field
-from typing import Optional
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+import time
+import datetime
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, Security, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Literal
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.app.core.tts_wrapper_voxcpm import voxcpm_engine as tts_engine
 from backend.app.core.config import settings
-from backend.app.core.deps import get_current_active_user
-from backend.app.db.database import get_db
-from backend.app.db.models import User
-from backend.app.db.crud_task import create_task, get_task, get_user_tasks
-from backend.app.db.crud_credits import apply_credit_transaction
-from backend.app.schemas.task import TaskStatusResponse
+from backend.app.core.deps import get_current_active_user, get_read_db, get_user_from_token
+from backend.app.core.read_replica import fall_back_to_primary, replica_monitor
+from backend.app.core.user_cache import AuthUser
+from backend.app.core.voice_catalog import voice_catalog
+from backend.app.db.database import get_db, AsyncSessionLocal
+from backend.app.core.audio_utils import concat_wavs, encode_audio, generated_path, zip_files
+from backend.app.core.text_segmenter import SentenceSegmenter
+from backend.app.core.idempotency import MAX_KEY_LENGTH, idempotency_locks, request_fingerprint
+from backend.app.core.rate_limit import enforce_tts_limits, inflight_tracker, limit_tts_submission
+from backend.app.core.write_queue import write_queue
+from backend.app.core.webhooks import UnsafeCallbackURL, check_callback_url, resolve_callback_url
+from backend.app.db.crud_task import (
+    get_task, get_task_statuses, list_task_history, get_batch, get_batch_tasks, replace_batch_line,
+    get_idempotency_key, delete_idempotency_key
+)
+from backend.app.db.crud_credits import apply_credit_transaction, hold_and_create_batch, hold_and_create_task, place_credit_hold
+from backend.app.db.ids import new_id
+from backend.app.db.pagination import InvalidCursor
+from backend.app.db.crud_lexicon import get_user_lexicon
+from backend.app.core.task_status import task_status_registry, TERMINAL_STATUSES
+from backend.app.schemas.task import TaskStatusResponse, TaskStatusListResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 class GenerateRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=1000)
     voice_id: str
+    # Optional webhook: a signed POST is sent here when the task completes or fails
+    callback_url: Optional[str] = Field(default=None, max_length=2048)
+    # Scheduling: class default deadline, or an explicit deadline relative to submission
+    priority: Literal["realtime", "standard", "bulk"] = "standard"
+    deadline_ms: Optional[int] = Field(default=None, ge=1, le=86_400_000)
+
+    @field_validator("callback_url")
+    @classmethod
+    def _check_callback_url(cls, v: Optional[str]) -> Optional[str]:
+        # Literal addresses only; the host is resolved and checked on submit and before each delivery
+        if v is not None:
+            check_callback_url(v)
+        return v
 
 class TaskResponse(BaseModel):
     task_id: str
@@ -25,6 +64,63 @@ class TaskResponse(BaseModel):
     output_url: Optional[str] = None
 
 
+class BatchRequest(BaseModel):
+    items: List[GenerateRequest] = Field(..., min_length=1, max_length=500)
+    # Scheduling for the whole batch (per-item priority/deadline_ms are not accepted)
+    priority: Literal["realtime", "standard", "bulk"] = "standard"
+    deadline_ms: Optional[int] = Field(default=None, ge=1, le=86_400_000)
+
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    status: str
+    item_count: int
+    total_cost: int
+    task_ids: List[str]
+
+
+class BatchItemStatus(BaseModel):
+    index: int
+    task_id: str
+    status: str
+    output_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: str  # queued / processing / completed / partial / failed
+    item_count: int
+    total_cost: int
+    counts: Dict[str, int]
+    items: List[BatchItemStatus]
+    output_url: Optional[str] = None
+
+
+class ScriptLine(BaseModel):
+    voice_id: str
+    text: str = Field(..., min_length=1, max_length=1000)
+    pause_after_ms: Optional[int] = Field(default=None, ge=0, le=10000)
+
+
+class ScriptRequest(BaseModel):
+    lines: List[ScriptLine] = Field(..., min_length=1, max_length=500)
+    pause_ms: int = Field(default=300, ge=0, le=10000)
+
+
+class ScriptLineUpdate(BaseModel):
+    text: str = Field(..., min_length=1, max_length=1000)
+    voice_id: Optional[str] = None
+
+
+class ScriptResponse(BaseModel):
+    script_id: str
+    status: str
+    line_count: int
+    total_cost: int
+    task_ids: List[str]
+
+
 class TaskHistoryItem(BaseModel):
     task_id: str
     status: str
@@ -36,73 +132,796 @@ class TaskHistoryItem(BaseModel):
     created_at: str
     completed_at: Optional[str] = None
 
-@router.post("/generate", response_model=TaskResponse)
-async def generate_audio(
-    req: GenerateRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
-):
+def _task_cost(text: str) -> int:
+    cost = len(text) * settings.TTS_COST_PER_CHAR
+    if cost < settings.MIN_CREDITS_REQUIRED:
+        cost = settings.MIN_CREDITS_REQUIRED
+    return cost
+
+
+def _reserve_inflight(user_id: str, n: int) -> None:
+    if not inflight_tracker.reserve(user_id, n):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many tasks in flight (max {inflight_tracker.max_per_user})"
+        )
+
+
+async def _write_reserved(db: AsyncSession, user_id: str, n: int, unit):
     """
-    Submit a TTS generation task.
-    Requires authentication. Deducts credits based on text length.
+    Reserve in-flight slots for `n` tasks and run the submission `unit` through the
+    write queue (group commit in SQLite mode). Slots are released when the unit fails
+    or returns None (nothing held).
     """
-    # Validate voice path
-    full_voice_path = os.path.join(settings.VOICE_ASSETS_DIR, req.voice_id)
-    if not os.path.exists(full_voice_path):
+    _reserve_inflight(user_id, n)
+    try:
+        result = await write_queue.run(db, unit)
+    except BaseException:
+        inflight_tracker.release(user_id, n)
+        raise
+    if result is None:
+        inflight_tracker.release(user_id, n)
+    else:
+        replica_monitor.note_write(user_id)
+    return result
+
+
+async def _check_callback_hosts(urls: List[Optional[str]]) -> None:
+    """Reject callback_urls whose host resolves to a non-public address (or does not resolve), before charging."""
+    for url in dict.fromkeys(u for u in urls if u):
+        try:
+            await resolve_callback_url(url)
+        except UnsafeCallbackURL as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except OSError:
+            raise HTTPException(status_code=422, detail="callback_url host does not resolve")
+
+
+def _check_deadline(chars: int, priority: str, deadline_ms: Optional[int]) -> None:
+    """Reject an explicit deadline the queue cannot meet (service-time estimate), before charging."""
+    if deadline_ms is None or tts_engine.queue is None:
+        return
+    estimate_ms = tts_engine.estimate_finish_ms(chars, priority, deadline_ms)
+    if estimate_ms > deadline_ms:
+        tts_engine.scheduler.record_rejected(priority)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Deadline cannot be met (estimated {estimate_ms} ms > deadline_ms {deadline_ms})"
+        )
+
+
+async def _replay_idempotent(db: AsyncSession, user_id: str, key: str, request_hash: str) -> Optional[TaskResponse]:
+    """Return the original response for a replayed key; None when the key is new or expired."""
+    record = await get_idempotency_key(db, user_id, key)
+    if record is None:
+        return None
+    ttl = datetime.timedelta(hours=settings.TTS_IDEMPOTENCY_TTL_HOURS)
+    task = await get_task(db, record.task_id) if record.task_id else None
+    if task is None or record.created_at < datetime.datetime.utcnow() - ttl:
+        # Expired (or its task is gone): the key may be reused; removal commits with the new submission
+        await delete_idempotency_key(db, record.id)
+        return None
+    if record.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return TaskResponse(
+        task_id=task.id,
+        status="queued" if task.status == "PENDING" else task.status.lower(),
+        cost=task.cost,
+        output_url=task.output_url,
+    )
+
+
+async def _submit_generate(
+    req: GenerateRequest,
+    current_user: AuthUser,
+    db: AsyncSession,
+    idempotency: Optional[tuple] = None
+) -> TaskResponse:
+    if tts_engine.queue is None:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+
+    # Validate voice against the in-memory catalog (no filesystem access)
+    voice = voice_catalog.get(req.voice_id)
+    if voice is None:
         raise HTTPException(status_code=404, detail="Voice file not found")
+    full_voice_path = voice["path"]
 
     # Calculate cost
-    cost = len(req.text) * settings.TTS_COST_PER_CHAR
-    if cost < settings.MIN_CREDITS_REQUIRED:
-        cost = settings.MIN_CREDITS_REQUIRED
+    cost = _task_cost(req.text)
+
+    # Apply the user's pronunciation lexicon (single pass; billed on the original text)
+    lexicon = await get_user_lexicon(db, current_user.id)
+    synth_text = lexicon.apply(req.text)
+    _check_deadline(len(synth_text), req.priority, req.deadline_ms)
+    await _check_callback_hosts([req.callback_url])
     
-    # Create task (no commit yet; commit together with credit ledger update)
-    task = await create_task(
-        db,
+    # Credit hold, task row (and idempotency key) in one round trip, committed through
+    # the write queue (group commit in SQLite mode). The charge is settled when the task
+    # finishes (failed tasks are not charged).
+    # A concurrent duplicate Idempotency-Key fails here with IntegrityError.
+    result = await _write_reserved(db, current_user.id, 1, lambda session: hold_and_create_task(
+        session,
         user_id=current_user.id,
         text=req.text,
         voice_path=full_voice_path,
         cost=cost,
-        commit=False
-    )
-    
-    print(f"🎵 [TTS Router] Task created in DB: {task.id}")
-    
-    # Deduct credits and write ledger entry (no commit yet)
-    charge_reason = f"TTS charge: {len(req.text)} chars"
-    result = await apply_credit_transaction(
-        db=db,
-        user_id=current_user.id,
-        amount=-cost,
-        kind="TTS_CHARGE",
-        reason=charge_reason,
-        related_task_id=task.id,
-    )
+        callback_url=req.callback_url,
+        idempotency=idempotency,
+    ))
     if result is None:
         raise HTTPException(
             status_code=402,
             detail=f"Insufficient credits. Required: {cost}"
         )
+    task_id, _ = result
 
-    await db.commit()
+    print(f"🎵 [TTS Router] Task created in DB: {task_id}")
 
     # v0.1: 入队后立即返回 task_id，推理由后台 worker 处理
+    await tts_engine.submit_task(task_id, synth_text, full_voice_path, req.priority, req.deadline_ms)
+    inflight_tracker.attach(current_user.id, [task_id])
+    return TaskResponse(task_id=task_id, status="queued", cost=cost)
+
+
+@router.post("/generate", response_model=TaskResponse)
+async def generate_audio(
+    req: GenerateRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    _: None = Depends(limit_tts_submission),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Submit a TTS generation task.
+    Requires authentication. Deducts credits based on text length.
+
+    With an `Idempotency-Key` header, a retry carrying the same key (within
+    TTS_IDEMPOTENCY_TTL_HOURS) returns the original task with
+    `Idempotent-Replayed: true` instead of queueing and charging again.
+    Reusing a key for a different request is rejected with 422.
+    """
+    if idempotency_key is None:
+        return await _submit_generate(req, current_user, db)
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    user_id = current_user.id
+    request_hash = request_fingerprint(req.model_dump())
+    # Duplicates racing in this process wait for the first one, then replay it
+    async with idempotency_locks.hold((user_id, idempotency_key)):
+        replay = await _replay_idempotent(db, user_id, idempotency_key, request_hash)
+        if replay is None:
+            try:
+                return await _submit_generate(req, current_user, db, (idempotency_key, request_hash))
+            except IntegrityError:
+                # Another process committed the same key first
+                await db.rollback()
+                replay = await _replay_idempotent(db, user_id, idempotency_key, request_hash)
+                if replay is None:
+                    raise HTTPException(status_code=409, detail="Idempotency-Key conflict, retry the request")
+        response.headers["Idempotent-Replayed"] = "true"
+        return replay
+
+def _batch_status(counts: Dict[str, int], item_count: int) -> str:
+    done = counts.get("COMPLETED", 0) + counts.get("FAILED", 0)
+    if done < item_count:
+        return "processing" if done or counts.get("PROCESSING") else "queued"
+    if counts.get("FAILED", 0) == 0:
+        return "completed"
+    return "failed" if counts.get("COMPLETED", 0) == 0 else "partial"
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def generate_batch(
+    req: BatchRequest,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    _: None = Depends(limit_tts_submission),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Submit many TTS lines in one call.
+
+    The total cost is held and the batch, task and payload rows are inserted
+    in one statement chained off the hold (`hold_and_create_batch`), and every
+    task is enqueued at once. Each task is charged when it completes; failed tasks are not charged. Returns a batch id for /tts/batch/{batch_id}.
+
+    `priority` / `deadline_ms` apply to the whole batch (one shared deadline).
+    """
     if tts_engine.queue is None:
         raise HTTPException(status_code=503, detail="TTS engine not initialized")
-    await tts_engine.submit_task(task.id, req.text, full_voice_path)
-    return TaskResponse(task_id=task.id, status="queued", cost=cost)
+
+    lexicon = await get_user_lexicon(db, current_user.id)
+    items = []
+    for idx, item in enumerate(req.items):
+        if item.priority != "standard" or item.deadline_ms is not None:
+            raise HTTPException(status_code=400, detail=f"Set priority/deadline_ms on the batch, not on items (item {idx})")
+        voice = voice_catalog.get(item.voice_id)
+        if voice is None:
+            raise HTTPException(status_code=404, detail=f"Voice file not found (item {idx})")
+        items.append({
+            "id": new_id(),
+            "text": item.text,
+            "synth_text": lexicon.apply(item.text),
+            "voice_path": voice["path"],
+            "cost": _task_cost(item.text),
+            "callback_url": item.callback_url,
+        })
+    total_cost = sum(item["cost"] for item in items)
+    _check_deadline(sum(len(item["synth_text"]) for item in items), req.priority, req.deadline_ms)
+    await _check_callback_hosts([item["callback_url"] for item in items])
+
+    result = await _write_reserved(
+        db, current_user.id, len(items), lambda session: hold_and_create_batch(session, current_user.id, items)
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=402,
+            detail=f"Insufficient credits. Required: {total_cost}"
+        )
+    batch_id, _ = result
+
+    await tts_engine.submit_tasks([
+        (item["id"], item["synth_text"], item["voice_path"]) for item in items
+    ], req.priority, req.deadline_ms)
+    inflight_tracker.attach(current_user.id, [item["id"] for item in items])
+    return BatchResponse(
+        batch_id=batch_id,
+        status="queued",
+        item_count=len(items),
+        total_cost=total_cost,
+        task_ids=[item["id"] for item in items],
+    )
+
+
+async def _get_owned_batch(db: AsyncSession, batch_id: str, current_user: AuthUser):
+    batch = await get_batch(db, batch_id)
+    if not batch and fall_back_to_primary(db):
+        # Not replicated yet (submitted through another process)
+        batch = await get_batch(db, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to access this batch")
+    return batch
+
+
+async def _batch_status_response(db: AsyncSession, batch, output_url: str) -> BatchStatusResponse:
+    tasks = await get_batch_tasks(db, batch.id)
+    counts: Dict[str, int] = {}
+    for t in tasks:
+        counts[t.status] = counts.get(t.status, 0) + 1
+    status = _batch_status(counts, batch.item_count)
+    ready = {"completed"} if batch.kind == "script" else {"completed", "partial"}
+    return BatchStatusResponse(
+        batch_id=batch.id,
+        status=status,
+        item_count=batch.item_count,
+        total_cost=batch.total_cost,
+        counts={k.lower(): v for k, v in counts.items()},
+        items=[
+            BatchItemStatus(
+                index=t.batch_index,
+                task_id=t.id,
+                status=t.status.lower(),
+                output_url=t.output_url,
+                error=t.error_message,
+            )
+            for t in tasks
+        ],
+        output_url=output_url if status in ready else None,
+    )
+
+
+@router.get("/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(
+    batch_id: str,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Aggregate status of a batch plus per-item status (in submission order).
+    """
+    batch = await _get_owned_batch(db, batch_id, current_user)
+    return await _batch_status_response(db, batch, f"/tts/batch/{batch.id}/output")
+
+
+@router.get("/batch/{batch_id}/output")
+async def get_batch_output(
+    batch_id: str,
+    format: str = "zip",
+    pause_ms: int = 300,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download a finished batch.
+
+    Parameters:
+    - format: `zip` (one wav per item, named by index) or `concat` (one wav)
+    - pause_ms: silence between items for `concat` (default 300, max 5000)
+
+    Failed items are skipped; returns 409 while items are still pending.
+    """
+    if format not in {"zip", "concat"}:
+        raise HTTPException(status_code=400, detail="format must be zip or concat")
+    if pause_ms < 0 or pause_ms > 5000:
+        raise HTTPException(status_code=400, detail="pause_ms must be between 0 and 5000")
+
+    await _get_owned_batch(db, batch_id, current_user)
+    tasks = await get_batch_tasks(db, batch_id)
+    if any(t.status not in {"COMPLETED", "FAILED"} for t in tasks):
+        raise HTTPException(status_code=409, detail="Batch is still processing")
+    done = [t for t in tasks if t.status == "COMPLETED" and t.output_url]
+    if not done:
+        raise HTTPException(status_code=404, detail="No completed items in batch")
+
+    paths = [generated_path(t.output_url, settings.GENERATED_AUDIO_DIR) for t in done]
+    loop = asyncio.get_event_loop()
+    if format == "zip":
+        output_path = os.path.join(settings.GENERATED_AUDIO_DIR, f"batch_{batch_id}.zip")
+        if not os.path.exists(output_path):
+            names = [f"{t.batch_index:04d}_{t.id}.wav" for t in done]
+            await loop.run_in_executor(None, zip_files, paths, names, output_path)
+        return FileResponse(output_path, media_type="application/zip", filename=f"batch_{batch_id}.zip")
+
+    output_path = os.path.join(settings.GENERATED_AUDIO_DIR, f"batch_{batch_id}_{pause_ms}ms.wav")
+    if not os.path.exists(output_path):
+        await loop.run_in_executor(None, lambda: concat_wavs(paths, output_path, pause_ms=pause_ms))
+    return FileResponse(output_path, media_type="audio/wav", filename=f"batch_{batch_id}.wav")
+
+
+async def _get_owned_script(db: AsyncSession, script_id: str, current_user: AuthUser):
+    batch = await _get_owned_batch(db, script_id, current_user)
+    if batch.kind != "script":
+        raise HTTPException(status_code=404, detail="Script not found")
+    return batch
+
+
+@router.post("/scripts", response_model=ScriptResponse)
+async def create_script(
+    req: ScriptRequest,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    _: None = Depends(limit_tts_submission),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Submit a multi-voice dialogue script (ordered lines, one voice each).
+
+    Lines are enqueued grouped by voice (voices in order of first appearance)
+    so consecutive inferences reuse the engine's encoded prompt for that voice;
+    /tts/scripts/{script_id}/output reassembles them in script order.
+    The whole script's cost is held at once; each line is charged when it completes.
+    """
+    if tts_engine.queue is None:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+
+    lexicon = await get_user_lexicon(db, current_user.id)
+    items = []
+    for idx, line in enumerate(req.lines):
+        voice = voice_catalog.get(line.voice_id)
+        if voice is None:
+            raise HTTPException(status_code=404, detail=f"Voice file not found (line {idx})")
+        items.append({
+            "id": new_id(),
+            "text": line.text,
+            "synth_text": lexicon.apply(line.text),
+            "voice_path": voice["path"],
+            "cost": _task_cost(line.text),
+        })
+    total_cost = sum(item["cost"] for item in items)
+    line_pauses = [line.pause_after_ms for line in req.lines]
+
+    line_pauses_json = json.dumps(line_pauses) if any(p is not None for p in line_pauses) else None
+    result = await _write_reserved(db, current_user.id, len(items), lambda session: hold_and_create_batch(
+        session,
+        current_user.id,
+        items,
+        kind="script",
+        pause_ms=req.pause_ms,
+        line_pauses=line_pauses_json,
+    ))
+    if result is None:
+        raise HTTPException(
+            status_code=402,
+            detail=f"Insufficient credits. Required: {total_cost}"
+        )
+    script_id, _ = result
+
+    first_seen: Dict[str, int] = {}
+    for idx, item in enumerate(items):
+        first_seen.setdefault(item["voice_path"], idx)
+    schedule = sorted(range(len(items)), key=lambda i: (first_seen[items[i]["voice_path"]], i))
+    await tts_engine.submit_tasks([
+        (items[i]["id"], items[i]["synth_text"], items[i]["voice_path"]) for i in schedule
+    ])
+    inflight_tracker.attach(current_user.id, [item["id"] for item in items])
+    return ScriptResponse(
+        script_id=script_id,
+        status="queued",
+        line_count=len(items),
+        total_cost=total_cost,
+        task_ids=[item["id"] for item in items],
+    )
+
+
+@router.get("/scripts/{script_id}", response_model=BatchStatusResponse)
+async def get_script_status(
+    script_id: str,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Aggregate status of a script plus per-line status (in script order).
+    """
+    batch = await _get_owned_script(db, script_id, current_user)
+    return await _batch_status_response(db, batch, f"/tts/scripts/{batch.id}/output")
+
+
+class _LineStillRendering(Exception):
+    """The script line's current task has not finished yet."""
+
+
+@router.put("/scripts/{script_id}/lines/{index}", response_model=TaskResponse)
+async def update_script_line(
+    script_id: str,
+    index: int,
+    req: ScriptLineUpdate,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    _: None = Depends(limit_tts_submission),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Edit one line and re-render only that line.
+
+    The new task replaces the line in the script; every other line keeps its
+    existing audio. The line is charged like a single /tts/generate call.
+    Returns 409 while the line's current render is still queued or running.
+    """
+    if tts_engine.queue is None:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    batch = await _get_owned_script(db, script_id, current_user)
+    if index < 0 or index >= batch.item_count:
+        raise HTTPException(status_code=404, detail="Line not found")
+
+    if req.voice_id is not None:
+        voice = voice_catalog.get(req.voice_id)
+        if voice is None:
+            raise HTTPException(status_code=404, detail="Voice file not found")
+        voice_path = voice["path"]
+    else:
+        current = next((t for t in await get_batch_tasks(db, batch.id) if t.batch_index == index), None)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Line not found")
+        voice_path = current.voice_path
+
+    cost = _task_cost(req.text)
+    lexicon = await get_user_lexicon(db, current_user.id)
+    task_id = new_id()
+    batch_id, user_id = batch.id, current_user.id
+
+    async def replace_line(session: AsyncSession) -> Optional[str]:
+        if await place_credit_hold(session, user_id, cost) is None:
+            return None
+        if not await replace_batch_line(session, batch_id, user_id, index, task_id, req.text, voice_path, cost):
+            raise _LineStillRendering  # rolls the hold back
+        return task_id
+
+    try:
+        result = await _write_reserved(db, user_id, 1, replace_line)
+    except _LineStillRendering:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Line is still processing; edit it once it has finished")
+    if result is None:
+        raise HTTPException(
+            status_code=402,
+            detail=f"Insufficient credits. Required: {cost}"
+        )
+
+    await tts_engine.submit_task(task_id, lexicon.apply(req.text), voice_path)
+    inflight_tracker.attach(user_id, [task_id])
+    return TaskResponse(task_id=task_id, status="queued", cost=cost)
+
+
+@router.get("/scripts/{script_id}/output")
+async def get_script_output(
+    script_id: str,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download the assembled script (one wav, lines in script order with pauses).
+
+    Returns 409 until every line has completed; failed lines must be
+    re-rendered via PUT /tts/scripts/{script_id}/lines/{index} first.
+    """
+    batch = await _get_owned_script(db, script_id, current_user)
+    tasks = await get_batch_tasks(db, batch.id)
+    if any(t.status == "FAILED" for t in tasks):
+        raise HTTPException(status_code=409, detail="Script has failed lines; re-render them first")
+    if len(tasks) != batch.item_count or any(t.status != "COMPLETED" for t in tasks):
+        raise HTTPException(status_code=409, detail="Script is still processing")
+
+    overrides = json.loads(batch.line_pauses) if batch.line_pauses else [None] * len(tasks)
+    pauses = [p if p is not None else (batch.pause_ms or 0) for p in overrides[:-1]]
+    # Assembled file is keyed by the current line tasks + pauses, so an edited line
+    # produces a new file while unchanged scripts are served from disk
+    key = hashlib.sha1(json.dumps([[t.id for t in tasks], pauses]).encode("utf-8")).hexdigest()[:12]
+    output_path = os.path.join(settings.GENERATED_AUDIO_DIR, f"script_{batch.id}_{key}.wav")
+    if not os.path.exists(output_path):
+        paths = [generated_path(t.output_url, settings.GENERATED_AUDIO_DIR) for t in tasks]
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, lambda: concat_wavs(paths, output_path, pauses_ms=pauses))
+    return FileResponse(output_path, media_type="audio/wav", filename=f"script_{batch.id}.wav")
+
+
+@router.websocket("/stream")
+async def stream_tts(websocket: WebSocket, token: str = Query(...)):
+    """
+    Bidirectional streaming TTS for incrementally arriving text (e.g. LLM tokens).
+
+    Authenticate with `?token=<access token>`. Protocol (JSON text frames unless noted):
+    - client `{"type": "start", "voice_id": ..., "format": "wav" | "pcm16"}` (once, first)
+    - server `{"type": "ready", "session_id", "sample_rate"}` once the voice prompt is encoded
+    - client `{"type": "text", "text": ...}` any number of fragments
+    - client `{"type": "flush"}` synthesize whatever is buffered now
+    - client `{"type": "end"}` flush and finish the session
+    - server `{"type": "sentence", "index", "text", "cost", "balance"}` when a sentence is charged
+    - server `{"type": "audio", "index", "format", "sample_rate", "bytes"}` followed by one binary frame
+    - server `{"type": "done", "sentences", "total_cost", "first_audio_ms"}` then close
+
+    Each sentence is charged on its own (ledger external_ref `stream:{session_id}`) and
+    refunded if synthesis fails or the client disconnects before its audio; the session ends with a 402 error on insufficient credits.
+    Connecting counts as one TTS submission against the rate limits, and an open stream
+    holds one in-flight slot; over either limit the session ends with a 429 error.
+    `first_audio_ms` is the time from the first text fragment to the first audio frame.
+    """
+    async with AsyncSessionLocal() as db:
+        user = await get_user_from_token(db, token)
+        if user is None or not user.has_scope("tts"):
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        lexicon = await get_user_lexicon(db, user.id)
+    user_id = user.id
+
+    await websocket.accept()
+
+    async def fail(code: int, detail: str, close_code: int = status.WS_1008_POLICY_VIOLATION):
+        await websocket.send_json({"type": "error", "status": code, "detail": detail})
+        await websocket.close(code=close_code)
+
+    # A stream is one submission against the rate buckets and holds one
+    # in-flight slot for as long as it stays open
+    try:
+        await enforce_tts_limits(user_id, websocket)
+    except HTTPException as e:
+        return await fail(e.status_code, e.detail)
+    if not inflight_tracker.reserve(user_id):
+        return await fail(429, f"Too many tasks in flight (max {inflight_tracker.max_per_user})")
+    try:
+        try:
+            start = await websocket.receive_json()
+        except WebSocketDisconnect:
+            return
+        if start.get("type") != "start":
+            return await fail(400, "First message must be {\"type\": \"start\"}")
+        voice = voice_catalog.get(start.get("voice_id") or "")
+        if voice is None:
+            return await fail(404, "Voice file not found")
+        fmt = start.get("format") or "wav"
+        if fmt not in ("wav", "pcm16"):
+            return await fail(400, "format must be wav or pcm16")
+        if tts_engine.queue is None or tts_engine.model is None:
+            return await fail(503, "TTS engine not initialized", status.WS_1011_INTERNAL_ERROR)
+        voice_path = voice["path"]
+
+        session_id = str(uuid.uuid4())
+        # Encode the voice prompt once; every sentence of the session reuses it
+        try:
+            await tts_engine.prepare_voice(voice_path)
+        except Exception as e:
+            return await fail(422, f"Voice prompt unavailable: {e}")
+        await websocket.send_json({
+            "type": "ready",
+            "session_id": session_id,
+            "sample_rate": tts_engine.model.tts_model.sample_rate,
+        })
+
+        segmenter = SentenceSegmenter(
+            first_cut_chars=settings.TTS_STREAM_FIRST_CUT_CHARS,
+            max_chars=settings.TTS_STREAM_MAX_SENTENCE_CHARS,
+        )
+        sentences: asyncio.Queue = asyncio.Queue()
+        stats = {"sentences": 0, "total_cost": 0, "first_text_at": None, "first_audio_ms": None}
+
+        async def receive_text():
+            while True:
+                msg = await websocket.receive_json()
+                kind = msg.get("type")
+                if kind == "text":
+                    if stats["first_text_at"] is None:
+                        stats["first_text_at"] = time.monotonic()
+                    ready = segmenter.feed(str(msg.get("text") or ""))
+                elif kind in ("flush", "end"):
+                    ready = segmenter.flush()
+                else:
+                    ready = []
+                for sentence in ready:
+                    sentences.put_nowait(sentence)
+                if kind == "end":
+                    sentences.put_nowait(None)
+                    return
+
+        async def refund(index: int, cost: int, why: str):
+            async with AsyncSessionLocal() as db:
+                await write_queue.run(db, lambda session: apply_credit_transaction(
+                    db=session,
+                    user_id=user_id,
+                    amount=cost,
+                    kind="REFUND",
+                    reason=f"TTS stream refund: sentence {index} {why}",
+                    external_ref=f"stream:{session_id}",
+                ))
+            replica_monitor.note_write(user_id)
+            stats["total_cost"] -= cost
+
+        async def synthesize_sentences():
+            index = 0
+            while True:
+                text = await sentences.get()
+                if text is None:
+                    return True
+                cost = _task_cost(text)
+                async with AsyncSessionLocal() as db:
+                    result = await write_queue.run(db, lambda session: apply_credit_transaction(
+                        db=session,
+                        user_id=user_id,
+                        amount=-cost,
+                        kind="TTS_CHARGE",
+                        reason=f"TTS stream charge: {len(text)} chars",
+                        external_ref=f"stream:{session_id}",
+                    ))
+                if result is None:
+                    await fail(402, f"Insufficient credits. Required: {cost}")
+                    return False
+                replica_monitor.note_write(user_id)
+                stats["sentences"] += 1
+                stats["total_cost"] += cost
+                await websocket.send_json({
+                    "type": "sentence", "index": index, "text": text, "cost": cost, "balance": result[1],
+                })
+
+                try:
+                    wav, sample_rate = await tts_engine.synthesize(lexicon.apply(text), voice_path)
+                    payload = encode_audio(wav, sample_rate, fmt)
+                except asyncio.CancelledError:
+                    # Client went away while this sentence was synthesizing: it was charged but never delivered
+                    await asyncio.shield(refund(index, cost, "cancelled"))
+                    raise
+                except Exception as e:
+                    logger.error(f"Stream {session_id} sentence {index} failed: {e}")
+                    await refund(index, cost, "failed")
+                    await websocket.send_json({"type": "error", "status": 500, "index": index, "detail": str(e)})
+                    index += 1
+                    continue
+
+                await websocket.send_json({
+                    "type": "audio", "index": index, "format": fmt, "sample_rate": sample_rate, "bytes": len(payload),
+                })
+                await websocket.send_bytes(payload)
+                if stats["first_audio_ms"] is None and stats["first_text_at"] is not None:
+                    stats["first_audio_ms"] = int((time.monotonic() - stats["first_text_at"]) * 1000)
+                    logger.info(f"Stream {session_id}: first audio after {stats['first_audio_ms']} ms")
+                index += 1
+
+        receiver = asyncio.create_task(receive_text())
+        worker = asyncio.create_task(synthesize_sentences())
+        try:
+            await asyncio.wait({receiver, worker}, return_when=asyncio.FIRST_COMPLETED)
+            if worker.done():
+                # Worker stopped early: insufficient credits (it already closed the socket) or an error
+                receiver.cancel()
+                if worker.exception() is not None:
+                    logger.error(f"Stream {session_id} stopped: {worker.exception()!r}")
+                return
+            if receiver.exception() is not None:
+                # Client went away mid-stream: stop synthesizing (the in-flight sentence is refunded,
+                # delivered sentences stay charged)
+                worker.cancel()
+                return
+            if not await worker:
+                return
+            await websocket.send_json({
+                "type": "done",
+                "session_id": session_id,
+                "sentences": stats["sentences"],
+                "total_cost": stats["total_cost"],
+                "first_audio_ms": stats["first_audio_ms"],
+            })
+            await websocket.close()
+        finally:
+            for t in (receiver, worker):
+                if not t.done():
+                    t.cancel()
+            # Let a cancelled worker finish its refund before the handler returns
+            await asyncio.gather(receiver, worker, return_exceptions=True)
+    finally:
+        inflight_tracker.release(user_id)
+
+
+@router.get("/status", response_model=TaskStatusListResponse)
+async def get_task_statuses_endpoint(
+    ids: str = Query(..., description="Comma-separated task ids"),
+    wait: float = Query(0, ge=0),
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Poll many tasks at once (single `WHERE id IN (...)` query).
+
+    Parameters:
+    - ids: comma-separated task ids (max TTS_STATUS_MAX_IDS)
+    - wait: long-poll seconds (capped at TTS_STATUS_MAX_WAIT_SECONDS). When > 0 and some
+      listed task is not finished, the request is held until any of them changes state
+      or the wait expires; `changed` tells which happened.
+
+    Tasks that do not exist or belong to another user are listed in `missing`.
+    """
+    task_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not task_ids:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(task_ids) > settings.TTS_STATUS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many ids (max {settings.TTS_STATUS_MAX_IDS})")
+
+    owner_id = None if current_user.is_admin else current_user.id
+    rows = await get_task_statuses(db, task_ids, user_id=owner_id)
+    if len(rows) < len(task_ids) and fall_back_to_primary(db):
+        # Some ids are not on the replica yet (submitted through another process)
+        rows = await get_task_statuses(db, task_ids, user_id=owner_id)
+
+    changed = False
+    wait = min(wait, settings.TTS_STATUS_MAX_WAIT_SECONDS)
+    if wait > 0:
+        pending = {r.id: r.status for r in rows if r.status not in TERMINAL_STATUSES}
+        if pending:
+            # Release the pooled connection while parked
+            await db.rollback()
+            changed = await task_status_registry.wait_any(pending, wait)
+            if changed:
+                # The change was just committed on the primary; the replica may not have it yet
+                fall_back_to_primary(db)
+                rows = await get_task_statuses(db, task_ids, user_id=owner_id)
+
+    found = {r.id: r for r in rows}
+    return TaskStatusListResponse(
+        tasks=[
+            TaskStatusResponse(
+                task_id=r.id,
+                status=r.status.lower(),
+                output_url=r.output_url,
+                error=r.error_message,
+            )
+            for r in (found[i] for i in task_ids if i in found)
+        ],
+        missing=[i for i in task_ids if i not in found],
+        changed=changed,
+    )
+
 
 @router.get("/status/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status_endpoint(
     task_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Poll task status.
     Users can only access their own tasks.
     """
     task = await get_task(db, task_id)
+    if not task and fall_back_to_primary(db):
+        # Not replicated yet (submitted through another process)
+        task = await get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -120,38 +939,42 @@ async def get_task_status_endpoint(
 
 @router.get("/history", response_model=list[TaskHistoryItem])
 async def list_my_tasks(
+    response: Response,
     limit: int = 50,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     List current user's TTS task history (most recent first).
 
     Parameters:
     - limit: max number of tasks to return (default 50, max 200)
+    - cursor: `X-Next-Cursor` header of the previous page (absent on the last page)
     """
     if limit <= 0:
         raise HTTPException(status_code=400, detail="limit must be positive")
     if limit > 200:
         raise HTTPException(status_code=400, detail="limit too large")
 
-    tasks = await get_user_tasks(db, current_user.id, limit=limit)
-    items: list[TaskHistoryItem] = []
-    for t in tasks:
-        voice_id = os.path.relpath(t.voice_path, settings.VOICE_ASSETS_DIR) if t.voice_path else ""
-        text_excerpt = (t.text[:120] + "...") if t.text and len(t.text) > 120 else (t.text or "")
-        items.append(
-            TaskHistoryItem(
-                task_id=t.id,
-                status=t.status.lower(),
-                cost=t.cost,
-                voice_id=voice_id,
-                text_excerpt=text_excerpt,
-                output_url=t.output_url,
-                error=t.error_message,
-                created_at=t.created_at.isoformat() if t.created_at else "",
-                completed_at=t.completed_at.isoformat() if t.completed_at else None,
-            )
+    try:
+        rows, next_cursor = await list_task_history(db, current_user.id, limit=limit, cursor=cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        TaskHistoryItem(
+            task_id=t.id,
+            status=t.status.lower(),
+            cost=t.cost,
+            voice_id=os.path.relpath(t.voice_path, settings.VOICE_ASSETS_DIR) if t.voice_path else "",
+            text_excerpt=t.text_excerpt or "",
+            output_url=t.output_url,
+            error=t.error_message,
+            created_at=t.created_at.isoformat() if t.created_at else "",
+            completed_at=t.completed_at.isoformat() if t.completed_at else None,
         )
-    return items
+        for t in rows
+    ]
 
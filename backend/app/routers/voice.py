@@ -1,9 +1,16 @@
+import io
 import os
-import glob
-from fastapi import APIRouter, HTTPException
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import APIRouter, HTTPException, Depends, Security, UploadFile, File, Form, Request, Response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from backend.app.core.config import settings
+from backend.app.core.deps import get_current_active_user, get_current_admin_user
+from backend.app.core.speaker_index import speaker_index
+from backend.app.core.user_cache import AuthUser
+from backend.app.core.voice_catalog import voice_catalog
+from backend.app.core.voice_ingest import IngestOptions, discover_voices, embed_audio, ingest_voice
 
 router = APIRouter(redirect_slashes=False)
 
@@ -13,56 +20,200 @@ class Voice(BaseModel):
     category: str
     preview_url: str
     transcript: str = ""
+    duration_seconds: Optional[float] = None
+
+class SimilarVoice(Voice):
+    score: float
+
+class IngestResult(BaseModel):
+    voice_id: str
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+# Lazily created; shared by upload/ingest requests so workers are reused
+_ingest_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_ingest_pool() -> ProcessPoolExecutor:
+    global _ingest_pool
+    if _ingest_pool is None:
+        _ingest_pool = ProcessPoolExecutor(max_workers=settings.VOICE_INGEST_WORKERS)
+    return _ingest_pool
 
 @router.get("", response_model=List[Voice])
 @router.get("/", response_model=List[Voice])
-async def get_voices():
+async def get_voices(
+    request: Request,
+    category: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+):
     """
-    Scan the prompt_voice directory and return available voices.
+    Return available voices from the in-memory catalog.
+
+    Parameters:
+    - category: only voices in this category (e.g. male, female)
+    - offset / limit: pagination window (total count in X-Total-Count)
+
+    The body is pre-serialized per catalog snapshot; clients sending the
+    previous ETag in If-None-Match get 304 Not Modified.
     """
-    voices = []
-    # Structure is prompt_voice/{category}/{filename}.wav
-    # We use glob to find all .wav files
-    search_pattern = os.path.join(settings.VOICE_ASSETS_DIR, "**", "*.wav")
-    wav_files = glob.glob(search_pattern, recursive=True)
-    
-    # Sort files for consistent order
-    wav_files.sort()
-
-    for wav_path in wav_files:
-        # Get relative path parts
-        rel_path = os.path.relpath(wav_path, settings.VOICE_ASSETS_DIR)
-        parts = rel_path.split(os.sep)
-        
-        if len(parts) < 2:
-            continue # Skip files in root or weird structure
-            
-        category = parts[0] # e.g. male, female
-        filename = parts[-1]
-        name = os.path.splitext(filename)[0]
-        
-        # Look for transcript .txt
-        txt_path = os.path.splitext(wav_path)[0] + ".txt"
-        transcript = ""
-        if os.path.exists(txt_path):
-            try:
-                with open(txt_path, "r", encoding="utf-8") as f:
-                    transcript = f.read().strip()
-            except Exception:
-                pass
-
-        # Construct preview URL (served by static mount)
-        # We need to expose prompt_voice as static too or copy them? 
-        # Better to expose prompt_voice as /static/voices
-        preview_url = f"/static/voices/{category}/{filename}"
-        
-        voices.append(Voice(
-            id=rel_path, # Use relative path as ID
-            name=name,
-            category=category,
-            preview_url=preview_url,
-            transcript=transcript
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be non-negative")
+    if limit is not None and limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
+    snapshot = voice_catalog.snapshot
+    etag = f'W/"{snapshot.etag}-{category or ""}-{offset}-{limit or ""}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    body, total = snapshot.page(category, offset, limit)
+    headers["X-Total-Count"] = str(total)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _similar_response(matches) -> List[SimilarVoice]:
+    snapshot = voice_catalog.snapshot
+    items = []
+    for voice_id, score in matches:
+        v = snapshot.voices.get(voice_id)
+        if v is None:
+            continue
+        items.append(SimilarVoice(
+            id=v["id"],
+            name=v["name"],
+            category=v["category"],
+            preview_url=v["preview_url"],
+            transcript=v["transcript"],
+            duration_seconds=v["duration_seconds"],
+            score=round(score, 4),
         ))
-        
-    return voices
+    return items
+
+
+@router.get("/{voice_id:path}/similar", response_model=List[SimilarVoice])
+async def get_similar_voices(voice_id: str, k: int = 10):
+    """
+    Voices whose speaker embedding is closest to `voice_id` (cosine, best first).
+    Only ingested voices are indexed.
+    """
+    if k <= 0 or k > 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    if voice_catalog.get(voice_id) is None:
+        raise HTTPException(status_code=404, detail="Voice not found")
+    matches = speaker_index.similar_to(voice_id, k)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Voice not indexed yet (run voice ingestion)")
+    return _similar_response(matches)
+
+
+@router.post("/similar", response_model=List[SimilarVoice])
+async def find_similar_by_upload(
+    k: int = Form(10),
+    file: UploadFile = File(...),
+    current_user: AuthUser = Security(get_current_active_user, scopes=["tts"]),
+):
+    """
+    Embed an uploaded clip and return the nearest stock voices.
 
+    Uploads over VOICE_SIMILAR_MAX_UPLOAD_BYTES get 413; only the first
+    VOICE_SIMILAR_MAX_SECONDS of the clip are embedded.
+    """
+    if k <= 0 or k > 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    import soundfile as sf
+
+    max_bytes = settings.VOICE_SIMILAR_MAX_UPLOAD_BYTES
+    too_large = HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+    data = await file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise too_large
+    loop = asyncio.get_event_loop()
+
+    def _embed():
+        with sf.SoundFile(io.BytesIO(data)) as f:
+            frames = int(settings.VOICE_SIMILAR_MAX_SECONDS * f.samplerate)
+            y = f.read(frames=frames, dtype="float32", always_2d=True)
+            sr = f.samplerate
+        return embed_audio(y.mean(axis=1), sr)
+
+    try:
+        embedding = await loop.run_in_executor(None, _embed)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not read audio: {e}")
+    return _similar_response(speaker_index.query(embedding, k))
+
+
+@router.post("/upload", response_model=IngestResult)
+async def upload_voice(
+    category: str = Form(...),
+    transcript: str = Form(""),
+    file: UploadFile = File(...),
+    current_user: AuthUser = Depends(get_current_admin_user),
+):
+    """
+    Admin-only: upload a reference voice and ingest it.
+
+    The wav (and transcript, if given) is stored under prompt_voice/{category}/,
+    then processed into voice_artifacts in the ingestion process pool.
+    """
+    filename = os.path.basename(file.filename or "")
+    if not category or category != os.path.basename(category) or category.startswith("."):
+        raise HTTPException(status_code=400, detail="Invalid category")
+    if not filename.lower().endswith(".wav") or filename.startswith("."):
+        raise HTTPException(status_code=400, detail="Only .wav files are supported")
+
+    cat_dir = os.path.join(settings.VOICE_ASSETS_DIR, category)
+    os.makedirs(cat_dir, exist_ok=True)
+    src_path = os.path.join(cat_dir, filename)
+    with open(src_path, "wb") as f:
+        f.write(await file.read())
+    if transcript.strip():
+        with open(os.path.splitext(src_path)[0] + ".txt", "w", encoding="utf-8") as f:
+            f.write(transcript.strip())
+
+    voice_id = f"{category}/{filename}"
+    loop = asyncio.get_event_loop()
+    try:
+        meta = await loop.run_in_executor(
+            _get_ingest_pool(),
+            ingest_voice,
+            src_path,
+            voice_id,
+            settings.VOICE_ARTIFACTS_DIR,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Voice ingestion failed: {e}")
+    await loop.run_in_executor(None, voice_catalog.refresh)
+    return IngestResult(voice_id=voice_id, duration_seconds=meta.get("duration_seconds"))
+
+
+@router.post("/ingest", response_model=List[IngestResult])
+async def ingest_all_voices(
+    force: bool = False,
+    current_user: AuthUser = Depends(get_current_admin_user),
+):
+    """
+    Admin-only: (re)ingest every voice under prompt_voice in the shared ingestion pool.
+    Unchanged voices are skipped unless force=true.
+    """
+    loop = asyncio.get_event_loop()
+    voices = await loop.run_in_executor(None, discover_voices)
+    pool = _get_ingest_pool()
+    outcomes = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, ingest_voice, src, voice_id, settings.VOICE_ARTIFACTS_DIR, IngestOptions(), force)
+            for voice_id, src in voices.items()
+        ),
+        return_exceptions=True,
+    )
+    await loop.run_in_executor(None, voice_catalog.refresh)
+    # A bad file never aborts the whole run
+    return [
+        IngestResult(voice_id=voice_id, error=str(outcome))
+        if isinstance(outcome, Exception)
+        else IngestResult(voice_id=voice_id, duration_seconds=outcome.get("duration_seconds"))
+        for voice_id, outcome in zip(voices, outcomes)
+    ]
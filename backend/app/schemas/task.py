@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class TaskBase(BaseModel):
@@ -29,3 +29,8 @@ class TaskStatusResponse(BaseModel):
     output_url: Optional[str] = None
     error: Optional[str] = None
 
+
+class TaskStatusListResponse(BaseModel):
+    tasks: List[TaskStatusResponse]
+    missing: List[str] = []
+    changed: bool = False
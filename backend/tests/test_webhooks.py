@@ -0,0 +1,62 @@
+import asyncio
+import socket
+
+import pytest
+
+from backend.app.core import webhooks
+from backend.app.core.config import settings
+from backend.app.core.webhooks import UnsafeCallbackURL, check_callback_url, resolve_callback_url
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.10/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://100.64.0.1/hook",
+    "http://0.0.0.0/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://[fe80::1]/hook",
+    "http://224.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://api.localhost/hook",
+    "ftp://example.com/hook",
+    "https:///hook",
+])
+def test_check_callback_url_rejects(url):
+    with pytest.raises(UnsafeCallbackURL):
+        check_callback_url(url)
+
+
+def test_check_callback_url_accepts_public():
+    check_callback_url("https://example.com/hook")
+    check_callback_url("http://93.184.216.34:8080/hook")
+
+
+def _fake_getaddrinfo(address):
+    async def getaddrinfo(self, host, port, *args, **kwargs):
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        return [(family, socket.SOCK_STREAM, 6, "", (address, port))]
+    return getaddrinfo
+
+
+def test_resolve_rejects_host_resolving_to_private(monkeypatch):
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", _fake_getaddrinfo("10.1.2.3"))
+    with pytest.raises(UnsafeCallbackURL):
+        asyncio.run(resolve_callback_url("https://hooks.example.com/cb"))
+
+
+def test_resolve_pins_checked_address(monkeypatch):
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", _fake_getaddrinfo("93.184.216.34"))
+    url, headers, extensions = asyncio.run(resolve_callback_url("https://hooks.example.com:8443/cb?x=1"))
+    assert url == "https://93.184.216.34:8443/cb?x=1"
+    assert headers == {"Host": "hooks.example.com:8443"}
+    assert extensions == {"sni_hostname": "hooks.example.com"}
+
+
+def test_allowed_hosts_skip_the_check(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", "127.0.0.1, receiver.internal")
+    check_callback_url("http://127.0.0.1:39000/hook")
+    assert asyncio.run(resolve_callback_url("http://receiver.internal/hook")) == ("http://receiver.internal/hook", {}, {})
+    assert webhooks._allowed_hosts() == {"127.0.0.1", "receiver.internal"}
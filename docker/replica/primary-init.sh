@@ -0,0 +1,5 @@
+#!/bin/sh
+# Runs once when the primary's data volume is initialised (docker-compose.replica.yml).
+# Allows the compose standby to stream WAL as POSTGRES_USER (a superuser, so it has REPLICATION).
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
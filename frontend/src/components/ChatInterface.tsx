@@ -93,9 +93,9 @@ export function ChatInterface({ onOpenVoiceDrawer }: ChatInterfaceProps) {
       const balance = await getCreditsBalance();
       setCredits(balance.balance);
       
-      if (balance.balance < estimatedCost) {
+      if (balance.available < estimatedCost) {
         setIsGenerating(false);
-        setError(`Insufficient credits. You need at least ${estimatedCost} credits, but you have ${balance.balance}.`);
+        setError(`Insufficient credits. You need at least ${estimatedCost} credits, but you have ${balance.available} available.`);
         return;
       }
       
@@ -78,6 +78,8 @@ export interface LoginResponse {
 
 export interface BalanceResponse {
   balance: number;
+  held: number;
+  available: number;
   user_id: string;
 }
 
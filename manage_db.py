@@ -5,10 +5,25 @@ MoshengAI 数据库管理工具
 """
 import sqlite3
 import sys
+import uuid
 from datetime import datetime
 
 DB_PATH = '/scratch/kcriss/MoshengAI/mosheng.db'
 
+def format_id(value):
+    """用户/任务 ID 以16字节BLOB存储，显示为标准UUID字符串"""
+    if isinstance(value, bytes):
+        return str(uuid.UUID(bytes=value))
+    return value
+
+def invalidate_cached_user(cursor, email):
+    """通知 API 进程丢弃该用户的认证缓存（见 backend/app/core/auth_invalidation.py），与修改一起提交"""
+    cursor.execute(
+        "INSERT INTO user_cache_invalidations (user_id, created_at) "
+        "SELECT id, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM users WHERE email = ?",
+        (email,),
+    )
+
 def list_users(limit=20):
     """列出所有用户"""
     conn = sqlite3.connect(DB_PATH)
@@ -28,7 +43,7 @@ def list_users(limit=20):
     for row in cursor.fetchall():
         user_id, email, provider, credits, is_admin, created_at = row
         admin_str = "✅" if is_admin else ""
-        print(f"{user_id[:36]:<38} {email:<30} {provider:<10} {credits:<10} {admin_str:<8} {created_at[:19]}")
+        print(f"{format_id(user_id):<38} {email:<30} {provider:<10} {credits:<10} {admin_str:<8} {created_at[:19]}")
     
     conn.close()
 
@@ -48,6 +63,7 @@ def add_credits(email, amount):
     old_balance = result[0]
     
     cursor.execute("UPDATE users SET credits_balance = credits_balance + ? WHERE email = ?", (amount, email))
+    invalidate_cached_user(cursor, email)
     conn.commit()
     
     cursor.execute("SELECT credits_balance FROM users WHERE email = ?", (email,))
@@ -66,8 +82,10 @@ def set_admin(email, is_admin=True):
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("UPDATE users SET is_admin = ? WHERE email = ?", (1 if is_admin else 0, email))
+    updated = cursor.rowcount
+    invalidate_cached_user(cursor, email)
     conn.commit()
-    if cursor.rowcount > 0:
+    if updated > 0:
         print(f"✅ 已将 {email} 设置为{'管理员' if is_admin else '普通用户'}")
     else:
         print(f"❌ 用户不存在: {email}")
@@ -80,18 +98,20 @@ def list_tasks(user_email=None, limit=20):
     
     if user_email:
         cursor.execute("""
-            SELECT t.id, u.email, t.text, t.status, t.cost, t.created_at
+            SELECT t.id, u.email, p.text, t.status, t.cost, t.created_at
             FROM tasks t
             JOIN users u ON t.user_id = u.id
+            LEFT JOIN task_payloads p ON p.task_id = t.id
             WHERE u.email = ?
             ORDER BY t.created_at DESC
             LIMIT ?
         """, (user_email, limit))
     else:
         cursor.execute("""
-            SELECT t.id, u.email, t.text, t.status, t.cost, t.created_at
+            SELECT t.id, u.email, p.text, t.status, t.cost, t.created_at
             FROM tasks t
             LEFT JOIN users u ON t.user_id = u.id
+            LEFT JOIN task_payloads p ON p.task_id = t.id
             ORDER BY t.created_at DESC
             LIMIT ?
         """, (limit,))
@@ -108,8 +128,9 @@ def list_tasks(user_email=None, limit=20):
         for row in tasks:
             task_id, email, text, status, cost, created_at = row
             email = email or "匿名"
+            text = text or ""
             text_short = (text[:22] + '...') if len(text) > 25 else text
-            print(f"{task_id[:36]:<38} {email:<25} {text_short:<25} {status:<12} {cost:<8} {created_at[:19]}")
+            print(f"{format_id(task_id):<38} {email:<25} {text_short:<25} {status:<12} {cost:<8} {created_at[:19]}")
     
     conn.close()
 
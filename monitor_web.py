@@ -21,8 +21,10 @@ import urllib.request
 from sqlalchemy import select, update, delete, func
 
 from backend.app.db.database import AsyncSessionLocal
-from backend.app.db.models import User as DbUser, Task as DbTask
+from backend.app.db.models import User as DbUser, Task as DbTask, TaskPayload as DbTaskPayload
 from backend.app.db.crud_credits import apply_credit_transaction
+from backend.app.db.crud_rollup import get_task_stats
+from backend.app.db.crud_user import record_user_invalidation
 
 app = FastAPI(title="MoshengAI Monitor")
 
@@ -155,25 +157,15 @@ async def get_database_stats():
         async with AsyncSessionLocal() as db:
             total_users = (await db.execute(select(func.count(DbUser.id)))).scalar_one()
             total_credits = (await db.execute(select(func.coalesce(func.sum(DbUser.credits_balance), 0)))).scalar_one()
-            total_tasks = (await db.execute(select(func.count(DbTask.id)))).scalar_one()
-
-            task_stats_rows = (
-                await db.execute(select(DbTask.status, func.count(DbTask.id)).group_by(DbTask.status))
-            ).all()
-            task_stats = {status: count for status, count in task_stats_rows}
-
-            today_tasks = (
-                await db.execute(
-                    select(func.count(DbTask.id)).where(func.date(DbTask.created_at) == func.current_date())
-                )
-            ).scalar_one()
+            # 任务统计读 rollup 表（由后端定时汇总），不再每 2 秒全表扫描 tasks
+            task_summary = await get_task_stats(db)
         
         return {
             'total_users': total_users,
             'total_credits': total_credits,
-            'total_tasks': total_tasks,
-            'task_stats': task_stats,
-            'today_tasks': today_tasks,
+            'total_tasks': task_summary['total_tasks'],
+            'task_stats': task_summary['task_stats'],
+            'today_tasks': task_summary['today_tasks'],
                 'database_size_mb': 0.0
         }
     except:
@@ -264,6 +256,8 @@ async def update_user(user_id: str, update: UserUpdate):
                 if result is None:
                     raise HTTPException(status_code=400, detail="Insufficient credits for adjustment")
 
+        # API 进程的认证缓存不在本进程：记录失效，使管理员降级 / 邮箱修改立即生效
+        await record_user_invalidation(db, user.id)
         await db.commit()
         return {'message': 'User updated successfully'}
 
@@ -274,6 +268,7 @@ async def delete_user(user_id: str):
         result = await db.execute(delete(DbUser).where(DbUser.id == user_id))
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="User not found")
+        await record_user_invalidation(db, user_id)
         await db.commit()
         return {'message': 'User deleted successfully'}
 
@@ -298,6 +293,7 @@ async def update_user_credits(user_id: str, update: CreditsUpdate):
         if result is None:
             raise HTTPException(status_code=400, detail="Insufficient credits")
         _, new_balance = result
+        await record_user_invalidation(db, user.id)
         await db.commit()
         return {
             'message': f'Credits updated: {int(update.amount):+d}',
@@ -319,17 +315,18 @@ async def get_tasks(limit: int = 100, offset: int = 0):
     async with AsyncSessionLocal() as db:
         rows = (
             await db.execute(
-                select(DbTask)
+                select(DbTask, DbTaskPayload.text)
+                .outerjoin(DbTaskPayload, DbTaskPayload.task_id == DbTask.id)
                 .order_by(DbTask.created_at.desc())
                 .limit(limit)
                 .offset(offset)
             )
-        ).scalars().all()
+        ).all()
         total = (await db.execute(select(func.count(DbTask.id)))).scalar_one()
 
         tasks = []
-        for t in rows:
-            text_value = t.text or ""
+        for t, text in rows:
+            text_value = text or ""
             tasks.append({
                 'id': t.id,
                 'user_id': t.user_id,
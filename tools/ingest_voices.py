@@ -0,0 +1,91 @@
+"""
+Voice ingestion CLI.
+
+Processes every reference voice under VOICE_ASSETS_DIR (prompt_voice/{category}/*.wav)
+into VOICE_ARTIFACTS_DIR using a process pool:
+- resample to the model rate, trim silence, normalize loudness
+- pick the best segment under the duration budget
+- write a small OGG preview, a speaker embedding and a JSON sidecar
+
+Unchanged voices (same source mtime/size) are skipped unless --force is given.
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/ingest_voices.py
+  PYTHONPATH=. python tools/ingest_voices.py --workers 8 --max-seconds 8 --force
+  PYTHONPATH=. python tools/ingest_voices.py --only "female/xxx.wav"
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from backend.app.core.config import settings
+from backend.app.core.voice_ingest import IngestOptions, discover_voices, ingest_voices
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets-dir", default=settings.VOICE_ASSETS_DIR)
+    parser.add_argument("--artifacts-dir", default=settings.VOICE_ARTIFACTS_DIR)
+    parser.add_argument("--workers", type=int, default=settings.VOICE_INGEST_WORKERS)
+    parser.add_argument("--sample-rate", type=int, default=settings.VOICE_PROMPT_SAMPLE_RATE)
+    parser.add_argument("--max-seconds", type=float, default=settings.VOICE_PROMPT_MAX_SECONDS)
+    parser.add_argument("--target-dbfs", type=float, default=settings.VOICE_TARGET_DBFS)
+    parser.add_argument("--only", action="append", default=[], help="voice id to ingest (repeatable)")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    if args.workers <= 0:
+        raise ValueError("--workers must be positive")
+
+    voices = discover_voices(args.assets_dir)
+    if args.only:
+        missing = [v for v in args.only if v not in voices]
+        if missing:
+            raise ValueError(f"Unknown voice ids: {missing}")
+        voices = {v: voices[v] for v in args.only}
+
+    options = IngestOptions(
+        sample_rate=args.sample_rate,
+        max_seconds=args.max_seconds,
+        target_dbfs=args.target_dbfs,
+    )
+
+    start = time.time()
+    results = ingest_voices(
+        voices,
+        artifacts_dir=args.artifacts_dir,
+        options=options,
+        workers=args.workers,
+        force=args.force,
+    )
+    elapsed = time.time() - start
+
+    failed = [r for r in results if "error" in r]
+    print("=" * 72)
+    print("MoshengAI Voice Ingestion")
+    print("=" * 72)
+    print(f"Assets:     {args.assets_dir}")
+    print(f"Artifacts:  {args.artifacts_dir}")
+    print(f"Voices:     {len(results)}")
+    print(f"Failed:     {len(failed)}")
+    print(f"Elapsed:    {elapsed:.2f}s")
+    print("-" * 72)
+    for r in results:
+        if "error" in r:
+            print(f"FAIL {r['voice_id']}: {r['error']}")
+        else:
+            cut = ""
+            if not r["segment_is_full"]:
+                cut = " (aligned prefix)" if r["prompt_text"] else " (segment, no text)"
+            print(f"OK   {r['voice_id']}: {r['source_seconds']:.1f}s -> {r['duration_seconds']:.1f}s{cut}")
+    print("=" * 72)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Pronunciation lexicon benchmark.
+
+This script measures, for a synthetic lexicon of N entries:
+- Build time (insert all entries + first relink)
+- Incremental edit cost (single add / remove followed by apply)
+- Apply latency over TTS-sized inputs (max 1000 chars, the GenerateRequest limit)
+
+It runs in-process against `backend.app.core.lexicon` (no server, no DB).
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/lexicon_benchmark.py
+  PYTHONPATH=. python tools/lexicon_benchmark.py --entries 100000 --text-len 1000 --iterations 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from backend.app.core.lexicon import Lexicon
+
+
+ALPHABET = string.ascii_uppercase + "的一是不了人我在有他这中大来上国个到说们为"
+
+
+def random_term(rng: random.Random, min_len: int, max_len: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values_sorted = sorted(values)
+    k = int(round((p / 100.0) * (len(values_sorted) - 1)))
+    return values_sorted[k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--text-len", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.entries <= 0:
+        raise ValueError("--entries must be positive")
+    if args.text_len <= 0:
+        raise ValueError("--text-len must be positive")
+
+    rng = random.Random(args.seed)
+    entries: dict[str, str] = {}
+    while len(entries) < args.entries:
+        entries[random_term(rng, 2, 8)] = random_term(rng, 2, 10)
+    terms = list(entries)
+
+    start = time.perf_counter()
+    lexicon = Lexicon(entries.items())
+    lexicon.apply("warmup")
+    build_s = time.perf_counter() - start
+
+    texts = [random_term(rng, args.text_len, args.text_len) for _ in range(args.iterations)]
+    apply_ms: list[float] = []
+    for text in texts:
+        t0 = time.perf_counter()
+        lexicon.apply(text)
+        apply_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    lexicon.remove(terms[0])
+    lexicon.apply(texts[0])
+    remove_ms = (time.perf_counter() - t0) * 1000.0
+
+    t0 = time.perf_counter()
+    lexicon.add(terms[1], "updated")
+    lexicon.apply(texts[0])
+    update_ms = (time.perf_counter() - t0) * 1000.0
+
+    t0 = time.perf_counter()
+    lexicon.add(random_term(rng, 9, 12), "new")
+    lexicon.apply(texts[0])
+    add_ms = (time.perf_counter() - t0) * 1000.0
+
+    print("=" * 72)
+    print("MoshengAI Lexicon Benchmark")
+    print("=" * 72)
+    print(f"Entries:        {len(lexicon)}")
+    print(f"Text length:    {args.text_len}")
+    print(f"Iterations:     {args.iterations}")
+    print(f"Build:          {build_s:.2f}s")
+    print("-" * 72)
+    print(f"Apply avg:      {statistics.mean(apply_ms):.3f}ms")
+    print(f"Apply P50:      {percentile(apply_ms, 50):.3f}ms")
+    print(f"Apply P95:      {percentile(apply_ms, 95):.3f}ms")
+    print("-" * 72)
+    print(f"Remove + apply: {remove_ms:.3f}ms")
+    print(f"Update + apply: {update_ms:.3f}ms")
+    print(f"Add + apply:    {add_ms:.3f}ms (delta relink only)")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
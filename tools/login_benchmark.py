@@ -0,0 +1,151 @@
+"""
+Login throughput benchmark.
+
+This script measures, against a running server:
+- Login throughput (POST /auth/login per second) and latency percentiles
+- Event-loop responsiveness while logins run (GET /health latency, probed
+  sequentially in the background)
+- The bcrypt pool counters from GET /monitor/stats/password_hashing
+
+The benchmark user is registered on first use (400 "already registered"
+is fine). Start the server with RATE_LIMIT_ENABLED=false, otherwise the
+per-account login limit caps the measured throughput.
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/login_benchmark.py
+  PYTHONPATH=. python tools/login_benchmark.py --requests 500 --concurrency 32 --email bench@example.com
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def http_json(method: str, url: str, payload: dict | None = None) -> tuple[int, dict]:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url=url, data=data, headers={"Content-Type": "application/json"}, method=method)
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        body = resp.read().decode("utf-8")
+        return resp.status, (json.loads(body) if body else {})
+
+
+def register(base_url: str, email: str, password: str) -> None:
+    """Create the benchmark user; 400 (already registered) is fine."""
+    try:
+        http_json("POST", f"{base_url}/auth/register", {"email": email, "password": password})
+    except urllib.error.HTTPError as e:
+        if e.code != 400:
+            raise
+
+
+def login_once(base_url: str, email: str, password: str) -> tuple[int, float]:
+    encoded = urllib.parse.urlencode({"username": email, "password": password}).encode("utf-8")
+    req = urllib.request.Request(
+        url=f"{base_url}/auth/login",
+        data=encoded,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        method="POST",
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            code = resp.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    return code, time.perf_counter() - start
+
+
+def probe_health(base_url: str, stop: threading.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        http_json("GET", f"{base_url}/health")
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.05)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values_sorted = sorted(values)
+    k = int(round((p / 100.0) * (len(values_sorted) - 1)))
+    return values_sorted[k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:38000")
+    parser.add_argument("--email", default="login-bench@example.com")
+    parser.add_argument("--password", default="login-bench-password")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    n = int(args.requests)
+    c = int(args.concurrency)
+    if n <= 0:
+        raise ValueError("--requests must be positive")
+    if c <= 0:
+        raise ValueError("--concurrency must be positive")
+
+    register(args.base_url, args.email, args.password)
+
+    latencies: list[float] = []
+    codes: dict[int, int] = {}
+    health: list[float] = []
+    stop = threading.Event()
+    prober = threading.Thread(target=probe_health, args=(args.base_url, stop, health), daemon=True)
+    prober.start()
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=c) as pool:
+        futures = [pool.submit(login_once, args.base_url, args.email, args.password) for _ in range(n)]
+        for f in concurrent.futures.as_completed(futures):
+            code, elapsed = f.result()
+            codes[code] = codes.get(code, 0) + 1
+            if code == 200:
+                latencies.append(elapsed)
+    wall = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    _, pool_stats = http_json("GET", f"{args.base_url}/monitor/stats/password_hashing")
+
+    print("=" * 72)
+    print("MoshengAI Login Benchmark")
+    print("=" * 72)
+    print(f"Base URL:     {args.base_url}")
+    print(f"Requests:     {n}")
+    print(f"Concurrency:  {c}")
+    print(f"Status codes: {dict(sorted(codes.items()))}")
+    print(f"Wall time:    {wall:.2f}s")
+    print(f"Throughput:   {len(latencies) / wall:.1f} logins/s")
+    if latencies:
+        print("-" * 72)
+        print(f"Login avg:    {statistics.mean(latencies) * 1000:.1f}ms")
+        print(f"Login P50:    {percentile(latencies, 50) * 1000:.1f}ms")
+        print(f"Login P95:    {percentile(latencies, 95) * 1000:.1f}ms")
+        print(f"Login max:    {max(latencies) * 1000:.1f}ms")
+    if health:
+        print("-" * 72)
+        print(f"/health samples: {len(health)}")
+        print(f"/health P50:  {percentile(health, 50) * 1000:.1f}ms")
+        print(f"/health P95:  {percentile(health, 95) * 1000:.1f}ms")
+        print(f"/health max:  {max(health) * 1000:.1f}ms")
+    print("-" * 72)
+    print("Hashing pool:")
+    print(json.dumps(pool_stats, indent=2))
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
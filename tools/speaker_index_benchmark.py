@@ -0,0 +1,89 @@
+"""
+Speaker-embedding index benchmark.
+
+This script measures, for N synthetic voices:
+- Incremental build time (one upsert per voice)
+- Query latency for /voices/{id}/similar (top-k cosine) after the first query
+- Cost of the first query after an edit (lazy re-normalization)
+
+It runs in-process against `backend.app.core.speaker_index` (no server).
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/speaker_index_benchmark.py
+  PYTHONPATH=. python tools/speaker_index_benchmark.py --voices 50000 --k 10 --queries 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from backend.app.core.speaker_index import SpeakerIndex
+from backend.app.core.voice_ingest import N_MFCC
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values_sorted = sorted(values)
+    k = int(round((p / 100.0) * (len(values_sorted) - 1)))
+    return values_sorted[k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--voices", type=int, default=20000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.voices <= 1:
+        raise ValueError("--voices must be > 1")
+
+    rng = np.random.default_rng(args.seed)
+    dim = 2 * (N_MFCC - 1)
+    embeddings = rng.normal(size=(args.voices, dim)).astype(np.float32)
+
+    index = SpeakerIndex()
+    start = time.perf_counter()
+    for i in range(args.voices):
+        index.upsert(f"v/{i}.wav", embeddings[i])
+    build_s = time.perf_counter() - start
+
+    t0 = time.perf_counter()
+    index.similar_to("v/0.wav", args.k)
+    first_ms = (time.perf_counter() - t0) * 1000.0
+
+    query_ms: list[float] = []
+    for i in rng.integers(0, args.voices, size=args.queries):
+        t0 = time.perf_counter()
+        index.similar_to(f"v/{i}.wav", args.k)
+        query_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    index.upsert("v/new.wav", rng.normal(size=dim).astype(np.float32))
+    t0 = time.perf_counter()
+    index.similar_to("v/new.wav", args.k)
+    after_edit_ms = (time.perf_counter() - t0) * 1000.0
+
+    print("=" * 72)
+    print("MoshengAI Speaker Index Benchmark")
+    print("=" * 72)
+    print(f"Voices:           {len(index)}")
+    print(f"Dim:              {dim}")
+    print(f"Build:            {build_s:.2f}s")
+    print("-" * 72)
+    print(f"First query:      {first_ms:.3f}ms (normalizes matrix)")
+    print(f"Query avg:        {statistics.mean(query_ms):.3f}ms")
+    print(f"Query P50:        {percentile(query_ms, 50):.3f}ms")
+    print(f"Query P95:        {percentile(query_ms, 95):.3f}ms")
+    print(f"Query after add:  {after_edit_ms:.3f}ms")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+SQLite concurrent submission benchmark (default aiosqlite vs SQLite mode).
+
+This script runs the same workload against three fresh SQLite files:
+- default:   a plain `create_async_engine` (rollback journal, pooled connections
+             that each write and commit on their own)
+- wal:       SQLite mode from `db/database.py` (WAL + pragmas, one writer
+             connection with BEGIN IMMEDIATE, query_only read pool), every
+             submission committing on its own
+- wal+queue: SQLite mode plus the `WriteQueue` writer task (group commit),
+             as the app runs it
+
+Workload: C concurrent submitters each run `hold_and_create_task` + commit
+(through `WriteQueue.run`, exactly like /tts/generate) for N submissions
+spread over a few users, while P pollers each read a task status every
+--poll-interval seconds (like clients polling /tts/status).
+It reports submission throughput and latency, "database is locked" errors,
+status poll latency and, for wal+queue, the average group size. The number
+of tasks and held credits is checked afterwards.
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/sqlite_write_benchmark.py
+  PYTHONPATH=. python tools/sqlite_write_benchmark.py --concurrency 64 --submissions 5000 --pollers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.core.write_queue import WriteQueue
+from backend.app.db.crud_credits import hold_and_create_task
+from backend.app.db.database import create_sqlite_engines, routing_session_class
+from backend.app.db.models import Base, Task, User
+
+COST = 5
+USERS = 20
+TEXT = "这是一条用于 SQLite 并发写入基准测试的语音合成文本。"
+VOICE_PATH = "prompt_voice/bench/voice.wav"
+MODES = ("default", "wal", "wal+queue")
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values_sorted = sorted(values)
+    k = int(round((p / 100.0) * (len(values_sorted) - 1)))
+    return values_sorted[k]
+
+
+async def open_mode(mode: str, path: str, read_pool_size: int, batch: int):
+    """(engines to dispose, session factory, write queue) for a fresh database file."""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    url = f"sqlite+aiosqlite:///{path}"
+    if mode == "default":
+        engine = create_async_engine(url)
+        engines = [engine]
+        session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    else:
+        writer, reader = create_sqlite_engines(url, read_pool_size)
+        engines = [writer, reader]
+        session_factory = async_sessionmaker(
+            writer, sync_session_class=routing_session_class(writer, reader),
+            expire_on_commit=False, autoflush=False,
+        )
+    async with engines[0].begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    queue = WriteQueue(batch if mode == "wal+queue" else 0, session_factory)
+    await queue.start()
+    return engines, session_factory, queue
+
+
+async def run_mode(mode: str, args) -> dict:
+    path = f"{args.database_path}.{mode.replace('+', '_')}.db"
+    engines, session_factory, queue = await open_mode(mode, path, args.read_pool_size, args.batch)
+
+    users = [str(uuid.uuid4()) for _ in range(USERS)]
+    async with session_factory() as db:
+        db.add_all([User(id=u, email=f"{u}@bench.local", credits_balance=COST * args.submissions) for u in users])
+        await db.commit()
+
+    latencies: list[float] = []
+    polls: list[float] = []
+    task_ids: list[str] = []
+    errors = {"locked": 0}
+    remaining = iter(range(args.submissions))
+    done = asyncio.Event()
+
+    async def submitter():
+        async with session_factory() as db:
+            for i in remaining:
+                user_id = users[i % USERS]
+                start = time.perf_counter()
+                try:
+                    result = await queue.run(db, lambda s: hold_and_create_task(
+                        s, user_id=user_id, text=TEXT, voice_path=VOICE_PATH, cost=COST,
+                    ))
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    errors["locked"] += 1
+                    await db.rollback()
+                    continue
+                latencies.append(time.perf_counter() - start)
+                task_ids.append(result[0])
+
+    async def poller():
+        rng = random.Random()
+        async with session_factory() as db:
+            while not done.is_set():
+                if not task_ids:
+                    await asyncio.sleep(0.001)
+                    continue
+                start = time.perf_counter()
+                await db.execute(select(Task.status).where(Task.id == rng.choice(task_ids)))
+                await db.commit()
+                polls.append(time.perf_counter() - start)
+                await asyncio.sleep(args.poll_interval)
+
+    pollers = [asyncio.create_task(poller()) for _ in range(args.pollers)]
+    start = time.perf_counter()
+    await asyncio.gather(*[submitter() for _ in range(args.concurrency)])
+    wall = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*pollers)
+    stats = queue.stats()
+    await queue.stop()
+
+    async with session_factory() as db:
+        tasks = (await db.execute(select(func.count()).select_from(Task))).scalar_one()
+        held = (await db.execute(select(func.sum(User.credits_held)))).scalar_one() or 0
+    if tasks != len(latencies) or held != COST * len(latencies):
+        raise RuntimeError(f"{mode}: tasks={tasks} held={held}, expected {len(latencies)} / {COST * len(latencies)}")
+    for engine in engines:
+        await engine.dispose()
+    return {
+        "wall": wall, "latencies": latencies, "polls": polls, "locked": errors["locked"],
+        "avg_batch": stats["avg_batch"],
+    }
+
+
+async def main_async(args) -> None:
+    results = {}
+    for mode in MODES:
+        results[mode] = await run_mode(mode, args)
+
+    print("=" * 72)
+    print("MoshengAI SQLite Concurrent Submission Benchmark")
+    print("=" * 72)
+    print(f"Database:     {args.database_path}.<mode>.db")
+    print(f"Submissions:  {args.submissions} ({args.concurrency} concurrent, {USERS} users)")
+    print(f"Pollers:      {args.pollers} (every {args.poll_interval}s)")
+    print("-" * 72)
+    print(f"{'mode':>9}  {'submit/s':>8}  {'p50':>8}  {'p95':>8}  {'locked':>6}  {'poll p95':>8}  {'group':>5}")
+    for mode, r in results.items():
+        lat = r["latencies"]
+        print(
+            f"{mode:>9}  {len(lat) / r['wall']:>8.0f}  {percentile(lat, 50) * 1000:>6.1f}ms"
+            f"  {percentile(lat, 95) * 1000:>6.1f}ms  {r['locked']:>6}  {percentile(r['polls'], 95) * 1000:>6.1f}ms"
+            f"  {r['avg_batch']:>5.1f}"
+        )
+    print("=" * 72)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-path", default="/tmp/mosheng_sqlite_bench")
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pollers", type=int, default=16)
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="seconds between polls of one poller")
+    parser.add_argument("--read-pool-size", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=64, help="max writes per group commit (wal+queue)")
+    args = parser.parse_args()
+
+    if args.submissions <= 0 or args.concurrency <= 0 or args.read_pool_size <= 0 or args.batch <= 0:
+        raise ValueError("--submissions, --concurrency, --read-pool-size and --batch must be positive")
+    if args.pollers < 0 or args.poll_interval < 0:
+        raise ValueError("--pollers and --poll-interval must be >= 0")
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
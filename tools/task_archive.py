@@ -0,0 +1,72 @@
+"""
+Task archive maintenance (cold storage of old finished tasks).
+
+Commands:
+- run:  archive every eligible task now (same job the backend runs every
+        TASK_ARCHIVE_INTERVAL_SECONDS), e.g. after lowering --after-days
+- show: print the full archived record of a task (text, callback_url, ...)
+
+Uses DATABASE_URL / TASK_ARCHIVE_DIR from the backend settings.
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/task_archive.py run
+  PYTHONPATH=. python tools/task_archive.py run --after-days 30
+  PYTHONPATH=. python tools/task_archive.py show 6f1c2e0a-...
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select
+
+from backend.app.core.config import settings
+from backend.app.core.task_archive import TaskArchiver, read_archived_task
+from backend.app.db.database import AsyncSessionLocal
+from backend.app.db.models import Task
+
+
+async def run(args) -> None:
+    archiver = TaskArchiver(settings.TASK_ARCHIVE_DIR, args.after_days, 0, args.batch_size)
+    start = time.time()
+    archived = await archiver.run_once()
+    print("=" * 72)
+    print(f"Archived {archived} tasks finished before {args.after_days} days ago in {time.time() - start:.1f}s")
+    print(f"Directory: {settings.TASK_ARCHIVE_DIR}")
+    print("=" * 72)
+
+
+async def show(args) -> None:
+    async with AsyncSessionLocal() as db:
+        completed_at = (await db.execute(select(Task.completed_at).where(Task.id == args.task_id))).scalar()
+    record = read_archived_task(settings.TASK_ARCHIVE_DIR, args.task_id, completed_at)
+    if record is None:
+        print(f"Task {args.task_id} not found in {settings.TASK_ARCHIVE_DIR}")
+        return
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run")
+    run_parser.add_argument("--after-days", type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS)
+    run_parser.add_argument("--batch-size", type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE)
+    show_parser = sub.add_parser("show")
+    show_parser.add_argument("task_id")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if args.after_days <= 0 or args.batch_size <= 0:
+            raise ValueError("--after-days and --batch-size must be positive")
+        asyncio.run(run(args))
+    else:
+        asyncio.run(show(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+TTS worker time-slicing benchmark (short requests behind long ones).
+
+This script measures, for short requests submitted while long tasks are
+already queued:
+- Short-request latency (submit -> COMPLETED published): p50 / p95 / max
+- Long-task completion time (submit -> last long task COMPLETED)
+
+for two worker configurations:
+- whole:   every task runs to completion (TTS_SLICE_THRESHOLD_CHARS=0)
+- sliced:  tasks over --threshold chars are synthesized one sentence-aligned
+           segment per turn, with up to --short-burst short tasks in between
+
+It drives the real worker (`voxcpm_engine.process_queue`: deadline queue,
+segment split, PartialAudio, status writes) in-process against a scratch
+SQLite database. Inference is simulated: each call sleeps
+--seconds-per-char * len(text) on the inference thread and returns silence,
+so no model or GPU is needed. Results scale with that rate; measure it on
+the real model with tools/tts_benchmark.py.
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/time_slicing_benchmark.py
+  PYTHONPATH=. python tools/time_slicing_benchmark.py --long-tasks 5 --short-requests 50 --seconds-per-char 0.001
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+import types
+
+LONG_TEXT = "这是一个很长的句子，用于测试时间片调度。"
+VOICE_PATH = "prompt_voice/bench/voice.wav"
+SAMPLE_RATE = 16000
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values_sorted = sorted(values)
+    k = int(round((p / 100.0) * (len(values_sorted) - 1)))
+    return values_sorted[k]
+
+
+async def wait_completed(task_id: str) -> None:
+    from backend.app.core.task_status import TERMINAL_STATUSES, task_status_registry
+
+    while True:
+        entry = task_status_registry.get(task_id)
+        status = entry[0] if entry else "QUEUED"
+        if status in TERMINAL_STATUSES:
+            if status != "COMPLETED":
+                raise RuntimeError(f"task {task_id} {status}: {entry[2]}")
+            return
+        await task_status_registry.wait_any({task_id: status}, 5.0)
+
+
+async def run_mode(mode: str, args) -> dict:
+    from backend.app.core.config import settings
+    from backend.app.core.scheduler import DeadlineQueue
+    from backend.app.core.tts_wrapper_voxcpm import voxcpm_engine
+    from backend.app.db.ids import new_id
+
+    settings.TTS_SLICE_THRESHOLD_CHARS = args.threshold if mode == "sliced" else 0
+    settings.TTS_SLICE_SHORT_BURST = args.short_burst
+    voxcpm_engine.queue = DeadlineQueue()
+    worker = asyncio.create_task(voxcpm_engine.process_queue())
+
+    long_text = (LONG_TEXT * (args.long_chars // len(LONG_TEXT) + 1))[: args.long_chars]
+    start = time.perf_counter()
+    long_ids = [new_id() for _ in range(args.long_tasks)]
+    for task_id in long_ids:
+        await voxcpm_engine.submit_task(task_id, long_text, VOICE_PATH)
+
+    async def short_request(i: int) -> float:
+        await asyncio.sleep(i * args.short_interval)
+        task_id = new_id()
+        submitted = time.perf_counter()
+        await voxcpm_engine.submit_task(task_id, f"短句测试第{i}条。", VOICE_PATH)
+        await wait_completed(task_id)
+        return time.perf_counter() - submitted
+
+    async def long_done() -> float:
+        for task_id in long_ids:
+            await wait_completed(task_id)
+        return time.perf_counter() - start
+
+    try:
+        latencies, long_seconds = await asyncio.gather(
+            asyncio.gather(*(short_request(i) for i in range(args.short_requests))),
+            long_done(),
+        )
+    finally:
+        worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await worker
+
+    return {
+        "mode": mode,
+        "short_p50": statistics.median(latencies),
+        "short_p95": percentile(latencies, 95),
+        "short_max": max(latencies),
+        "long_done": long_seconds,
+    }
+
+
+async def main_async(args) -> None:
+    from backend.app.core.tts_wrapper_voxcpm import voxcpm_engine
+    from backend.app.db.init_db import create_tables
+
+    await create_tables()
+
+    def simulated_synthesize(text: str, voice_path: str):
+        import numpy as np
+
+        seconds = len(text) * args.seconds_per_char
+        time.sleep(seconds)
+        return np.zeros(int(seconds * SAMPLE_RATE) + 1, dtype=np.float32)
+
+    voxcpm_engine.model = types.SimpleNamespace(tts_model=types.SimpleNamespace(sample_rate=SAMPLE_RATE, device="cpu"))
+    voxcpm_engine._synthesize = simulated_synthesize
+
+    results = []
+    for mode in ("whole", "sliced"):
+        # The worker prints every task; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(await run_mode(mode, args))
+
+    print("=" * 72)
+    print("MoshengAI TTS Worker Time-Slicing Benchmark (simulated inference)")
+    print("=" * 72)
+    print(f"Long tasks:     {args.long_tasks} x {args.long_chars} chars, queued first")
+    print(f"Short requests: {args.short_requests}, one every {args.short_interval}s")
+    print(f"Inference:      {args.seconds_per_char * 1000:.2f} ms/char (simulated)")
+    print(f"Slicing:        threshold {args.threshold} chars, short burst {args.short_burst}")
+    print("-" * 72)
+    print(f"{'mode':<8} {'short p50':>10} {'short p95':>10} {'short max':>10} {'long done':>10}")
+    for r in results:
+        print(
+            f"{r['mode']:<8} {r['short_p50']:>9.2f}s {r['short_p95']:>9.2f}s "
+            f"{r['short_max']:>9.2f}s {r['long_done']:>9.2f}s"
+        )
+    print("=" * 72)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--long-tasks", type=int, default=3)
+    parser.add_argument("--long-chars", type=int, default=1000)
+    parser.add_argument("--short-requests", type=int, default=20)
+    parser.add_argument("--short-interval", type=float, default=0.1, help="seconds between short submissions")
+    parser.add_argument("--seconds-per-char", type=float, default=0.0005, help="simulated inference time")
+    parser.add_argument("--threshold", type=int, default=200, help="TTS_SLICE_THRESHOLD_CHARS for the sliced run")
+    parser.add_argument("--short-burst", type=int, default=8, help="TTS_SLICE_SHORT_BURST")
+    args = parser.parse_args()
+
+    if args.long_tasks <= 0 or args.short_requests <= 0 or args.threshold <= 0:
+        raise ValueError("--long-tasks, --short-requests and --threshold must be positive")
+
+    # Settings are read at import time
+    scratch = tempfile.mkdtemp(prefix="mosheng_slicing_")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ["GENERATED_AUDIO_DIR"] = scratch
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
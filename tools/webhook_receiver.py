@@ -0,0 +1,56 @@
+"""
+Local stand-in for a webhook receiver (manual testing of callback_url).
+
+Prints every delivery, checks `X-Mosheng-Signature` against WEBHOOK_SECRET
+and answers with a configurable status so retries/backoff can be observed.
+
+Usage examples:
+  source .venv/bin/activate
+  PYTHONPATH=. python tools/webhook_receiver.py --port 39000
+  PYTHONPATH=. python tools/webhook_receiver.py --port 39000 --fail-first 2   # 500 twice, then 200
+
+Then submit with "callback_url": "http://127.0.0.1:39000/hook". Loopback callbacks are
+rejected unless the API runs with WEBHOOK_ALLOWED_HOSTS=127.0.0.1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.app.core.config import settings
+from backend.app.core.webhooks import SIGNATURE_HEADER, verify_signature
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=39000)
+    parser.add_argument("--secret", default=settings.WEBHOOK_SECRET)
+    parser.add_argument("--fail-first", type=int, default=0, help="answer 500 to the first N deliveries")
+    args = parser.parse_args()
+
+    state = {"received": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            state["received"] += 1
+            valid = verify_signature(args.secret, self.headers.get(SIGNATURE_HEADER, ""), body)
+            code = 500 if state["received"] <= args.fail_first else (200 if valid else 401)
+            print(f"#{state['received']} {self.headers.get('X-Mosheng-Event')} "
+                  f"delivery={self.headers.get('X-Mosheng-Delivery')} signature={'ok' if valid else 'BAD'} -> {code}")
+            print(f"  {json.loads(body)}")
+            self.send_response(code)
+            self.end_headers()
+
+        def log_message(self, *_):
+            pass
+
+    print(f"Listening on http://{args.host}:{args.port}")
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()